@@ -43,7 +43,7 @@ BEGIN
             array_agg(id ORDER BY created_at) as ids,
             array_agg(created_at ORDER BY created_at) as dates
         FROM crypto_api_site_pages
-        WHERE metadata->>'source' = api_source
+        WHERE source = api_source
         GROUP BY url, chunk_number
         HAVING COUNT(*) > 1
     )
@@ -51,6 +51,48 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Delete every older duplicate of each (url, chunk_number) in one statement,
+-- keeping the most recent row. Returns the number of rows deleted, or with
+-- dry_run the number that would be deleted.
+CREATE OR REPLACE FUNCTION delete_duplicate_chunks(api_source text DEFAULT NULL, dry_run boolean DEFAULT false)
+RETURNS bigint AS $$
+DECLARE
+    affected bigint;
+BEGIN
+    IF dry_run THEN
+        SELECT count(*) INTO affected
+        FROM (
+            SELECT row_number() OVER (
+                PARTITION BY p.url, p.chunk_number
+                ORDER BY p.created_at DESC, p.id DESC
+            ) AS rn
+            FROM crypto_api_site_pages p
+            WHERE api_source IS NULL OR p.source = api_source
+        ) ranked
+        WHERE ranked.rn > 1;
+        RETURN affected;
+    END IF;
+
+    DELETE FROM crypto_api_site_pages target
+    USING (
+        SELECT
+            p.id,
+            row_number() OVER (
+                PARTITION BY p.url, p.chunk_number
+                ORDER BY p.created_at DESC, p.id DESC
+            ) AS rn
+        FROM crypto_api_site_pages p
+        WHERE api_source IS NULL OR p.source = api_source
+    ) ranked
+    WHERE target.id = ranked.id
+      AND ranked.rn > 1;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Add unique constraint to prevent future duplicates
+-- (run `SELECT delete_duplicate_chunks();` first if the table already has duplicates)
 ALTER TABLE crypto_api_site_pages
 ADD CONSTRAINT unique_url_chunk UNIQUE (url, chunk_number);
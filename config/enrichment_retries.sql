@@ -0,0 +1,72 @@
+-- Durable retries for chunk enrichment (title/summary and embedding).
+--
+-- When an LLM or embeddings call fails during a crawl, the chunk is stored with
+-- enrichment_status 'pending' (a null embedding or placeholder title/summary)
+-- and a row per failed task is queued here. `python main.py backfill` retries
+-- due tasks with exponential backoff; a task that keeps failing is moved to
+-- the 'dead' state and its chunk to 'failed'. Search functions only return
+-- 'complete' chunks. Run after site_pages.sql, before re-running the search
+-- function files (vector_index.sql, hybrid_search.sql, per_source_search.sql,
+-- quantized_search.sql).
+
+alter table crypto_api_site_pages
+  add column if not exists enrichment_status text not null default 'complete';
+
+alter table crypto_api_site_pages
+  drop constraint if exists crypto_api_site_pages_enrichment_status_check;
+alter table crypto_api_site_pages
+  add constraint crypto_api_site_pages_enrichment_status_check
+  check (enrichment_status in ('complete', 'pending', 'failed', 'duplicate'));
+
+-- Linked near-duplicates stored before they had their own status
+update crypto_api_site_pages
+set enrichment_status = 'duplicate'
+where metadata ? 'duplicate_of' and embedding is null;
+
+create index if not exists idx_crypto_api_site_pages_incomplete
+  on crypto_api_site_pages (url, chunk_number)
+  where enrichment_status <> 'complete';
+
+create table if not exists crypto_api_enrichment_queue (
+    id bigserial primary key,
+    url varchar not null,
+    chunk_number integer not null,
+    source text,
+    task text not null check (task in ('embedding', 'summary')),
+    status text not null default 'pending' check (status in ('pending', 'dead')),
+    attempts integer not null default 0,
+    last_error text,
+    next_attempt_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    unique (url, chunk_number, task)
+);
+
+-- Due tasks in the order the backfill drains them
+create index if not exists idx_crypto_api_enrichment_queue_due
+  on crypto_api_enrichment_queue (next_attempt_at)
+  where status = 'pending';
+
+-- Mark chunks written before this file with a zero vector or placeholder text, and queue them
+update crypto_api_site_pages
+set embedding = null,
+    enrichment_status = 'pending'
+where embedding is not null and vector_norm(embedding) = 0;
+
+update crypto_api_site_pages
+set enrichment_status = 'pending'
+where title = 'Error processing title' or summary = 'Error processing summary';
+
+insert into crypto_api_enrichment_queue (url, chunk_number, source, task, last_error)
+select url, chunk_number, source, 'embedding', 'Zero vector stored before retries existed'
+from crypto_api_site_pages
+where enrichment_status = 'pending' and embedding is null and metadata->'duplicate_of' is null
+on conflict (url, chunk_number, task) do nothing;
+
+insert into crypto_api_enrichment_queue (url, chunk_number, source, task, last_error)
+select url, chunk_number, source, 'summary', 'Placeholder text stored before retries existed'
+from crypto_api_site_pages
+where title = 'Error processing title' or summary = 'Error processing summary'
+on conflict (url, chunk_number, task) do nothing;
+
+alter table crypto_api_enrichment_queue enable row level security;
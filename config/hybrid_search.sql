@@ -0,0 +1,152 @@
+-- Hybrid keyword + vector search with reciprocal rank fusion (RRF)
+--
+-- Exact endpoint paths and parameter names (e.g. /coins/markets, vs_currency) are
+-- matched by full-text search, paraphrased questions by vector search; RRF merges
+-- both rankings in a single round trip.
+
+-- Full-text document: title weighted above content
+alter table crypto_api_site_pages
+  add column if not exists fts tsvector
+  generated always as (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', content), 'B')
+  ) stored;
+
+create index if not exists idx_crypto_api_site_pages_fts
+  on crypto_api_site_pages using gin (fts);
+
+-- A source filter is applied to the source column (source_columns.sql) inside both
+-- rankings, with the source inlined as a literal: a source with a partial vector index
+-- (vector_index.sql, `index build --per-source`) is ranked through it with its tuned
+-- settings, any other source exactly, rather than post-filtering the global index.
+-- Run after vector_index.sql.
+-- If EMBEDDING_DIMENSIONS is not 1536, replace 1536 below with that value.
+create or replace function hybrid_search_crypto_api_site_pages (
+  query_text text,
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb DEFAULT '{}'::jsonb,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  metadata jsonb,
+  similarity float,
+  keyword_rank bigint,
+  semantic_rank bigint,
+  score float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+  settings crypto_api_vector_index_settings;
+  source_settings crypto_api_vector_source_index_settings;
+  source_name text := filter->>'source';
+  has_partial_index boolean := false;
+begin
+  select * into settings from crypto_api_vector_index_settings where id = 1;
+  if found then
+    -- The vector ranking takes match_count * 4 rows, and HNSW returns at most ef_search
+    perform set_config('hnsw.ef_search', greatest(settings.ef_search, match_count * 4)::text, true);
+    perform set_config('ivfflat.probes', settings.probes::text, true);
+  end if;
+
+  if source_name is not null then
+    select * into source_settings from crypto_api_vector_source_index_settings where source = source_name;
+    has_partial_index := found;
+    if has_partial_index then
+      perform set_config('hnsw.ef_search', greatest(source_settings.ef_search, match_count * 4)::text, true);
+      perform set_config('ivfflat.probes', source_settings.probes::text, true);
+    end if;
+  end if;
+
+  return query execute format($query$
+    with full_text as (
+      select
+        c.id,
+        row_number() over (
+          order by ts_rank_cd(c.fts, websearch_to_tsquery('english', $1)) desc
+        ) as rank_ix
+      from crypto_api_site_pages c
+      where c.fts @@ websearch_to_tsquery('english', $1)
+        and %1$s
+        and c.metadata @> $4
+        and c.embedding is not null
+        and c.enrichment_status = 'complete'
+      order by rank_ix
+      limit $3 * 4
+    ),
+    semantic as (
+      select
+        c.id,
+        row_number() over (order by %2$s) as rank_ix
+      from crypto_api_site_pages c
+      where %1$s
+        and c.metadata @> $4
+        and c.embedding is not null
+        and c.enrichment_status = 'complete'
+      order by %2$s
+      limit $3 * 4
+    )
+    select
+      p.id,
+      p.url,
+      p.chunk_number,
+      p.title,
+      p.summary,
+      p.content,
+      p.metadata,
+      -(p.embedding <#> $2) as similarity,
+      full_text.rank_ix as keyword_rank,
+      semantic.rank_ix as semantic_rank,
+      coalesce(1.0 / ($7 + full_text.rank_ix), 0.0) * $5 +
+      coalesce(1.0 / ($7 + semantic.rank_ix), 0.0) * $6 as score
+    from full_text
+    full outer join semantic on full_text.id = semantic.id
+    join crypto_api_site_pages p on p.id = coalesce(full_text.id, semantic.id)
+    order by score desc
+    limit $3
+    $query$,
+    case when source_name is null then 'true' else format('c.source = %L', source_name) end,
+    -- "+ 0" keeps a source without a partial index off the global index, ranking its rows exactly
+    case when source_name is not null and not has_partial_index
+      then '(c.embedding <#> $2) + 0'
+      else 'c.embedding <#> $2'
+    end
+  ) using query_text, query_embedding, match_count, filter - 'source', full_text_weight, semantic_weight, rrf_k;
+end;
+$$;
+
+-- Keyword ranking alone. With a local vector replica (LOCAL_REPLICA_DIR) the agent
+-- ranks vectors itself and fuses them with this ranking the same way as above.
+create or replace function keyword_search_crypto_api_site_pages (
+  query_text text,
+  match_count int default 10,
+  filter jsonb DEFAULT '{}'::jsonb
+) returns table (
+  id bigint,
+  keyword_rank bigint
+)
+language sql
+as $$
+select
+  c.id,
+  row_number() over (
+    order by ts_rank_cd(c.fts, websearch_to_tsquery('english', query_text)) desc
+  ) as keyword_rank
+from crypto_api_site_pages c
+where c.fts @@ websearch_to_tsquery('english', query_text)
+  and (filter->>'source' is null or c.source = filter->>'source')
+  and c.metadata @> (filter - 'source')
+  and c.embedding is not null
+  and c.enrichment_status = 'complete'
+order by keyword_rank
+limit match_count;
+$$;
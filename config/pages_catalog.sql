@@ -0,0 +1,40 @@
+-- One row per documentation page, maintained by the crawler at ingest.
+-- Lets the agent list pages and check that a page exists without scanning
+-- every chunk row.
+create table if not exists crypto_api_pages (
+    url varchar primary key,
+    source text not null,
+    title varchar,
+    chunk_count integer not null default 0,
+    content_hash text,
+    pipeline_version text,
+    last_crawled_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    last_seen_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- Paginated listing per source, ordered by URL
+create index if not exists idx_crypto_api_pages_source_url on crypto_api_pages (source, url);
+
+-- Backfill from chunks stored before the catalog existed
+insert into crypto_api_pages (url, source, title, chunk_count, content_hash, pipeline_version, last_crawled_at, last_seen_at)
+select
+    p.url,
+    min(p.metadata->>'source'),
+    split_part(min(p.title) filter (where p.chunk_number = 0), ' - ', 1),
+    count(*),
+    min(p.metadata->>'page_hash'),
+    min(p.metadata->>'pipeline_version'),
+    max(p.created_at),
+    max(p.created_at)
+from crypto_api_site_pages p
+where p.metadata->>'source' is not null
+group by p.url
+on conflict (url) do nothing;
+
+alter table crypto_api_pages enable row level security;
+
+create policy "Allow public read access"
+  on crypto_api_pages
+  for select
+  to public
+  using (true);
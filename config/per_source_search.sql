@@ -0,0 +1,85 @@
+-- Per-source top-k search, used to compare endpoints across APIs
+--
+-- Returns the best per_source_count chunks for every requested source instead
+-- of a global top-k filtered afterwards, so sources with weaker matches are not
+-- crowded out. Only the columns the comparison formats are returned; content is
+-- cut down to a preview on the server.
+-- If EMBEDDING_DIMENSIONS is not 1536, replace 1536 below with that value.
+
+-- Each lateral lookup filters on the source column (source_columns.sql) before ranking
+-- sources: API names to compare; null or empty compares every source among the
+-- candidate_count nearest chunks overall
+create or replace function match_crypto_api_site_pages_per_source (
+  query_embedding vector(1536),
+  sources text[] default null,
+  per_source_count int default 1,
+  preview_length int default 300,
+  candidate_count int default 200
+) returns table (
+  id bigint,
+  url varchar,
+  title varchar,
+  summary varchar,
+  preview text,
+  truncated boolean,
+  source text,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  if sources is null or cardinality(sources) = 0 then
+    return query
+    with candidates as (
+      select
+        c.id, c.url, c.title, c.summary, c.content,
+        c.source,
+        c.embedding <#> query_embedding as distance
+      from crypto_api_site_pages c
+      where c.embedding is not null
+        and c.enrichment_status = 'complete'
+      order by c.embedding <#> query_embedding
+      limit candidate_count
+    ),
+    ranked as (
+      select
+        candidates.*,
+        row_number() over (partition by candidates.source order by candidates.distance) as source_rank
+      from candidates
+    )
+    select
+      r.id, r.url, r.title, r.summary,
+      left(r.content, preview_length) as preview,
+      length(r.content) > preview_length as truncated,
+      r.source,
+      -r.distance as similarity
+    from ranked r
+    where r.source_rank <= per_source_count
+    order by r.source, r.distance;
+
+  else
+    return query
+    select
+      m.id, m.url, m.title, m.summary, m.preview, m.truncated,
+      s.source,
+      -m.distance as similarity
+    from unnest(sources) as s(source)
+    cross join lateral (
+      select
+        c.id, c.url, c.title, c.summary,
+        left(c.content, preview_length) as preview,
+        length(c.content) > preview_length as truncated,
+        c.embedding <#> query_embedding as distance
+      from crypto_api_site_pages c
+      where c.source = s.source
+        and c.embedding is not null
+        and c.enrichment_status = 'complete'
+      -- Rank the source's rows exactly rather than post-filtering a global ANN scan
+      order by (c.embedding <#> query_embedding) + 0
+      limit per_source_count
+    ) m
+    order by s.source, m.distance;
+  end if;
+end;
+$$;
@@ -0,0 +1,8 @@
+-- Optional HNSW index for VECTOR_SEARCH_MODE=binary (see quantized_search.sql)
+--
+-- Indexes the binary-quantized embedding (1 bit per dimension) by Hamming distance.
+-- If EMBEDDING_DIMENSIONS is not 1536, replace 1536 below with that value.
+
+create index if not exists idx_crypto_api_site_pages_embedding_bit
+  on crypto_api_site_pages
+  using hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops);
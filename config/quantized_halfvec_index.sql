@@ -0,0 +1,8 @@
+-- Optional HNSW index for VECTOR_SEARCH_MODE=halfvec (see quantized_search.sql)
+--
+-- Indexes the embedding as 16-bit floats by cosine distance.
+-- If EMBEDDING_DIMENSIONS is not 1536, replace 1536 below with that value.
+
+create index if not exists idx_crypto_api_site_pages_embedding_half
+  on crypto_api_site_pages
+  using hnsw ((embedding::halfvec(1536)) halfvec_cosine_ops);
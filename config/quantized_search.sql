@@ -0,0 +1,90 @@
+-- Quantized vector search with full-precision rescoring (requires pgvector 0.7+)
+--
+-- Candidates are retrieved from a compact index over a quantized copy of the
+-- embedding, then re-ranked on the full vectors. The quantized copies are
+-- index expressions rather than stored columns, so only the index pays for them:
+--   binary  - 1 bit per dimension (32x smaller than float32), Hamming distance
+--   halfvec - 16-bit floats (2x smaller), cosine distance
+-- This file only creates the search function. Create the index for the mode you
+-- use (VECTOR_SEARCH_MODE) with quantized_binary_index.sql or
+-- quantized_halfvec_index.sql; without it the mode scans every row.
+-- If EMBEDDING_DIMENSIONS is not 1536, replace 1536 below with that value.
+
+-- Search on the quantized index and rescore the top candidate_count rows on full vectors.
+-- quantization: 'binary', 'halfvec', or 'exact' (sequential scan, for benchmarking recall)
+create or replace function match_crypto_api_site_pages_quantized (
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb DEFAULT '{}'::jsonb,
+  quantization text default 'binary',
+  candidate_count int default 100
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  -- HNSW returns at most ef_search rows, so widen it to cover the candidate pool
+  perform set_config('hnsw.ef_search', greatest(candidate_count, 40)::text, true);
+
+  if quantization = 'exact' then
+    perform set_config('enable_indexscan', 'off', true);
+    return query
+    select
+      p.id, p.url, p.chunk_number, p.title, p.summary, p.content, p.metadata,
+      1 - (p.embedding <=> query_embedding) as similarity
+    from crypto_api_site_pages p
+    where p.metadata @> filter
+      and p.enrichment_status = 'complete'
+      and p.embedding is not null
+    order by p.embedding <=> query_embedding
+    limit match_count;
+
+  elsif quantization = 'halfvec' then
+    return query
+    with candidates as (
+      select c.id
+      from crypto_api_site_pages c
+      where c.metadata @> filter
+        and c.enrichment_status = 'complete'
+        and c.embedding is not null
+      order by c.embedding::halfvec(1536) <=> query_embedding::halfvec(1536)
+      limit candidate_count
+    )
+    select
+      p.id, p.url, p.chunk_number, p.title, p.summary, p.content, p.metadata,
+      1 - (p.embedding <=> query_embedding) as similarity
+    from candidates
+    join crypto_api_site_pages p on p.id = candidates.id
+    order by p.embedding <=> query_embedding
+    limit match_count;
+
+  else
+    return query
+    with candidates as (
+      select c.id
+      from crypto_api_site_pages c
+      where c.metadata @> filter
+        and c.enrichment_status = 'complete'
+        and c.embedding is not null
+      order by binary_quantize(c.embedding)::bit(1536) <~> binary_quantize(query_embedding)
+      limit candidate_count
+    )
+    select
+      p.id, p.url, p.chunk_number, p.title, p.summary, p.content, p.metadata,
+      1 - (p.embedding <=> query_embedding) as similarity
+    from candidates
+    join crypto_api_site_pages p on p.id = candidates.id
+    order by p.embedding <=> query_embedding
+    limit match_count;
+  end if;
+end;
+$$;
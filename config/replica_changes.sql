@@ -0,0 +1,72 @@
+-- Change tracking for the local vector replica (LOCAL_REPLICA_DIR, see api/replica.py).
+--
+-- Chunks are overwritten by recrawls, filled in by the enrichment backfill and
+-- deleted when a page shrinks or disappears. updated_at moves on every update so
+-- the replica re-reads changed rows, and deleted chunk ids are logged so it
+-- drops removed ones. Both timestamps come from now(), the start of the writing
+-- transaction, so rows can commit out of timestamp order; the replica re-reads a
+-- window (LOCAL_REPLICA_CHANGE_WINDOW_SECONDS) before its cursors to catch them.
+-- Run after site_pages.sql and source_columns.sql (the replica reads the source column).
+
+alter table crypto_api_site_pages
+  add column if not exists updated_at timestamp with time zone;
+
+-- Existing rows count as last changed when they were created
+update crypto_api_site_pages
+set updated_at = created_at
+where updated_at is null;
+
+alter table crypto_api_site_pages
+  alter column updated_at set default timezone('utc'::text, now()),
+  alter column updated_at set not null;
+
+create index if not exists idx_crypto_api_site_pages_updated_at
+  on crypto_api_site_pages (updated_at, id);
+
+create or replace function touch_crypto_api_site_pages()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := timezone('utc'::text, now());
+  return new;
+end;
+$$;
+
+drop trigger if exists crypto_api_site_pages_touch on crypto_api_site_pages;
+create trigger crypto_api_site_pages_touch
+  before update on crypto_api_site_pages
+  for each row execute function touch_crypto_api_site_pages();
+
+create table if not exists crypto_api_site_pages_deletions (
+    seq bigserial primary key,
+    chunk_id bigint not null,
+    deleted_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create index if not exists idx_crypto_api_site_pages_deletions_deleted_at
+  on crypto_api_site_pages_deletions (deleted_at, seq);
+
+-- Statement-level, so set-based cleanups log their rows in one insert
+create or replace function log_crypto_api_site_pages_deletions()
+returns trigger
+language plpgsql
+as $$
+begin
+  insert into crypto_api_site_pages_deletions (chunk_id)
+  select id from deleted_rows;
+  return null;
+end;
+$$;
+
+drop trigger if exists crypto_api_site_pages_log_deletions on crypto_api_site_pages;
+create trigger crypto_api_site_pages_log_deletions
+  after delete on crypto_api_site_pages
+  referencing old table as deleted_rows
+  for each statement execute function log_crypto_api_site_pages_deletions();
+
+-- Replicas only read entries from shortly before their last refresh; prune old ones with e.g.
+--   delete from crypto_api_site_pages_deletions where deleted_at < now() - interval '30 days';
+-- (a replica older than that should be rebuilt)
+
+alter table crypto_api_site_pages_deletions enable row level security;
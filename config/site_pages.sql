@@ -10,15 +10,20 @@ create table crypto_api_site_pages (
     summary varchar not null,
     content text not null,  -- Added content column
     metadata jsonb not null default '{}'::jsonb,  -- Added metadata column
-    embedding vector(1536),  -- OpenAI embeddings are 1536 dimensions
+    source text,  -- API name, also in metadata (see source_columns.sql)
+    category text,  -- API category, also in metadata
+    embedding vector(1536),  -- OpenAI embeddings are 1536 dimensions (see EMBEDDING_DIMENSIONS to shorten)
+    enrichment_status text not null default 'complete',  -- 'pending'/'failed' while enrichment is retried, 'duplicate' for linked near-duplicates (see enrichment_retries.sql)
     created_at timestamp with time zone default timezone('utc'::text, now()) not null,
     
     -- Add a unique constraint to prevent duplicate chunks for the same URL
     unique(url, chunk_number)
 );
 
--- Create an index for better vector similarity search performance
-create index on crypto_api_site_pages using ivfflat (embedding vector_cosine_ops);
+-- The vector index is built once the table has data, sized to the row count:
+--   python main.py index build
+-- (see vector_index.sql). An ivfflat index created on an empty table gets
+-- poorly placed lists and degrades recall as rows are added.
 
 -- Create an index on metadata for faster filtering
 create index idx_crypto_api_site_pages_metadata on crypto_api_site_pages using gin (metadata);
@@ -51,10 +56,13 @@ begin
     summary,
     content,
     metadata,
-    1 - (crypto_api_site_pages.embedding <=> query_embedding) as similarity
+    -- Embeddings are unit length, so negative inner product equals cosine similarity
+    -(crypto_api_site_pages.embedding <#> query_embedding) as similarity
   from crypto_api_site_pages
   where metadata @> filter
-  order by crypto_api_site_pages.embedding <=> query_embedding
+    and enrichment_status = 'complete'
+    and embedding is not null
+  order by crypto_api_site_pages.embedding <#> query_embedding
   limit match_count;
 end;
 $$;
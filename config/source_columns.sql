@@ -0,0 +1,24 @@
+-- Promote source and category from metadata to real columns.
+--
+-- Filtering on metadata->>'source' cannot use a vector index: an ANN scan
+-- post-filters its candidates and often returns fewer than match_count rows
+-- for small providers. With a real column, `python main.py index build --per-source`
+-- builds a partial vector index per large source, and match_crypto_api_site_pages
+-- (vector_index.sql) searches it when the filter names a source. Smaller
+-- sources are ranked exactly through the btree index below.
+-- The crawler writes both columns; run this before vector_index.sql.
+
+alter table crypto_api_site_pages add column if not exists source text;
+alter table crypto_api_site_pages add column if not exists category text;
+
+-- Backfill rows written before the columns existed
+update crypto_api_site_pages
+set source = metadata->>'source',
+    category = metadata->>'category'
+where source is null;
+
+create index if not exists idx_crypto_api_site_pages_source_column
+  on crypto_api_site_pages (source);
+
+-- Superseded by the column index above (created by per_source_search.sql)
+drop index if exists idx_crypto_api_site_pages_source;
@@ -0,0 +1,84 @@
+-- Per-source summary used by the agent's list_available_apis tool.
+-- Kept up to date incrementally by a trigger on the page catalog, so reading
+-- it never scans the chunk table. Run after pages_catalog.sql.
+alter table crypto_api_pages add column if not exists category text;
+
+create table if not exists crypto_api_sources (
+    source text primary key,
+    category text not null default 'unknown',
+    page_count integer not null default 0,
+    chunk_count bigint not null default 0,
+    last_crawled_at timestamp with time zone,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- Apply the difference each catalog change makes to its source's totals
+create or replace function update_crypto_api_source_summary()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    update crypto_api_sources
+    set page_count = page_count - 1,
+        chunk_count = chunk_count - old.chunk_count,
+        updated_at = timezone('utc'::text, now())
+    where source = old.source;
+  end if;
+
+  if tg_op in ('INSERT', 'UPDATE') then
+    insert into crypto_api_sources (source, category, page_count, chunk_count, last_crawled_at)
+    values (new.source, coalesce(new.category, 'unknown'), 1, new.chunk_count, new.last_crawled_at)
+    on conflict (source) do update
+      set category = coalesce(new.category, crypto_api_sources.category),
+          page_count = crypto_api_sources.page_count + 1,
+          chunk_count = crypto_api_sources.chunk_count + excluded.chunk_count,
+          last_crawled_at = greatest(crypto_api_sources.last_crawled_at, excluded.last_crawled_at),
+          updated_at = timezone('utc'::text, now());
+  end if;
+
+  return null;
+end;
+$$;
+
+-- Only updates that can change the totals fire it; the crawler's last_seen_at
+-- touches on unchanged pages do not
+drop trigger if exists crypto_api_pages_source_summary on crypto_api_pages;
+create trigger crypto_api_pages_source_summary
+  after insert or update of source, category, chunk_count, last_crawled_at or delete on crypto_api_pages
+  for each row execute function update_crypto_api_source_summary();
+
+-- Backfill categories written into chunk metadata, then the summary itself
+update crypto_api_pages p
+set category = c.category
+from (
+    select distinct on (url) url, metadata->>'category' as category
+    from crypto_api_site_pages
+    where metadata ? 'category'
+    order by url, chunk_number
+) c
+where p.url = c.url and p.category is null;
+
+insert into crypto_api_sources (source, category, page_count, chunk_count, last_crawled_at)
+select
+    source,
+    coalesce(max(category), 'unknown'),
+    count(*),
+    sum(chunk_count),
+    max(last_crawled_at)
+from crypto_api_pages
+group by source
+on conflict (source) do update
+  set category = excluded.category,
+      page_count = excluded.page_count,
+      chunk_count = excluded.chunk_count,
+      last_crawled_at = excluded.last_crawled_at,
+      updated_at = timezone('utc'::text, now());
+
+alter table crypto_api_sources enable row level security;
+
+create policy "Allow public read access"
+  on crypto_api_sources
+  for select
+  to public
+  using (true);
@@ -0,0 +1,29 @@
+-- Per-source data version, bumped by the crawler whenever it writes chunks for a source.
+-- The RAG agent stamps cached retrieval results with these versions, so a recrawl
+-- automatically invalidates cached answers for that source.
+create table if not exists crypto_api_source_versions (
+    source text primary key,
+    version bigint not null default 0,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- Increment (or create) the version of a source and return the new value
+create or replace function bump_source_version(api_source text)
+returns bigint
+language sql
+as $$
+    insert into crypto_api_source_versions (source, version)
+    values (api_source, 1)
+    on conflict (source) do update
+        set version = crypto_api_source_versions.version + 1,
+            updated_at = timezone('utc'::text, now())
+    returning version;
+$$;
+
+alter table crypto_api_source_versions enable row level security;
+
+create policy "Allow public read access"
+  on crypto_api_source_versions
+  for select
+  to public
+  using (true);
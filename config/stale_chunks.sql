@@ -0,0 +1,104 @@
+-- Retire chunks that no longer belong to a page, and pages no longer on a provider's site.
+-- Run after source_columns.sql, pages_catalog.sql and enrichment_retries.sql.
+
+-- Delete a page's chunks that were not produced by its latest processing run,
+-- e.g. the old higher chunk numbers after a page shrank. Returns rows deleted.
+create or replace function retire_stale_chunks(page_url text, keep_chunk_numbers integer[])
+returns bigint
+language plpgsql
+as $$
+declare
+  affected bigint;
+begin
+  delete from crypto_api_site_pages
+  where url = page_url
+    and chunk_number <> all(keep_chunk_numbers);
+  get diagnostics affected = row_count;
+  return affected;
+end;
+$$;
+
+-- Near-duplicate chunks stored as links (metadata->'duplicate_of', see DEDUP_MODE)
+-- are looked up by the page they point at
+create index if not exists idx_crypto_api_site_pages_duplicate_of
+  on crypto_api_site_pages ((metadata->'duplicate_of'->>'url'))
+  where metadata ? 'duplicate_of';
+
+-- After a page's chunks were rewritten, clear the content hash of the pages
+-- whose links into it no longer point at a stored canonical chunk with the
+-- content they were linked against, so their next crawl re-processes them
+-- instead of skipping them as unchanged. Returns the number of pages invalidated.
+create or replace function invalidate_duplicate_links(page_url text)
+returns bigint
+language plpgsql
+as $$
+declare
+  affected bigint;
+begin
+  update crypto_api_pages
+  set content_hash = null
+  where content_hash is not null
+    and url in (
+      select d.url
+      from crypto_api_site_pages d
+      where d.metadata ? 'duplicate_of'
+        and d.metadata->'duplicate_of'->>'url' = page_url
+        and d.url <> page_url
+        and not exists (
+          select 1
+          from crypto_api_site_pages c
+          where c.url = page_url
+            and c.chunk_number = (d.metadata->'duplicate_of'->>'chunk_number')::integer
+            and c.enrichment_status <> 'duplicate'
+            and c.metadata->>'chunk_hash' = d.metadata->'duplicate_of'->>'chunk_hash'
+        )
+    );
+  get diagnostics affected = row_count;
+  return affected;
+end;
+$$;
+
+-- Delete every chunk and catalog row of a source whose URL was not discovered
+-- in the latest crawl. Returns the number of pages retired (or, with dry_run,
+-- the number that would be).
+create or replace function retire_unseen_pages(api_source text, seen_urls text[], dry_run boolean default false)
+returns bigint
+language plpgsql
+as $$
+declare
+  affected bigint;
+begin
+  -- not in (select unnest(...)) plans as a hashed anti-join over the seen URLs
+  select count(distinct url) into affected
+  from crypto_api_site_pages
+  where source = api_source
+    and url not in (select unnest(seen_urls));
+
+  if dry_run or affected = 0 then
+    return affected;
+  end if;
+
+  delete from crypto_api_site_pages
+  where source = api_source
+    and url not in (select unnest(seen_urls));
+
+  delete from crypto_api_pages
+  where source = api_source
+    and url not in (select unnest(seen_urls));
+
+  -- Pages left linking into the retired ones re-process on their next crawl
+  update crypto_api_pages
+  set content_hash = null
+  where source = api_source
+    and content_hash is not null
+    and url in (
+      select url
+      from crypto_api_site_pages
+      where source = api_source
+        and metadata ? 'duplicate_of'
+        and metadata->'duplicate_of'->>'url' not in (select unnest(seen_urls))
+    );
+
+  return affected;
+end;
+$$;
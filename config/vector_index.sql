@@ -0,0 +1,120 @@
+-- Vector index settings and the tuned search function
+--
+-- The vector index itself is built by `python main.py index build`, which picks
+-- HNSW or IVFFlat for the current row count, builds it concurrently with
+-- vector_ip_ops (embeddings are unit length, so inner product ranks like cosine
+-- at lower cost) and records its query-time settings in the table below.
+-- Run source_columns.sql and enrichment_retries.sql first.
+-- If EMBEDDING_DIMENSIONS is not 1536, replace 1536 below with that value.
+
+create table if not exists crypto_api_vector_index_settings (
+    id integer primary key default 1 check (id = 1),
+    method text not null,               -- 'hnsw' or 'ivfflat'
+    lists integer,                      -- ivfflat only
+    probes integer not null default 1,  -- ivfflat lists scanned per query
+    ef_search integer not null default 40,  -- hnsw candidate list size
+    row_count bigint not null,
+    built_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- One row per partial vector index (`index build --per-source`), sized and tuned for
+-- that source's rows; searches filtered to the source apply these settings instead
+create table if not exists crypto_api_vector_source_index_settings (
+    source text primary key,
+    index_name text not null,
+    method text not null,
+    lists integer,
+    probes integer not null default 1,
+    ef_search integer not null default 40,
+    row_count bigint not null,
+    built_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+-- Same signature as site_pages.sql; applies the recorded probes/ef_search per query.
+-- A source filter is inlined as a literal so the planner can use that source's
+-- partial vector index, or rank a source without one exactly, instead of
+-- post-filtering the global one.
+create or replace function match_crypto_api_site_pages (
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb DEFAULT '{}'::jsonb
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+  settings crypto_api_vector_index_settings;
+  source_settings crypto_api_vector_source_index_settings;
+  has_partial_index boolean;
+begin
+  select * into settings from crypto_api_vector_index_settings where id = 1;
+  if found then
+    -- HNSW returns at most ef_search rows, so widen it for large result sets
+    perform set_config('hnsw.ef_search', greatest(settings.ef_search, match_count * 2)::text, true);
+    perform set_config('ivfflat.probes', settings.probes::text, true);
+  end if;
+
+  if filter ? 'source' then
+    -- The source's partial index has its own lists, so its own probes/ef_search
+    select * into source_settings from crypto_api_vector_source_index_settings where source = filter->>'source';
+    has_partial_index := found;
+    if has_partial_index then
+      perform set_config('hnsw.ef_search', greatest(source_settings.ef_search, match_count * 2)::text, true);
+      perform set_config('ivfflat.probes', source_settings.probes::text, true);
+    end if;
+
+    -- Without a partial index, "+ 0" keeps the planner off the global index (which
+    -- would post-filter) so the source's rows are ranked exactly, as in per_source_search.sql
+    return query execute format(
+      'select p.id, p.url, p.chunk_number, p.title, p.summary, p.content, p.metadata,
+              -(p.embedding <#> $1) as similarity
+       from crypto_api_site_pages p
+       where p.source = %L and p.metadata @> $2 and p.enrichment_status = ''complete''
+         and p.embedding is not null
+       order by %s
+       limit $3',
+      filter->>'source',
+      case when has_partial_index then 'p.embedding <#> $1' else '(p.embedding <#> $1) + 0' end
+    ) using query_embedding, filter, match_count;
+    return;
+  end if;
+
+  return query
+  select
+    p.id, p.url, p.chunk_number, p.title, p.summary, p.content, p.metadata,
+    -(p.embedding <#> query_embedding) as similarity
+  from crypto_api_site_pages p
+  where p.metadata @> filter
+    and p.enrichment_status = 'complete'
+    and p.embedding is not null
+  order by p.embedding <#> query_embedding
+  limit match_count;
+end;
+$$;
+
+alter table crypto_api_vector_index_settings enable row level security;
+
+drop policy if exists "Allow public read access" on crypto_api_vector_index_settings;
+create policy "Allow public read access"
+  on crypto_api_vector_index_settings
+  for select
+  to public
+  using (true);
+
+alter table crypto_api_vector_source_index_settings enable row level security;
+
+drop policy if exists "Allow public read access" on crypto_api_vector_source_index_settings;
+create policy "Allow public read access"
+  on crypto_api_vector_source_index_settings
+  for select
+  to public
+  using (true);
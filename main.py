@@ -16,7 +16,8 @@ from typing import List, Optional
 # Import from our package
 from crypto_crawler.api.config import CryptoApiConfig, load_crypto_api_configs
 from crypto_crawler.crawling.url_extractor import get_crypto_api_urls
-from crypto_crawler.crawling.crawler import crawl_api_documentation
+from crypto_crawler.crawling.crawler import crawl_api_documentation, retire_unseen_pages, set_ingest_writer, INGEST_WRITERS
+from crypto_crawler.utils.pg_loader import close_pg_loader
 from crypto_crawler.utils.error_logger import logger
 
 def parse_args():
@@ -33,11 +34,15 @@ def parse_args():
     crawl_parser.add_argument("--api", help="API name to crawl (default: all)", default=None)
     crawl_parser.add_argument("--max-urls", type=int, help="Maximum URLs to crawl", default=100)
     crawl_parser.add_argument("--concurrency", type=int, help="Concurrency level", default=5)
+    crawl_parser.add_argument("--writer", choices=INGEST_WRITERS, help="How chunks are written (default: INGEST_WRITER)", default=None)
+    crawl_parser.add_argument("--sweep", action="store_true", help="Delete stored pages whose URLs were not discovered in this crawl")
     
     # Process command
     process_parser = subparsers.add_parser("process", help="Process crawled documentation")
     process_parser.add_argument("--api", help="API name to process (default: all)", default=None)
     process_parser.add_argument("--batch-size", type=int, help="Batch size for processing", default=10)
+    process_parser.add_argument("--force", action="store_true", help="Re-process pages even if they are already up to date")
+    process_parser.add_argument("--writer", choices=INGEST_WRITERS, help="How chunks are written (default: INGEST_WRITER)", default=None)
     
     # Explore command
     explore_parser = subparsers.add_parser("explore", help="Explore an API URL")
@@ -52,10 +57,31 @@ def parse_args():
     cleanup_parser.add_argument("--api", help="API name to clean up (default: all)", default=None)
     cleanup_parser.add_argument("--dry-run", action="store_true", help="Show what would be deleted without actually deleting")
     
+    # Index command
+    index_parser = subparsers.add_parser("index", help="Manage the vector index")
+    index_parser.add_argument("action", choices=["status", "build", "benchmark"], help="Show, (re)build or benchmark the index")
+    index_parser.add_argument("--method", choices=["auto", "hnsw", "ivfflat"], help="Index type to build", default="auto")
+    index_parser.add_argument("--k", type=int, help="Results per benchmark query", default=10)
+    index_parser.add_argument("--queries", type=int, help="Number of benchmark queries", default=50)
+    index_parser.add_argument("--target-recall", type=float, help="Recall the benchmark tunes ef_search/probes for", default=0.95)
+    index_parser.add_argument("--apply", action="store_true", help="Record the tuned ef_search/probes for searches")
+    index_parser.add_argument("--per-source", action="store_true", help="Also build partial indexes for large sources")
+    
+    # Backfill command
+    backfill_parser = subparsers.add_parser("backfill", help="Retry failed title/summary and embedding requests")
+    backfill_parser.add_argument("--api", help="API name to backfill (default: all)", default=None)
+    backfill_parser.add_argument("--batch-size", type=int, help="Tasks retried concurrently", default=20)
+    backfill_parser.add_argument("--limit", type=int, help="Maximum tasks to retry (default: all due)", default=None)
+    backfill_parser.add_argument("--retry-dead", action="store_true", help="Requeue dead-lettered tasks before draining")
+    
     return parser.parse_args()
 
-async def crawl_command(api_name: Optional[str] = None, max_urls: int = 100, concurrency: int = 5):
+async def crawl_command(api_name: Optional[str] = None, max_urls: int = 100, concurrency: int = 5, writer: Optional[str] = None,
+                        sweep: bool = False):
     """Run the crawl command."""
+    if writer:
+        set_ingest_writer(writer)
+    
     print("Loading API configurations...")
     configs = load_crypto_api_configs()
     print(f"Loaded {len(configs)} API configurations")
@@ -70,19 +96,42 @@ async def crawl_command(api_name: Optional[str] = None, max_urls: int = 100, con
     
     for config in configs:
         print(f"Crawling {config.name}...")
-        urls = await get_crypto_api_urls(config)
+        discovered_urls = await get_crypto_api_urls(config)
         
         # Limit the number of URLs to crawl
-        urls = urls[:max_urls]
+        urls = discovered_urls[:max_urls]
         
         print(f"Found {len(urls)} URLs for {config.name}. Starting crawl...")
         await crawl_api_documentation(config, urls, concurrency)
         print(f"Finished crawling {config.name}.")
+        
+        if sweep:
+            await sweep_unseen_pages(config.name, discovered_urls)
+    
+    await close_pg_loader()
+
+async def sweep_unseen_pages(api_name: str, discovered_urls: List[str]):
+    """Retire pages of an API that are no longer discovered, unless discovery looks broken."""
+    # Every discovered URL counts as seen, including those beyond --max-urls
+    if not discovered_urls:
+        print(f"Skipping sweep for {api_name}: no URLs discovered")
+        return
+    unseen = await retire_unseen_pages(api_name, discovered_urls, dry_run=True)
+    if unseen > len(discovered_urls):
+        # More pages vanishing than remain usually means a failed sitemap or link discovery
+        print(f"Skipping sweep for {api_name}: {unseen} stored pages were not discovered, "
+              f"more than the {len(discovered_urls)} discovered")
+        return
+    retired = await retire_unseen_pages(api_name, discovered_urls)
+    print(f"Retired {retired} pages of {api_name} that are no longer discovered")
 
-def process_command(api_name: Optional[str] = None, batch_size: int = 10):
-    """Run the process command."""
-    # This would be implemented to process the crawled documentation
-    print("Processing command not yet implemented.")
+async def process_command(api_name: Optional[str] = None, batch_size: int = 10, force: bool = False, writer: Optional[str] = None):
+    """Re-process stored documentation without fetching it again."""
+    from crypto_crawler.crawling.processor import reprocess_documents
+    if writer:
+        set_ingest_writer(writer)
+    await reprocess_documents(api_name, batch_size, force)
+    await close_pg_loader()
 
 async def explore_command(url: str, depth: int = 2):
     """Run the explore command."""
@@ -99,20 +148,41 @@ async def cleanup_command(api_name: Optional[str] = None, dry_run: bool = False)
     from crypto_crawler.utils.db_cleanup import cleanup_duplicates
     await cleanup_duplicates(api_name, dry_run)
 
+async def index_command(action: str, method: str = "auto", k: int = 10, queries: int = 50,
+                        target_recall: float = 0.95, apply: bool = False, per_source: bool = False):
+    """Manage the vector index."""
+    from crypto_crawler.utils.vector_index import manage_index
+    await manage_index(action, method, k, queries, target_recall, apply, per_source)
+
+async def backfill_command(api_name: Optional[str] = None, batch_size: int = 20, limit: Optional[int] = None,
+                           retry_dead: bool = False):
+    """Drain the enrichment retry queue."""
+    from crypto_crawler.crawling.backfill import backfill, requeue_dead_tasks
+    if retry_dead:
+        requeued = await requeue_dead_tasks(api_name)
+        print(f"Requeued {requeued} dead-lettered tasks")
+    stats = await backfill(api_name, batch_size, limit)
+    print(f"Backfill finished: {stats['completed']} completed, {stats['rescheduled']} rescheduled, "
+          f"{stats['dead']} dead-lettered")
+
 async def main():
     """Main entry point."""
     args = parse_args()
     
     if args.command == "crawl":
-        await crawl_command(args.api, args.max_urls, args.concurrency)
+        await crawl_command(args.api, args.max_urls, args.concurrency, args.writer, args.sweep)
     elif args.command == "process":
-        process_command(args.api, args.batch_size)
+        await process_command(args.api, args.batch_size, args.force, args.writer)
     elif args.command == "explore":
         await explore_command(args.url, args.depth)
     elif args.command == "generate-configs":
         generate_configs_command()
     elif args.command == "cleanup":
         await cleanup_command(args.api, args.dry_run)
+    elif args.command == "index":
+        await index_command(args.action, args.method, args.k, args.queries, args.target_recall, args.apply, args.per_source)
+    elif args.command == "backfill":
+        await backfill_command(args.api, args.batch_size, args.limit, args.retry_dead)
     else:
         print("Please specify a command. Use --help for more information.")
 
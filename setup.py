@@ -21,6 +21,8 @@ setup(
         "supabase>=2.11.0",
         "tiktoken>=0.8.0",
         "playwright>=1.49.0",
+        "zstandard>=0.23.0",
+        "numpy>=1.26.0",
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,166 @@
+"""
+Caches for the RAG agent's hot paths.
+
+The agent often embeds the same or nearly the same query several times within
+one run, and users repeat common questions. Caching those results removes a
+network round trip from the chat response path.
+"""
+
+import re
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return _WHITESPACE.sub(" ", query).strip().lower()
+
+class AsyncLRUCache:
+    """
+    LRU cache with per-entry TTL and singleflight request coalescing.
+
+    Concurrent lookups of the same missing key share a single in-flight
+    computation instead of each starting their own. Failed computations are
+    not cached. If the computing caller is cancelled (e.g. its client
+    disconnected), a waiting caller takes over the computation.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries kept
+            ttl: Seconds an entry stays valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or every entry when no key is given."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for a key, computing it at most once concurrently.
+
+        Args:
+            key: Cache key
+            compute: Coroutine factory producing the value on a miss
+
+        Returns:
+            The cached or freshly computed value
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None or inflight.get_loop() is not loop:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Only the computing caller was cancelled; retry, computing it here if nobody else has
+                if inflight.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        self.misses += 1
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate counters; coalesced lookups count as hits."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._entries),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
+
+class DataVersionTracker:
+    """
+    Tracks the per-source data versions written by the crawler.
+
+    Versions are read from ``crypto_api_source_versions`` at most once every
+    ``refresh_interval`` seconds. Cached retrieval results include the version
+    in their key, so results computed before a recrawl are never served after it.
+    """
+
+    def __init__(self, refresh_interval: float = 15.0):
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+
+    def _refresh(self, supabase):
+        """Reload versions when the local copy is older than refresh_interval."""
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+            return
+        try:
+            result = supabase.table("crypto_api_source_versions").select("source, version").execute()
+            self._versions = {row["source"]: row["version"] for row in result.data}
+        except Exception as e:
+            # Without the versions table, cached results still expire by TTL
+            print(f"Error loading source versions: {e}")
+        self._loaded_at = now
+
+    def stamp(self, supabase, source: Optional[str] = None) -> Hashable:
+        """Version stamp for one source, or for all sources when none is given."""
+        self._refresh(supabase)
+        if source is not None:
+            return self._versions.get(source, 0)
+        return tuple(sorted(self._versions.items()))
@@ -13,17 +13,44 @@ from openai import AsyncOpenAI
 from supabase import Client
 from typing import List, Dict, Any, Optional
 
+from crypto_crawler.api.cache import AsyncLRUCache, DataVersionTracker, normalize_query
+from crypto_crawler.api.replica import LocalVectorReplica
+from crypto_crawler.utils.db import execute, run_blocking
+from crypto_crawler.utils.embeddings import get_embedder
+
 load_dotenv()
 
 llm = os.getenv('LLM_MODEL', 'gpt-4o-mini')
 model = OpenAIModel(llm)
 
+# "default" searches full vectors; "binary" or "halfvec" retrieves candidates from a
+# quantized index and rescores them on full vectors (see config/quantized_search.sql)
+vector_search_mode = os.getenv('VECTOR_SEARCH_MODE', 'default').lower()
+rescore_candidates = int(os.getenv('RESCORE_CANDIDATES', '100'))
+
+# Fuse full-text and vector rankings for queries (see config/hybrid_search.sql)
+hybrid_search = os.getenv('HYBRID_SEARCH', 'true').lower() == 'true'
+
+# Query embeddings are reused across tool calls and across users asking the same question
+query_embedding_cache = AsyncLRUCache(
+    max_size=int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '86400'))
+)
+
+# Formatted retrieval results, keyed by query, API filter, match count and data version
+retrieval_cache = AsyncLRUCache(
+    max_size=int(os.getenv('RETRIEVAL_CACHE_SIZE', '512')),
+    ttl=float(os.getenv('RETRIEVAL_CACHE_TTL', '3600'))
+)
+data_versions = DataVersionTracker(refresh_interval=float(os.getenv('DATA_VERSION_REFRESH_SECONDS', '15')))
+
 logfire.configure(send_to_logfire='if-token-present')
 
 @dataclass
 class PydanticAIDeps:
     supabase: Client
     openai_client: AsyncOpenAI
+    replica: Optional[LocalVectorReplica] = None  # Local ANN replica used instead of the match RPC
 
 system_prompt = """
 You are a cryptocurrency API documentation expert. You have access to documentation from 20+ cryptocurrency 
@@ -58,65 +85,191 @@ crypto_api_expert = Agent(
 )
 
 async def get_embedding(text: str, openai_client: AsyncOpenAI) -> List[float]:
-    """Get embedding vector from OpenAI."""
-    try:
-        response = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error getting embedding: {e}")
-        return [0] * 1536  # Return zero vector on error
+    """
+    Get embedding vector from the configured embedding backend, via the query cache.
+    
+    Raises the backend's error on failure, so neither this cache nor the retrieval
+    cache ever stores a result computed from a missing embedding.
+    """
+    embedder = get_embedder(openai_client)
+    key = (embedder.model_name, embedder.dimensions, normalize_query(text))
+    return await query_embedding_cache.get_or_compute(key, lambda: embedder.embed(text))
 
-@crypto_api_expert.tool
-async def retrieve_relevant_documentation(ctx: RunContext[PydanticAIDeps], user_query: str, api_name: str = None) -> str:
+async def match_documents(
+    deps: PydanticAIDeps,
+    query_embedding: List[float],
+    match_count: int,
+    filter_obj: Dict[str, Any],
+    query_text: Optional[str] = None
+) -> List[Dict[str, Any]]:
     """
-    Retrieve relevant documentation chunks based on the query with RAG.
+    Search for matching chunks.
+    
+    Uses the local replica when configured, fusing its vector ranking with a
+    keyword ranking when query text is given and HYBRID_SEARCH is enabled.
+    Otherwise uses hybrid keyword + vector search in the database, or the
+    configured vector search mode.
+    """
+    supabase = deps.supabase
+    
+    if deps.replica is not None and set(filter_obj) <= {'source'}:
+        try:
+            await run_blocking(deps.replica.refresh_if_stale, supabase)
+            keyword_ids = None
+            if hybrid_search and query_text:
+                try:
+                    keyword_ids = [row['id'] for row in (await execute(supabase.rpc(
+                        'keyword_search_crypto_api_site_pages',
+                        {
+                            'query_text': query_text,
+                            'match_count': match_count * 4,
+                            'filter': filter_obj
+                        }
+                    ))).data]
+                except Exception as e:
+                    print(f"Keyword search failed, using vector search only: {e}")
+            
+            if keyword_ids is not None:
+                return await run_blocking(
+                    deps.replica.hybrid_match_documents,
+                    supabase, query_embedding, keyword_ids, match_count, filter_obj.get('source')
+                )
+            return await run_blocking(
+                deps.replica.match_documents, supabase, query_embedding, match_count, filter_obj.get('source')
+            )
+        except Exception as e:
+            print(f"Local replica search failed, falling back to Supabase: {e}")
+    
+    if hybrid_search and query_text:
+        try:
+            return (await execute(supabase.rpc(
+                'hybrid_search_crypto_api_site_pages',
+                {
+                    'query_text': query_text,
+                    'query_embedding': query_embedding,
+                    'match_count': match_count,
+                    'filter': filter_obj
+                }
+            ))).data
+        except Exception as e:
+            print(f"Hybrid search failed, falling back to vector search: {e}")
+    
+    if vector_search_mode in ('binary', 'halfvec'):
+        return (await execute(supabase.rpc(
+            'match_crypto_api_site_pages_quantized',
+            {
+                'query_embedding': query_embedding,
+                'match_count': match_count,
+                'filter': filter_obj,
+                'quantization': vector_search_mode,
+                'candidate_count': max(rescore_candidates, match_count)
+            }
+        ))).data
+    
+    return (await execute(supabase.rpc(
+        'match_crypto_api_site_pages',
+        {
+            'query_embedding': query_embedding,
+            'match_count': match_count,
+            'filter': filter_obj
+        }
+    ))).data
+
+async def match_documents_per_source(
+    deps: PydanticAIDeps,
+    query_embedding: List[float],
+    sources: Optional[List[str]] = None,
+    per_source_count: int = 1
+) -> List[Dict[str, Any]]:
+    """
+    Find the best matching chunks for each API source.
     
     Args:
-        ctx: The context including the Supabase client and OpenAI client
-        user_query: The user's question or query
-        api_name: Optional API name to filter results (e.g., "CoinGecko")
+        deps: Dependencies holding the Supabase client and optional local replica
+        query_embedding: The query vector
+        sources: API names to compare, or None for every source near the query
+        per_source_count: Matches returned per source
         
     Returns:
-        A formatted string containing the top 5 most relevant documentation chunks
+        List of rows with title, url, summary, a 300-character preview and similarity
     """
+    supabase = deps.supabase
+    
+    # The replica ranks each requested source by an exact scan, like the RPC
+    if deps.replica is not None:
+        try:
+            await run_blocking(deps.replica.refresh_if_stale, supabase)
+            return await run_blocking(
+                deps.replica.match_documents_per_source, supabase, query_embedding, sources, per_source_count
+            )
+        except Exception as e:
+            print(f"Local replica search failed, falling back to Supabase: {e}")
+    
     try:
-        # Get the embedding for the query
-        query_embedding = await get_embedding(user_query, ctx.deps.openai_client)
-        
-        # Prepare filter based on API name if provided
-        filter_obj = {}
-        if api_name:
-            filter_obj = {"source": api_name}
-        
-        # Query Supabase for relevant documents
-        result = ctx.deps.supabase.rpc(
-            'match_crypto_api_site_pages',
+        return (await execute(supabase.rpc(
+            'match_crypto_api_site_pages_per_source',
             {
                 'query_embedding': query_embedding,
-                'match_count': 5,
-                'filter': filter_obj
+                'sources': sources,
+                'per_source_count': per_source_count
             }
-        ).execute()
+        ))).data
+    except Exception as e:
+        print(f"Per-source search failed, falling back to filtered searches: {e}")
+    
+    # Without config/per_source_search.sql, run one filtered search per source
+    if sources:
+        results = await asyncio.gather(*[
+            match_documents(deps, query_embedding, per_source_count, {'source': source})
+            for source in sources
+        ])
+        documents = [doc for result in results for doc in result]
+    else:
+        documents = await match_documents(deps, query_embedding, 20, {})
+    
+    return [
+        {
+            'id': doc['id'],
+            'url': doc['url'],
+            'title': doc['title'],
+            'summary': doc['summary'],
+            'preview': doc['content'][:300],
+            'truncated': len(doc['content']) > 300,
+            'source': doc['metadata'].get('source'),
+            'similarity': doc['similarity']
+        }
+        for doc in documents
+    ]
+
+async def search_documentation(deps: PydanticAIDeps, user_query: str, api_name: Optional[str] = None, match_count: int = 5) -> str:
+    """Embed a query, search for matching chunks and format them for the agent."""
+    # Get the embedding for the query
+    query_embedding = await get_embedding(user_query, deps.openai_client)
+    
+    # Prepare filter based on API name if provided
+    filter_obj = {}
+    if api_name:
+        filter_obj = {"source": api_name}
+    
+    # Query Supabase for relevant documents, matching exact endpoint and parameter names too
+    documents = await match_documents(deps, query_embedding, match_count, filter_obj, query_text=user_query)
+    
+    if not documents:
+        if api_name:
+            return f"No relevant documentation found for {api_name}."
+        else:
+            return "No relevant documentation found."
         
-        if not result.data:
-            if api_name:
-                return f"No relevant documentation found for {api_name}."
-            else:
-                return "No relevant documentation found."
-            
-        # Format the results
-        formatted_chunks = []
-        for doc in result.data:
-            # Extract API name and similarity score
-            api_source = doc['metadata']['source']
-            similarity = doc['similarity']
-            similarity_percentage = round(similarity * 100, 2)
-            
-            # Format the chunk with proper markdown
-            chunk_text = f"""
+    # Format the results
+    formatted_chunks = []
+    for doc in documents:
+        # Extract API name and similarity score
+        api_source = doc['metadata']['source']
+        similarity = doc['similarity']
+        similarity_percentage = round(similarity * 100, 2)
+        
+        # Format the chunk with proper markdown
+        chunk_text = f"""
 # {doc['title']} (Relevance: {similarity_percentage}%)
 
 {doc['content']}
@@ -124,44 +277,76 @@ async def retrieve_relevant_documentation(ctx: RunContext[PydanticAIDeps], user_
 **Source**: {api_source} - [Documentation Link]({doc['url']})
 **Crawled**: {doc['metadata'].get('crawled_at', 'Unknown date')}
 """
-            formatted_chunks.append(chunk_text)
-            
-        # Join all chunks with a separator
-        return "\n\n---\n\n".join(formatted_chunks)
+        formatted_chunks.append(chunk_text)
+        
+    # Join all chunks with a separator
+    return "\n\n---\n\n".join(formatted_chunks)
+
+@crypto_api_expert.tool
+async def retrieve_relevant_documentation(ctx: RunContext[PydanticAIDeps], user_query: str, api_name: str = None) -> str:
+    """
+    Retrieve relevant documentation chunks based on the query with RAG.
+    Exact endpoint paths and parameter names in the query (e.g. "/coins/markets",
+    "vs_currency") are matched by keyword as well as by meaning.
+    
+    Args:
+        ctx: The context including the Supabase client and OpenAI client
+        user_query: The user's question or query
+        api_name: Optional API name to filter results (e.g., "CoinGecko")
+        
+    Returns:
+        A formatted string containing the top 5 most relevant documentation chunks
+    """
+    try:
+        # Cached results carry the source's data version, so a recrawl invalidates them
+        stamp = await run_blocking(data_versions.stamp, ctx.deps.supabase, api_name)
+        key = (normalize_query(user_query), api_name, 5, stamp)
+        return await retrieval_cache.get_or_compute(
+            key,
+            lambda: search_documentation(ctx.deps, user_query, api_name, 5)
+        )
         
     except Exception as e:
         print(f"Error retrieving documentation: {e}")
         return f"Error retrieving documentation: {str(e)}"
 
 @crypto_api_expert.tool
-async def list_documentation_pages(ctx: RunContext[PydanticAIDeps], api_name: str = None) -> List[str]:
+async def list_documentation_pages(ctx: RunContext[PydanticAIDeps], api_name: str = None, offset: int = 0, limit: int = 200) -> List[str]:
     """
     Retrieve a list of available crypto API documentation pages.
     
     Args:
         ctx: The context including the Supabase client
         api_name: Optional API name to filter results (e.g., "CoinGecko")
+        offset: Number of pages to skip, for paging through large APIs
+        limit: Maximum number of pages to return
         
     Returns:
-        List[str]: List of unique URLs for documentation pages
+        List[str]: List of unique URLs for documentation pages, sorted
     """
     try:
-        # Start building the query
-        query = ctx.deps.supabase.from_('crypto_api_site_pages').select('url, metadata')
+        # One catalog row per page (see config/pages_catalog.sql)
+        query = ctx.deps.supabase.from_('crypto_api_pages').select('url')
         
         # Apply filter if API name is provided
         if api_name:
-            query = query.eq('metadata->>source', api_name)
+            query = query.eq('source', api_name)
             
-        # Execute the query
-        result = query.execute()
+        result = await execute(query.order('url').range(offset, offset + limit - 1))
+        return [page['url'] for page in result.data]
+        
+    except Exception as e:
+        print(f"Page catalog unavailable, listing pages from chunks: {e}")
+    
+    try:
+        query = ctx.deps.supabase.from_('crypto_api_site_pages').select('url')
+        if api_name:
+            query = query.eq('metadata->>source', api_name)
+        result = await execute(query)
         
-        if not result.data:
-            return []
-            
         # Extract unique URLs
         urls = sorted(set(doc['url'] for doc in result.data))
-        return urls
+        return urls[offset:offset + limit]
         
     except Exception as e:
         print(f"Error retrieving documentation pages: {e}")
@@ -180,19 +365,35 @@ async def get_page_content(ctx: RunContext[PydanticAIDeps], url: str) -> str:
         str: The complete page content with all chunks combined in order
     """
     try:
+        # Check the page catalog first so unknown URLs cost a primary key lookup
+        page = None
+        try:
+            catalog = await execute(
+                ctx.deps.supabase.from_('crypto_api_pages')
+                .select('title, source')
+                .eq('url', url)
+                .limit(1)
+            )
+            if not catalog.data:
+                return f"No content found for URL: {url}"
+            page = catalog.data[0]
+        except Exception as e:
+            print(f"Page catalog unavailable: {e}")
+        
         # Query Supabase for all chunks of this URL, ordered by chunk_number
-        result = ctx.deps.supabase.from_('crypto_api_site_pages') \
-            .select('title, content, chunk_number, metadata') \
-            .eq('url', url) \
-            .order('chunk_number') \
-            .execute()
+        result = await execute(
+            ctx.deps.supabase.from_('crypto_api_site_pages')
+            .select('title, content, chunk_number, metadata')
+            .eq('url', url)
+            .order('chunk_number')
+        )
         
         if not result.data:
             return f"No content found for URL: {url}"
             
         # Format the page with its title and all chunks
-        page_title = result.data[0]['title'].split(' - ')[0]  # Get the main title
-        api_name = result.data[0]['metadata']['source']
+        page_title = (page and page['title']) or result.data[0]['title'].split(' - ')[0]  # Get the main title
+        api_name = page['source'] if page else result.data[0]['metadata']['source']
         formatted_content = [f"# {page_title}\n\nAPI: {api_name}\nURL: {url}\n"]
         
         # Add each chunk's content, preserving code blocks and formatting
@@ -206,6 +407,18 @@ async def get_page_content(ctx: RunContext[PydanticAIDeps], url: str) -> str:
         print(f"Error retrieving page content: {e}")
         return f"Error retrieving page content: {str(e)}"
 
+def format_apis_by_category(apis_by_category: Dict[str, set]) -> str:
+    """Format API names grouped by category as a markdown list."""
+    formatted_result = ["# Available Cryptocurrency APIs\n"]
+    
+    for category, apis in sorted(apis_by_category.items()):
+        formatted_result.append(f"## {category.replace('_', ' ').title()}")
+        for api in sorted(apis):
+            formatted_result.append(f"- {api}")
+        formatted_result.append("")
+        
+    return "\n".join(formatted_result)
+
 @crypto_api_expert.tool
 async def list_available_apis(ctx: RunContext[PydanticAIDeps]) -> str:
     """
@@ -218,17 +431,33 @@ async def list_available_apis(ctx: RunContext[PydanticAIDeps]) -> str:
         str: Formatted list of available APIs with their categories
     """
     try:
+        # Per-source summary maintained at ingest (see config/source_summary.sql)
+        try:
+            summary = await execute(
+                ctx.deps.supabase.from_('crypto_api_sources')
+                .select('source, category, page_count')
+                .gt('page_count', 0)
+            )
+            if summary.data:
+                apis_by_category = {}
+                for item in summary.data:
+                    apis_by_category.setdefault(item['category'], set()).add(
+                        f"{item['source']} ({item['page_count']} pages)"
+                    )
+                return format_apis_by_category(apis_by_category)
+        except Exception as e:
+            print(f"Source summary unavailable, querying chunks: {e}")
+        
         # Query Supabase for distinct API sources and categories
         # Using a more efficient query to get distinct values
-        result = ctx.deps.supabase.rpc(
-            'get_distinct_api_sources'
-        ).execute()
+        result = await execute(ctx.deps.supabase.rpc('get_distinct_api_sources'))
         
         if not result.data or len(result.data) == 0:
             # Fallback to manual extraction if the RPC function doesn't exist
-            result = ctx.deps.supabase.from_('crypto_api_site_pages') \
-                .select('metadata') \
-                .execute()
+            result = await execute(
+                ctx.deps.supabase.from_('crypto_api_site_pages')
+                .select('metadata')
+            )
             
             if not result.data:
                 return "No APIs found in the database."
@@ -264,16 +493,7 @@ async def list_available_apis(ctx: RunContext[PydanticAIDeps]) -> str:
                     
                 apis_by_category[category].add(api_name)
         
-        # Format the results
-        formatted_result = ["# Available Cryptocurrency APIs\n"]
-        
-        for category, apis in sorted(apis_by_category.items()):
-            formatted_result.append(f"## {category.replace('_', ' ').title()}")
-            for api in sorted(apis):
-                formatted_result.append(f"- {api}")
-            formatted_result.append("")
-            
-        return "\n".join(formatted_result)
+        return format_apis_by_category(apis_by_category)
         
     except Exception as e:
         print(f"Error listing available APIs: {e}")
@@ -296,41 +516,12 @@ async def compare_api_endpoints(ctx: RunContext[PydanticAIDeps], endpoint_descri
         # Get the embedding for the endpoint description
         query_embedding = await get_embedding(endpoint_description, ctx.deps.openai_client)
         
-        # Prepare filter based on API names if provided
-        filter_obj = {}
-        if api_names and len(api_names) > 0:
-            # We can't directly filter on an array in the RPC call
-            # So we'll filter after getting results
-            pass
-        
-        # Query Supabase for relevant documents
-        result = ctx.deps.supabase.rpc(
-            'match_crypto_api_site_pages',
-            {
-                'query_embedding': query_embedding,
-                'match_count': 20,  # Get more results to filter
-                'filter': filter_obj
-            }
-        ).execute()
+        # Best match for each API, ranked server-side per source
+        documents = await match_documents_per_source(ctx.deps, query_embedding, api_names or None)
         
-        if not result.data:
-            return f"No relevant endpoints found for '{endpoint_description}'."
-        
-        # Filter by API names if provided
-        if api_names and len(api_names) > 0:
-            filtered_data = [
-                doc for doc in result.data 
-                if doc['metadata'].get('source') in api_names
-            ]
-            if filtered_data:
-                result.data = filtered_data
-        
-        # Group by API and select the most relevant endpoint for each
         apis_endpoints = {}
-        for doc in result.data:
-            api_name = doc['metadata']['source']
-            
-            # Only keep the most relevant endpoint for each API
+        for doc in documents:
+            api_name = doc['source']
             if api_name not in apis_endpoints or doc['similarity'] > apis_endpoints[api_name]['similarity']:
                 apis_endpoints[api_name] = doc
         
@@ -351,7 +542,7 @@ async def compare_api_endpoints(ctx: RunContext[PydanticAIDeps], endpoint_descri
             formatted_result.append(f"**Summary**: {summary}")
             
             # Add a snippet of the content (first 300 characters)
-            content_preview = doc['content'][:300] + "..." if len(doc['content']) > 300 else doc['content']
+            content_preview = doc['preview'] + "..." if doc['truncated'] else doc['preview']
             formatted_result.append(f"**Preview**:\n```\n{content_preview}\n```\n")
         
         return "\n".join(formatted_result)
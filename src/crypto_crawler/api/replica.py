@@ -0,0 +1,660 @@
+"""
+In-process read replica of the chunk embedding index.
+
+The replica keeps a snapshot of chunk ids, sources and embeddings on local
+disk, memory-maps the embeddings, and searches them with an IVF (inverted
+file) index built by spherical k-means. Only the content of the final
+matches is fetched from Supabase, by id, so a retrieval costs one indexed
+lookup instead of a pgvector scan.
+
+The snapshot is refreshed incrementally from ``updated_at`` and the deletion
+log (see config/replica_changes.sql): a changed chunk's old vector is retired
+and its new one appended, and deleted chunks are retired. Both timestamps are
+taken when the writing transaction starts, so a row can become visible after
+rows stamped later than it were read; each refresh re-reads a window before
+its cursors and skips the rows it already applied. Once retired rows make up
+a large share of the files, the next refresh rebuilds them.
+
+One replica object is shared by every session of the UI. Refreshes are
+serialized by a lock and build the next snapshot off to the side; searches
+read whichever snapshot was current when they started. Only one process
+should use a replica directory at a time.
+"""
+
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from supabase import Client
+
+IDS_FILE = "ids.npy"
+SOURCE_CODES_FILE = "source_codes.npy"
+ALIVE_FILE = "alive.npy"
+CENTROIDS_FILE = "centroids.npy"
+ASSIGNMENTS_FILE = "assignments.npy"
+STATE_FILE = "state.json"
+STATE_FORMAT = 3
+
+MIN_ROWS_FOR_IVF = 2000     # Below this, exact search is already fast
+KMEANS_SAMPLE_SIZE = 20000  # Rows used to train centroids
+KMEANS_ITERATIONS = 10
+PAGE_SIZE = 1000            # Rows per Supabase request during refresh
+COMPACT_RATIO = 0.25        # Rebuild once this share of rows is retired
+
+def _parse_embedding(value: Any) -> List[float]:
+    """PostgREST returns pgvector values as "[x,y,...]" strings."""
+    return json.loads(value) if isinstance(value, str) else value
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so inner product equals cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse a PostgREST timestamptz ("2024-01-01T00:00:00.123+00:00")."""
+    return datetime.fromisoformat(value)
+
+def _recent(entries: Dict[str, str], cursor: Optional[str], window: timedelta) -> Dict[str, str]:
+    """Keep the entries stamped within the window before the cursor."""
+    if cursor is None:
+        return {}
+    cutoff = _parse_timestamp(cursor) - window
+    return {key: stamp for key, stamp in entries.items() if _parse_timestamp(stamp) >= cutoff}
+
+def _empty_state() -> Dict[str, Any]:
+    return {
+        "format": STATE_FORMAT,
+        "generation": 0,
+        "dimensions": None,
+        "count": 0,
+        "retired": 0,
+        "sources": [],
+        "last_updated_at": None,
+        "applied_updates": {},
+        "last_deleted_at": None,
+        "applied_deletions": {},
+        "trained_count": 0
+    }
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """An immutable view of the replica; refreshes replace it rather than change it."""
+    ids: np.ndarray
+    source_codes: np.ndarray
+    alive: np.ndarray
+    sources: Tuple[str, ...]
+    embeddings: Optional[np.ndarray]
+    centroids: Optional[np.ndarray]
+    assignments: np.ndarray
+    list_order: np.ndarray
+    list_offsets: np.ndarray
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+_EMPTY_SNAPSHOT = _Snapshot(
+    ids=np.zeros(0, dtype=np.int64),
+    source_codes=np.zeros(0, dtype=np.int32),
+    alive=np.zeros(0, dtype=bool),
+    sources=(),
+    embeddings=None,
+    centroids=None,
+    assignments=np.zeros(0, dtype=np.int32),
+    list_order=np.zeros(0, dtype=np.int64),
+    list_offsets=np.zeros(1, dtype=np.int64)
+)
+
+def _inverted_lists(assignments: np.ndarray, alive: np.ndarray, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Group the live row numbers by centroid for fast list scans."""
+    rows = np.nonzero(alive)[0]
+    order = rows[np.argsort(assignments[rows], kind="stable")]
+    counts = np.bincount(assignments[rows], minlength=nlist)
+    return order, np.concatenate([[0], np.cumsum(counts)])
+
+class LocalVectorReplica:
+    """Memory-mapped IVF replica of the ``crypto_api_site_pages`` embeddings."""
+
+    def __init__(self, directory: str, nprobe: int = 8, refresh_interval: float = 300.0, change_window: float = 300.0):
+        """
+        Initialize the replica.
+
+        Args:
+            directory: Directory holding the snapshot files
+            nprobe: Number of IVF lists scanned per query
+            refresh_interval: Minimum seconds between incremental refreshes
+            change_window: Seconds before the cursors re-read on each refresh;
+                must exceed the longest transaction writing chunks
+        """
+        self.directory = directory
+        self.nprobe = nprobe
+        self.refresh_interval = refresh_interval
+        self.change_window = timedelta(seconds=change_window)
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._state = _empty_state()
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def _embeddings_file(generation: int) -> str:
+        return f"embeddings.{generation}.f32"
+
+    @property
+    def count(self) -> int:
+        """Number of live chunks in the replica."""
+        return self._state["count"] - self._state["retired"]
+
+    def _load(self):
+        """Load the snapshot from disk, if one exists in the current format."""
+        if not os.path.exists(self._path(STATE_FILE)):
+            return
+        with open(self._path(STATE_FILE), "r") as f:
+            state = json.load(f)
+        if state.get("format") != STATE_FORMAT:
+            # Written by an older version; the next refresh loads everything again
+            for name in os.listdir(self.directory):
+                if name.startswith("embeddings.") and name.endswith(".f32"):
+                    os.remove(self._path(name))
+            return
+
+        centroids = assignments = None
+        if os.path.exists(self._path(CENTROIDS_FILE)):
+            centroids = np.load(self._path(CENTROIDS_FILE))
+            assignments = np.load(self._path(ASSIGNMENTS_FILE))
+        self._state = state
+        self._snapshot = self._make_snapshot(
+            state,
+            np.load(self._path(IDS_FILE)),
+            np.load(self._path(SOURCE_CODES_FILE)),
+            np.load(self._path(ALIVE_FILE)),
+            centroids,
+            assignments
+        )
+
+    def _map_embeddings(self, state: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Memory-map the embeddings file of a state."""
+        if state["count"] == 0:
+            return None
+        return np.memmap(
+            self._path(self._embeddings_file(state["generation"])),
+            dtype=np.float32,
+            mode="r",
+            shape=(state["count"], state["dimensions"])
+        )
+
+    def _make_snapshot(
+        self,
+        state: Dict[str, Any],
+        ids: np.ndarray,
+        source_codes: np.ndarray,
+        alive: np.ndarray,
+        centroids: Optional[np.ndarray],
+        assignments: Optional[np.ndarray]
+    ) -> _Snapshot:
+        """Assemble a snapshot, building its inverted lists."""
+        if centroids is None:
+            assignments = np.zeros(0, dtype=np.int32)
+            list_order, list_offsets = _EMPTY_SNAPSHOT.list_order, _EMPTY_SNAPSHOT.list_offsets
+        else:
+            list_order, list_offsets = _inverted_lists(assignments, alive, len(centroids))
+        return _Snapshot(
+            ids=ids,
+            source_codes=source_codes,
+            alive=alive,
+            sources=tuple(state["sources"]),
+            embeddings=self._map_embeddings(state),
+            centroids=centroids,
+            assignments=assignments,
+            list_order=list_order,
+            list_offsets=list_offsets
+        )
+
+    def _save_array(self, name: str, array: np.ndarray):
+        """Write an array next to its file and move it into place."""
+        temp_path = self._path(name + ".tmp")
+        with open(temp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(temp_path, self._path(name))
+
+    def _save(self, state: Dict[str, Any], snapshot: _Snapshot):
+        """Persist the small index files and state; embeddings are appended in place."""
+        self._save_array(IDS_FILE, snapshot.ids)
+        self._save_array(SOURCE_CODES_FILE, snapshot.source_codes)
+        self._save_array(ALIVE_FILE, snapshot.alive)
+        if snapshot.centroids is not None:
+            self._save_array(CENTROIDS_FILE, snapshot.centroids)
+            self._save_array(ASSIGNMENTS_FILE, snapshot.assignments)
+        elif os.path.exists(self._path(CENTROIDS_FILE)):
+            os.remove(self._path(CENTROIDS_FILE))
+            os.remove(self._path(ASSIGNMENTS_FILE))
+        temp_path = self._path(STATE_FILE + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self._path(STATE_FILE))
+
+    def rebuild(self, supabase: Client) -> int:
+        """
+        Load every chunk into a fresh set of files.
+
+        Searches keep using the current snapshot until the new one is complete.
+
+        Returns:
+            Number of chunks loaded
+        """
+        with self._lock:
+            return self._rebuild(supabase)
+
+    def _rebuild(self, supabase: Client) -> int:
+        old_file = self._embeddings_file(self._state["generation"])
+        state = _empty_state()
+        state["generation"] = self._state["generation"] + 1
+        if os.path.exists(self._path(self._embeddings_file(state["generation"]))):
+            os.remove(self._path(self._embeddings_file(state["generation"])))
+
+        added = self._apply_changes(supabase, state, _EMPTY_SNAPSHOT)
+        try:
+            # Searches still reading the old file keep it open (POSIX); elsewhere it is left behind
+            os.remove(self._path(old_file))
+        except OSError:
+            pass
+        return added
+
+    def refresh(self, supabase: Client) -> int:
+        """
+        Apply the chunks changed and deleted since the last refresh.
+
+        Returns:
+            Number of chunk vectors added
+        """
+        with self._lock:
+            return self._refresh(supabase)
+
+    def _refresh(self, supabase: Client) -> int:
+        added = self._apply_changes(supabase, json.loads(json.dumps(self._state)), self._snapshot)
+        if self._state["retired"] > COMPACT_RATIO * self._state["count"]:
+            added = self._rebuild(supabase)
+        return added
+
+    def refresh_if_stale(self, supabase: Client) -> int:
+        """Refresh when the last refresh is older than refresh_interval."""
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return 0
+        with self._lock:
+            # Another thread may have refreshed while this one waited for the lock
+            if time.monotonic() - self._last_refresh < self.refresh_interval:
+                return 0
+            return self._refresh(supabase)
+
+    def _fetch_changes(self, supabase: Client, state: Dict[str, Any]) -> Tuple[Dict[int, Tuple[Optional[list], str]], List[int]]:
+        """
+        Read the rows updated and the ids deleted since the state's cursors.
+
+        Rows and deletions stamped within change_window before a cursor are read
+        again, since their transactions may have committed after the last refresh;
+        the ones already applied are skipped. Advances the cursors in ``state``.
+
+        Returns:
+            Changed rows as {id: (embedding or None when unsearchable, source)},
+            and the deleted ids
+        """
+        since = state["last_updated_at"]
+        applied = state["applied_updates"]
+        changed: Dict[int, Tuple[Optional[list], str]] = {}
+        start = 0
+        while True:
+            query = supabase.table("crypto_api_site_pages") \
+                .select("id, updated_at, source, embedding, enrichment_status")
+            if since:
+                query = query.gte("updated_at", (_parse_timestamp(since) - self.change_window).isoformat())
+            result = query.order("updated_at").order("id").range(start, start + PAGE_SIZE - 1).execute()
+
+            for row in result.data:
+                key = str(row["id"])
+                if applied.get(key) == row["updated_at"]:
+                    continue
+                applied[key] = row["updated_at"]
+                searchable = row["embedding"] is not None and row["enrichment_status"] == "complete"
+                changed[row["id"]] = (
+                    _parse_embedding(row["embedding"]) if searchable else None,
+                    row.get("source") or "unknown"
+                )
+                cursor = state["last_updated_at"]
+                if cursor is None or _parse_timestamp(row["updated_at"]) > _parse_timestamp(cursor):
+                    state["last_updated_at"] = row["updated_at"]
+
+            if len(result.data) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+        state["applied_updates"] = _recent(applied, state["last_updated_at"], self.change_window)
+
+        since = state["last_deleted_at"]
+        applied = state["applied_deletions"]
+        deleted: List[int] = []
+        start = 0
+        while True:
+            query = supabase.table("crypto_api_site_pages_deletions") \
+                .select("seq, chunk_id, deleted_at")
+            if since:
+                query = query.gte("deleted_at", (_parse_timestamp(since) - self.change_window).isoformat())
+            result = query.order("seq").range(start, start + PAGE_SIZE - 1).execute()
+
+            for row in result.data:
+                key = str(row["seq"])
+                if key in applied:
+                    continue
+                applied[key] = row["deleted_at"]
+                deleted.append(row["chunk_id"])
+                cursor = state["last_deleted_at"]
+                if cursor is None or _parse_timestamp(row["deleted_at"]) > _parse_timestamp(cursor):
+                    state["last_deleted_at"] = row["deleted_at"]
+
+            if len(result.data) < PAGE_SIZE:
+                break
+            start += PAGE_SIZE
+        state["applied_deletions"] = _recent(applied, state["last_deleted_at"], self.change_window)
+
+        return changed, deleted
+
+    def _apply_changes(self, supabase: Client, state: Dict[str, Any], base: _Snapshot) -> int:
+        """
+        Build the next snapshot from a base snapshot and the changes since it, then swap it in.
+
+        Returns:
+            Number of chunk vectors added
+        """
+        changed, deleted = self._fetch_changes(supabase, state)
+        added_ids = [chunk_id for chunk_id, (embedding, _) in changed.items() if embedding is not None]
+
+        if added_ids and state["dimensions"] is not None and len(changed[added_ids[0]][0]) != state["dimensions"]:
+            # The embedding size was migrated; none of the stored vectors are comparable
+            return self._rebuild(supabase)
+
+        # Changed rows replace their previous vector; deleted rows leave
+        alive = base.alive.copy()
+        if changed:
+            alive &= ~np.isin(base.ids, np.fromiter(changed, dtype=np.int64))
+
+        ids, source_codes, assignments, centroids = base.ids, base.source_codes, base.assignments, base.centroids
+        if added_ids:
+            vectors = _normalize(np.asarray([changed[chunk_id][0] for chunk_id in added_ids], dtype=np.float32))
+            state["dimensions"] = int(vectors.shape[1])
+            # Rows beyond a snapshot's count are invisible to it, so appending is safe while it is searched
+            with open(self._path(self._embeddings_file(state["generation"])), "ab") as f:
+                f.write(vectors.tobytes())
+
+            sources = state["sources"]
+            for _, source in changed.values():
+                if source not in sources:
+                    sources.append(source)
+            codes = [sources.index(changed[chunk_id][1]) for chunk_id in added_ids]
+            ids = np.concatenate([ids, np.asarray(added_ids, dtype=np.int64)])
+            source_codes = np.concatenate([source_codes, np.asarray(codes, dtype=np.int32)])
+            alive = np.concatenate([alive, np.ones(len(added_ids), dtype=bool)])
+            if centroids is not None:
+                assignments = np.concatenate([assignments, self._assign(centroids, vectors)])
+            state["count"] = len(ids)
+
+        if deleted:
+            alive &= ~np.isin(ids, np.asarray(deleted, dtype=np.int64))
+        state["retired"] = int(len(alive) - alive.sum())
+
+        live = len(alive) - state["retired"]
+        if added_ids and live >= MIN_ROWS_FOR_IVF and live >= 2 * state["trained_count"]:
+            # Retrain when the corpus has doubled since the centroids were built
+            embeddings = self._map_embeddings(state)
+            centroids, assignments = self._train(embeddings, alive)
+            state["trained_count"] = live
+
+        snapshot = self._make_snapshot(state, ids, source_codes, alive, centroids, assignments)
+        if added_ids or changed or deleted or base is _EMPTY_SNAPSHOT:
+            self._save(state, snapshot)
+        self._state = state
+        self._snapshot = snapshot
+        self._last_refresh = time.monotonic()
+        return len(added_ids)
+
+    @staticmethod
+    def _assign(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """Nearest centroid for each vector."""
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _train(self, embeddings: np.ndarray, alive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Train IVF centroids on live rows with spherical k-means and assign every row."""
+        live_rows = np.nonzero(alive)[0]
+        nlist = int(min(4096, max(1, np.sqrt(len(live_rows)))))
+        rng = np.random.default_rng(0)
+        sample_rows = rng.choice(live_rows, size=min(len(live_rows), KMEANS_SAMPLE_SIZE), replace=False)
+        sample = np.asarray(embeddings[np.sort(sample_rows)])
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+
+        # Assign in blocks to keep the working set small
+        assignments = np.concatenate([
+            self._assign(centroids, np.asarray(embeddings[i:i + 50000]))
+            for i in range(0, len(embeddings), 50000)
+        ])
+        return centroids, assignments
+
+    def search(self, query_embedding: List[float], k: int, source: Optional[str] = None) -> List[Tuple[int, float]]:
+        """
+        Find the chunks most similar to a query embedding.
+
+        Args:
+            query_embedding: The query vector
+            k: Number of results
+            source: Optional API name to restrict results to
+
+        Returns:
+            List of (chunk id, cosine similarity), best first
+        """
+        snapshot = self._snapshot
+        if snapshot.count == 0:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+
+        if source is not None:
+            if source not in snapshot.sources:
+                return []
+            # Filtered searches scan every row of the source, so they always return k rows when available
+            rows = np.nonzero((snapshot.source_codes == snapshot.sources.index(source)) & snapshot.alive)[0]
+        elif snapshot.centroids is None:
+            rows = np.nonzero(snapshot.alive)[0]
+        else:
+            probes = np.argsort(-(snapshot.centroids @ query))[:self.nprobe]
+            rows = np.concatenate([
+                snapshot.list_order[snapshot.list_offsets[p]:snapshot.list_offsets[p + 1]] for p in probes
+            ])
+
+        if len(rows) == 0:
+            return []
+        rows = np.sort(rows)  # Sequential reads from the memory map
+        scores = np.asarray(snapshot.embeddings[rows] @ query)
+        top = np.argsort(-scores)[:k] if len(scores) <= k else np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(snapshot.ids[rows[i]]), float(scores[i])) for i in top]
+
+    def similarities(self, query_embedding: List[float], chunk_ids: Sequence[int]) -> Dict[int, float]:
+        """Cosine similarity of a query to each of the given chunks held by the replica."""
+        snapshot = self._snapshot
+        if snapshot.count == 0 or not chunk_ids:
+            return {}
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        rows = np.nonzero(np.isin(snapshot.ids, np.asarray(chunk_ids, dtype=np.int64)) & snapshot.alive)[0]
+        scores = np.asarray(snapshot.embeddings[rows] @ query)
+        return {int(snapshot.ids[row]): float(score) for row, score in zip(rows, scores)}
+
+    @staticmethod
+    def _fetch_rows(supabase: Client, chunk_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch chunks from Supabase by id."""
+        result = supabase.table("crypto_api_site_pages") \
+            .select("id, url, chunk_number, title, summary, content, metadata") \
+            .in_("id", chunk_ids) \
+            .execute()
+        return {row["id"]: row for row in result.data}
+
+    def match_documents(self, supabase: Client, query_embedding: List[float], match_count: int, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search the replica and fetch the matching chunks from Supabase by id.
+
+        Returns rows shaped like the ``match_crypto_api_site_pages`` RPC result.
+        """
+        # Ask for a few extra ids in case some were deleted since the snapshot
+        matches = self.search(query_embedding, match_count * 2, source)
+        if not matches:
+            return []
+
+        similarities = dict(matches)
+        rows = []
+        for row in self._fetch_rows(supabase, list(similarities)).values():
+            row["similarity"] = similarities[row["id"]]
+            rows.append(row)
+        rows.sort(key=lambda row: row["similarity"], reverse=True)
+        return rows[:match_count]
+
+    def hybrid_match_documents(
+        self,
+        supabase: Client,
+        query_embedding: List[float],
+        keyword_ids: List[int],
+        match_count: int,
+        source: Optional[str] = None,
+        full_text_weight: float = 1.0,
+        semantic_weight: float = 1.0,
+        rrf_k: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse the replica's vector ranking with a keyword ranking by reciprocal rank fusion.
+
+        Mirrors ``hybrid_search_crypto_api_site_pages`` (config/hybrid_search.sql),
+        with the vector ranking computed locally.
+
+        Args:
+            supabase: Supabase client used to fetch the fused matches
+            query_embedding: The query vector
+            keyword_ids: Chunk ids ranked by ``keyword_search_crypto_api_site_pages``, best first
+            match_count: Number of results
+            source: Optional API name to restrict the vector ranking to
+
+        Returns:
+            Rows shaped like the hybrid RPC result, best score first
+        """
+        semantic = self.search(query_embedding, match_count * 4, source)
+        semantic_ranks = {chunk_id: rank for rank, (chunk_id, _) in enumerate(semantic, start=1)}
+        keyword_ranks = {chunk_id: rank for rank, chunk_id in enumerate(keyword_ids, start=1)}
+
+        scores = {}
+        for chunk_id in semantic_ranks.keys() | keyword_ranks.keys():
+            score = 0.0
+            if chunk_id in keyword_ranks:
+                score += full_text_weight / (rrf_k + keyword_ranks[chunk_id])
+            if chunk_id in semantic_ranks:
+                score += semantic_weight / (rrf_k + semantic_ranks[chunk_id])
+            scores[chunk_id] = score
+        # A few extra ids in case some were deleted since the snapshot
+        top_ids = sorted(scores, key=scores.get, reverse=True)[:match_count * 2]
+        if not top_ids:
+            return []
+
+        similarities = dict(semantic)
+        similarities.update(self.similarities(query_embedding, [i for i in top_ids if i not in similarities]))
+        rows = []
+        for chunk_id, row in self._fetch_rows(supabase, top_ids).items():
+            if chunk_id not in similarities:
+                # Keyword match changed since the replica's last refresh
+                continue
+            row["similarity"] = similarities[chunk_id]
+            row["keyword_rank"] = keyword_ranks.get(chunk_id)
+            row["semantic_rank"] = semantic_ranks.get(chunk_id)
+            row["score"] = scores[chunk_id]
+            rows.append(row)
+        rows.sort(key=lambda row: row["score"], reverse=True)
+        return rows[:match_count]
+
+    def match_documents_per_source(
+        self,
+        supabase: Client,
+        query_embedding: List[float],
+        sources: Optional[List[str]] = None,
+        per_source_count: int = 1,
+        preview_length: int = 300,
+        candidate_count: int = 200
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the best chunks for each source and fetch them from Supabase by id.
+
+        Mirrors ``match_crypto_api_site_pages_per_source`` (config/per_source_search.sql):
+        requested sources are each ranked by an exact scan of their rows; with no
+        sources, every source among the candidate_count nearest chunks is compared.
+
+        Returns:
+            Rows shaped like the per-source RPC result, ordered by source and similarity
+        """
+        if sources:
+            matches = [
+                (chunk_id, similarity, source)
+                for source in sources
+                for chunk_id, similarity in self.search(query_embedding, per_source_count, source)
+            ]
+        else:
+            candidates = self.search(query_embedding, candidate_count)
+            snapshot = self._snapshot
+            rows = np.nonzero(np.isin(snapshot.ids, [chunk_id for chunk_id, _ in candidates]) & snapshot.alive)[0]
+            source_of = {int(snapshot.ids[row]): snapshot.sources[snapshot.source_codes[row]] for row in rows}
+            taken: Dict[str, int] = {}
+            matches = []
+            for chunk_id, similarity in candidates:
+                source = source_of[chunk_id]
+                if taken.get(source, 0) < per_source_count:
+                    taken[source] = taken.get(source, 0) + 1
+                    matches.append((chunk_id, similarity, source))
+        if not matches:
+            return []
+
+        fetched = self._fetch_rows(supabase, [chunk_id for chunk_id, _, _ in matches])
+        results = []
+        for chunk_id, similarity, source in matches:
+            row = fetched.get(chunk_id)
+            if row is None:
+                continue
+            results.append({
+                "id": chunk_id,
+                "url": row["url"],
+                "title": row["title"],
+                "summary": row["summary"],
+                "preview": row["content"][:preview_length],
+                "truncated": len(row["content"]) > preview_length,
+                "source": source,
+                "similarity": similarity
+            })
+        results.sort(key=lambda row: (row["source"], -row["similarity"]))
+        return results
+
+def load_replica_from_env() -> Optional[LocalVectorReplica]:
+    """Open the replica in LOCAL_REPLICA_DIR, or return None when it is not configured."""
+    directory = os.getenv("LOCAL_REPLICA_DIR")
+    if not directory:
+        return None
+    return LocalVectorReplica(
+        directory,
+        nprobe=int(os.getenv("LOCAL_REPLICA_NPROBE", "8")),
+        refresh_interval=float(os.getenv("LOCAL_REPLICA_REFRESH_SECONDS", "300")),
+        change_window=float(os.getenv("LOCAL_REPLICA_CHANGE_WINDOW_SECONDS", "300"))
+    )
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+"""
+Compressed local archive of fetched documentation pages.
+
+Every page the crawler fetches is appended to a per-API archive so that it can
+be re-chunked and re-embedded later without rendering it through the browser
+again. Records are stored as independent zstd frames in an append-only data
+file, with a JSON-lines index holding the offset of each record for random
+access.
+
+Appends are serialized with an exclusive lock on a per-API lock file, so
+concurrent crawls (and threads of one crawl) can write the same archive.
+Where fcntl is unavailable (Windows) only threads of one process are
+serialized; run a single crawl per API at a time there. Appends compress and
+write to disk, so async callers run them in a worker thread (see
+utils/db.py run_blocking).
+"""
+
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import zstandard
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", "archive")
+DATA_FILE = "pages.zst"
+INDEX_FILE = "pages.idx"
+LOCK_FILE = "pages.lock"
+
+@dataclass
+class ArchivedPage:
+    """A single fetched page as stored in the archive."""
+    url: str
+    markdown: str
+    fetched_at: str
+    content_hash: str
+    status_code: Optional[int] = None
+    headers: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class IndexEntry:
+    """Location of an archived page inside the data file."""
+    url: str
+    offset: int
+    length: int
+    fetched_at: str
+    content_hash: str
+
+def content_hash(markdown: str) -> str:
+    """Stable hash of page content, used to detect unchanged pages."""
+    return hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+
+class RawPageArchive:
+    """Append-only, zstd-compressed archive of the pages fetched for one API."""
+
+    def __init__(self, api_name: str, archive_dir: str = DEFAULT_ARCHIVE_DIR, compression_level: int = 6):
+        """
+        Initialize the archive.
+
+        Args:
+            api_name: Name of the API whose pages are archived
+            archive_dir: Root directory holding one sub-directory per API
+            compression_level: zstd compression level for new records
+        """
+        self.api_name = api_name
+        self.directory = os.path.join(archive_dir, api_name)
+        self.data_path = os.path.join(self.directory, DATA_FILE)
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+        self.lock_path = os.path.join(self.directory, LOCK_FILE)
+        self.compression_level = compression_level
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._latest: Optional[Dict[str, IndexEntry]] = None
+        self._index_offset = 0  # Bytes of the index file already read into _latest
+        self._lock = threading.RLock()
+
+    def _load_index(self) -> Dict[str, IndexEntry]:
+        """Load the index, keeping the latest entry for each URL, and read entries appended since."""
+        with self._lock:
+            if self._latest is None:
+                self._latest = {}
+                self._index_offset = 0
+            if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) == self._index_offset:
+                return self._latest
+
+            with open(self.index_path, "rb") as f:
+                f.seek(self._index_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Still being written by another process (or torn); read it next time
+                        break
+                    self._index_offset += len(line)
+                    try:
+                        entry = IndexEntry(**json.loads(line))
+                    except (json.JSONDecodeError, UnicodeDecodeError, TypeError):
+                        continue
+                    self._latest[entry.url] = entry
+            return self._latest
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the archive's write lock, across threads and (with fcntl) processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def iter_index(self) -> Iterator[IndexEntry]:
+        """Iterate over every index entry in append order."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield IndexEntry(**json.loads(line))
+                except (json.JSONDecodeError, TypeError):
+                    # A torn final line from an interrupted write; the data is unreachable
+                    continue
+
+    def append(
+        self,
+        url: str,
+        markdown: str,
+        status_code: Optional[int] = None,
+        headers: Optional[Dict[str, Any]] = None
+    ) -> Optional[IndexEntry]:
+        """
+        Append a fetched page to the archive.
+
+        Pages whose content hash matches the latest archived copy are not
+        written again. Blocks on compression, disk writes and the write lock.
+
+        Returns:
+            The new index entry, or None if the page was unchanged
+        """
+        page = ArchivedPage(
+            url=url,
+            markdown=markdown,
+            fetched_at=datetime.now(timezone.utc).isoformat(),
+            content_hash=content_hash(markdown),
+            status_code=status_code,
+            headers=dict(headers or {})
+        )
+
+        latest = self._load_index().get(url)
+        if latest and latest.content_hash == page.content_hash:
+            return None
+
+        # Compress outside the lock; compressors are not thread-safe, so one per call
+        compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        frame = compressor.compress(json.dumps(asdict(page)).encode("utf-8"))
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self._write_lock():
+            # Another writer may have archived the same content meanwhile
+            latest = self._load_index().get(url)
+            if latest and latest.content_hash == page.content_hash:
+                return None
+
+            # Write the data before the index so an index entry never points at missing bytes
+            with open(self.data_path, "ab") as f:
+                offset = f.tell()
+                f.write(frame)
+
+            entry = IndexEntry(
+                url=url,
+                offset=offset,
+                length=len(frame),
+                fetched_at=page.fetched_at,
+                content_hash=page.content_hash
+            )
+            line = (json.dumps(asdict(entry)) + "\n").encode("utf-8")
+            with open(self.index_path, "ab") as f:
+                if f.tell() > self._index_offset:
+                    # A torn line from an interrupted write; end it so the entry starts a line of its own
+                    line = b"\n" + line
+                f.write(line)
+                self._index_offset = f.tell()
+
+            self._latest[url] = entry
+        return entry
+
+    def _read_entry(self, f, entry: IndexEntry) -> ArchivedPage:
+        """Read and decompress the record an index entry points at."""
+        f.seek(entry.offset)
+        frame = f.read(entry.length)
+        return ArchivedPage(**json.loads(self._decompressor.decompress(frame)))
+
+    def get(self, url: str) -> Optional[ArchivedPage]:
+        """Get the latest archived copy of a page."""
+        entry = self._load_index().get(url)
+        if entry is None:
+            return None
+        with open(self.data_path, "rb") as f:
+            return self._read_entry(f, entry)
+
+    def urls(self) -> List[str]:
+        """List every URL with at least one archived copy."""
+        return list(self._load_index().keys())
+
+    def iter_pages(self, latest_only: bool = True) -> Iterator[ArchivedPage]:
+        """
+        Stream archived pages in append order.
+
+        Args:
+            latest_only: Only yield the latest copy of each URL
+
+        Yields:
+            ArchivedPage records, one at a time
+        """
+        if not os.path.exists(self.data_path):
+            return
+
+        if latest_only:
+            entries = sorted(self._load_index().values(), key=lambda e: e.offset)
+        else:
+            entries = self.iter_index()
+
+        with open(self.data_path, "rb") as f:
+            for entry in entries:
+                yield self._read_entry(f, entry)
+
+def list_archived_apis(archive_dir: str = DEFAULT_ARCHIVE_DIR) -> List[str]:
+    """List the APIs that have an archive on disk."""
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(archive_dir)
+        if os.path.exists(os.path.join(archive_dir, name, INDEX_FILE))
+    )
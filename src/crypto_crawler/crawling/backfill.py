@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Retry queue for failed chunk enrichment.
+
+When a title/summary or embedding request fails during a crawl, the chunk is
+stored with enrichment_status 'pending' (placeholder text or a null
+embedding, which search excludes) and the failed task is queued in
+``crypto_api_enrichment_queue`` (see config/enrichment_retries.sql). The
+backfill drains due tasks in batches. A success updates the chunk. A failure
+pushes the task back with exponential backoff, and a task that has failed
+ENRICHMENT_MAX_ATTEMPTS times is dead-lettered and its chunk marked 'failed'.
+
+Run one backfill at a time; tasks are not locked while they are retried.
+"""
+
+import os
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from crypto_crawler.crawling.backoff import retry_delay
+from crypto_crawler.crawling.records import format_vector
+from crypto_crawler.crawling.crawler import (
+    supabase,
+    openai_client,
+    sanitize_text,
+    request_title_and_summary,
+    bump_source_version
+)
+from crypto_crawler.utils.db import execute
+from crypto_crawler.utils.embeddings import get_embedder
+from crypto_crawler.utils.error_logger import logger
+
+QUEUE_TABLE = "crypto_api_enrichment_queue"
+
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "8"))
+
+async def fetch_due_tasks(api_name: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Fetch pending tasks whose next attempt is due, oldest first."""
+    query = supabase.table(QUEUE_TABLE) \
+        .select("id, url, chunk_number, source, task, attempts") \
+        .eq("status", "pending") \
+        .lte("next_attempt_at", datetime.now(timezone.utc).isoformat())
+    if api_name:
+        query = query.eq("source", api_name)
+    result = await execute(query.order("next_attempt_at").limit(limit))
+    return result.data
+
+async def run_task(task: str, content: str, url: str) -> Dict[str, Any]:
+    """Run one enrichment task, returning the chunk columns it fills in."""
+    if task == "embedding":
+        embedding = await get_embedder(openai_client).embed(content)
+        return {"embedding": format_vector(embedding)}
+    extracted = await request_title_and_summary(content, url)
+    return {"title": extracted["title"], "summary": extracted["summary"]}
+
+async def retry_chunk(url: str, chunk_number: int, tasks: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+    """
+    Retry the due tasks of one chunk and record the outcome.
+
+    Args:
+        url: URL of the chunk's page
+        chunk_number: Position of the chunk in the page
+        tasks: The chunk's due queue rows
+
+    Returns:
+        Counts of completed, rescheduled and dead-lettered tasks
+    """
+    chunk_result = await execute(
+        supabase.table("crypto_api_site_pages")
+        .select("id, content, enrichment_status")
+        .eq("url", url)
+        .eq("chunk_number", chunk_number)
+        .limit(1)
+    )
+    chunk = chunk_result.data[0] if chunk_result.data else None
+
+    # A later crawl already enriched the chunk
+    if chunk is not None and chunk["enrichment_status"] == "complete":
+        await execute(supabase.table(QUEUE_TABLE).delete().in_("id", [task["id"] for task in tasks]))
+        return len(tasks), 0, 0
+
+    updates: Dict[str, Any] = {}
+    failures: Dict[int, str] = {}
+    for task in tasks:
+        if chunk is None:
+            # Not written yet, or removed since; retried until it is dead-lettered
+            failures[task["id"]] = "Chunk not found"
+            continue
+        try:
+            updates.update(await run_task(task["task"], chunk["content"], url))
+        except Exception as e:
+            failures[task["id"]] = sanitize_text(str(e))[:1000]
+
+    now = datetime.now(timezone.utc)
+    dead = 0
+    for task in tasks:
+        if task["id"] not in failures:
+            continue
+        attempts = task["attempts"] + 1
+        is_dead = attempts >= ENRICHMENT_MAX_ATTEMPTS
+        dead += is_dead
+        await execute(supabase.table(QUEUE_TABLE).update({
+            "status": "dead" if is_dead else "pending",
+            "attempts": attempts,
+            "last_error": failures[task["id"]],
+            "next_attempt_at": (now + timedelta(seconds=retry_delay(attempts))).isoformat(),
+            "updated_at": now.isoformat()
+        }).eq("id", task["id"]))
+
+    succeeded = [task["id"] for task in tasks if task["id"] not in failures]
+    if succeeded:
+        await execute(supabase.table(QUEUE_TABLE).delete().in_("id", succeeded))
+
+    if chunk is not None:
+        # The chunk is complete once none of its tasks remain queued (including ones not due yet)
+        remaining = await execute(
+            supabase.table(QUEUE_TABLE).select("status").eq("url", url).eq("chunk_number", chunk_number)
+        )
+        statuses = {row["status"] for row in remaining.data}
+        if "dead" in statuses:
+            updates["enrichment_status"] = "failed"
+        elif not statuses:
+            updates["enrichment_status"] = "complete"
+        if updates:
+            await execute(supabase.table("crypto_api_site_pages").update(updates).eq("id", chunk["id"]))
+
+    return len(succeeded), len(failures) - dead, dead
+
+async def backfill(api_name: Optional[str] = None, batch_size: int = 20, limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Drain due enrichment tasks in batches.
+
+    Stops when no task is due, after limit tasks, or after a batch in which
+    every task failed (the provider is still failing; the rest stay queued).
+
+    Args:
+        api_name: Only retry tasks of this API
+        batch_size: Number of tasks fetched and retried concurrently
+        limit: Maximum number of tasks to retry
+
+    Returns:
+        Counts of completed, rescheduled and dead-lettered tasks
+    """
+    stats = {"completed": 0, "rescheduled": 0, "dead": 0}
+    touched_sources = set()
+    processed = 0
+
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        tasks = await fetch_due_tasks(api_name, size)
+        if not tasks:
+            break
+
+        by_chunk = defaultdict(list)
+        for task in tasks:
+            by_chunk[(task["url"], task["chunk_number"])].append(task)
+
+        async def retry(key: Tuple[str, int], chunk_tasks: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+            try:
+                return await retry_chunk(key[0], key[1], chunk_tasks)
+            except Exception as e:
+                sanitized_error = sanitize_text(str(e))
+                logger.log_general_error(chunk_tasks[0]["source"] or "unknown", key[0], f"Error retrying enrichment: {sanitized_error}")
+                return 0, 0, 0
+
+        results = await asyncio.gather(*[retry(key, chunk_tasks) for key, chunk_tasks in by_chunk.items()])
+        completed = sum(result[0] for result in results)
+        stats["completed"] += completed
+        stats["rescheduled"] += sum(result[1] for result in results)
+        stats["dead"] += sum(result[2] for result in results)
+        processed += len(tasks)
+        touched_sources.update(task["source"] for task in tasks if task["source"])
+        print(f"Retried {processed} tasks: {stats['completed']} completed, "
+              f"{stats['rescheduled']} rescheduled, {stats['dead']} dead-lettered")
+
+        if completed == 0:
+            print("Every task in the batch failed; stopping until the provider recovers")
+            break
+
+    # Backfilled chunks change search results, so invalidate cached retrievals
+    if stats["completed"]:
+        for source in touched_sources:
+            await bump_source_version(source)
+
+    return stats
+
+async def requeue_dead_tasks(api_name: Optional[str] = None) -> int:
+    """
+    Move dead-lettered tasks back to the queue with a fresh attempt budget.
+
+    Returns:
+        Number of tasks requeued
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    query = supabase.table(QUEUE_TABLE).update({
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "updated_at": now
+    }).eq("status", "dead")
+    if api_name:
+        query = query.eq("source", api_name)
+    result = await execute(query)
+    return len(result.data)
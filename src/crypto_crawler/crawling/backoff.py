@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+"""
+Backoff schedule for retried enrichment tasks (see backfill.py).
+
+Kept free of client setup so the schedule can be imported and tested on its own.
+"""
+
+import os
+import random
+
+RETRY_BASE_DELAY = float(os.getenv("ENRICHMENT_RETRY_BASE_DELAY", "60"))  # Seconds before the first retry
+RETRY_MAX_DELAY = float(os.getenv("ENRICHMENT_RETRY_MAX_DELAY", "21600"))  # Longest backoff (6 hours)
+
+def retry_delay(attempts: int, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """
+    Seconds to wait after a task's latest failure.
+
+    Doubles from base_delay with each attempt up to max_delay, with jitter so
+    tasks that failed together (e.g. during a rate limit) spread out.
+
+    Args:
+        attempts: Number of failed attempts so far
+        base_delay: Delay after the first failure
+        max_delay: Longest delay before jitter
+    """
+    delay = min(max_delay, base_delay * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
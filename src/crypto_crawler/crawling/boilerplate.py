@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Cross-page boilerplate stripping for crawled documentation.
+
+Rendered markdown still carries the navigation sidebar, header and footer of
+every page. This module learns which line blocks repeat across the pages of a
+single API and removes them before chunking.
+
+The learned set is frozen ("settled") before pages are stored and saved per
+API under BOILERPLATE_DIR, so every page of an API, in this crawl and the
+next, is stripped with the same set. Delete an API's file to learn it again.
+"""
+
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+DEFAULT_BOILERPLATE_DIR = os.getenv("BOILERPLATE_DIR", "boilerplate")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalize_line(line: str) -> str:
+    """Normalize a line for frequency counting."""
+    return _WHITESPACE.sub(" ", line).strip().lower()
+
+def _content_lines(markdown: str, in_code_block: bool = False) -> List[tuple]:
+    """
+    Split markdown into (line, normalized, in_code_block) tuples.
+
+    Lines inside fenced code blocks are flagged so they are never counted or
+    stripped; repeated code (closing braces, imports) is not boilerplate.
+    in_code_block gives the state at the first line, for text that continues
+    a page.
+    """
+    lines = []
+    for line in markdown.split("\n"):
+        is_fence = line.lstrip().startswith("```")
+        lines.append((line, _normalize_line(line), in_code_block or is_fence))
+        if is_fence:
+            in_code_block = not in_code_block
+    return lines
+
+class BoilerplateStripper:
+    """
+    Learns repeated line blocks across the pages of one API and strips them.
+
+    Each distinct line is counted at most once per page. Once ``min_pages``
+    pages have been observed, lines present on at least ``min_frequency`` of
+    them are considered boilerplate, and runs of at least ``min_block_lines``
+    consecutive boilerplate lines are removed. Requiring a run keeps common
+    single lines such as "## Parameters" in place. Learning stops after
+    ``sample_size`` pages, or earlier when ``settle`` is called, so the learned
+    set stays stable for the rest of the crawl.
+    """
+
+    def __init__(
+        self,
+        sample_size: int = 50,
+        min_pages: int = 5,
+        min_frequency: float = 0.5,
+        min_block_lines: int = 3
+    ):
+        self.sample_size = sample_size
+        self.min_pages = min_pages
+        self.min_frequency = min_frequency
+        self.min_block_lines = min_block_lines
+        self.pages_observed = 0
+        self._line_counts: Counter = Counter()
+        self._boilerplate: Set[str] = set()
+        self._observed_keys: Set[str] = set()
+        self._settled = False
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether enough pages have been observed to start stripping."""
+        return self.pages_observed >= self.min_pages
+
+    @property
+    def is_settled(self) -> bool:
+        """Whether learning has stopped, so the learned set no longer changes."""
+        return self._settled or self.pages_observed >= self.sample_size
+
+    def settle(self):
+        """Stop learning and keep the current set, even if fewer than sample_size pages were seen."""
+        self._settled = True
+        self._line_counts = Counter()
+        self._observed_keys = set()
+
+    def fingerprint(self) -> str:
+        """Hash of the blocks this stripper removes, recorded in the pipeline version."""
+        if not self.is_trained or not self._boilerplate:
+            return "none"
+        settings = {"lines": sorted(self._boilerplate), "min_block_lines": self.min_block_lines}
+        return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()[:12]
+
+    def observe(self, markdown: str, key: Optional[str] = None):
+        """
+        Count the distinct lines of a page towards the boilerplate sample.
+
+        Args:
+            markdown: Sanitized page markdown
+            key: Optional page identifier (e.g. its URL); a page is counted once per key
+        """
+        if self.is_settled:
+            return
+        if key is not None:
+            if key in self._observed_keys:
+                return
+            self._observed_keys.add(key)
+        distinct = {norm for _, norm, in_code in _content_lines(markdown) if norm and not in_code}
+        self._line_counts.update(distinct)
+        self.pages_observed += 1
+
+        threshold = max(2, self.min_frequency * self.pages_observed)
+        self._boilerplate = {line for line, count in self._line_counts.items() if count >= threshold}
+
+    def strip(self, markdown: str, in_code_block: bool = False) -> str:
+        """Remove learned boilerplate blocks from a page (or a line-aligned part of one)."""
+        if not self.is_trained or not self._boilerplate:
+            return markdown
+
+        lines = _content_lines(markdown, in_code_block)
+        keep = [True] * len(lines)
+        run_start = None
+        # Blank lines extend a run but do not start one
+        for i, (_, norm, in_code) in enumerate(lines + [("", "\0", True)]):
+            is_boilerplate = not in_code and (norm in self._boilerplate or (not norm and run_start is not None))
+            if is_boilerplate:
+                if run_start is None:
+                    run_start = i
+                continue
+            if run_start is not None:
+                run_lines = [n for _, n, _ in lines[run_start:i] if n]
+                if len(run_lines) >= self.min_block_lines:
+                    for j in range(run_start, i):
+                        keep[j] = False
+                run_start = None
+
+        return "\n".join(line for (line, _, _), kept in zip(lines, keep) if kept)
+
+    def strip_stream(self, segments: Iterable[str]) -> Iterator[str]:
+        """
+        Remove learned boilerplate from a page given as line-aligned segments.
+
+        Code block state carries across segments. A boilerplate block split
+        between two segments is removed only if both parts are long enough.
+        """
+        in_code_block = False
+        for segment in segments:
+            stripped = self.strip(segment, in_code_block)
+            # Keep the line break that separates this segment from the next
+            if segment.endswith("\n") and not stripped.endswith("\n") and stripped:
+                stripped += "\n"
+            yield stripped
+            fences = sum(1 for line in segment.split("\n") if line.lstrip().startswith("```"))
+            in_code_block ^= fences % 2 == 1
+
+    def process(self, markdown: str) -> str:
+        """Observe a page and return it with boilerplate removed."""
+        self.observe(markdown)
+        return self.strip(markdown)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the learned set."""
+        return {
+            "pages_observed": self.pages_observed,
+            "min_pages": self.min_pages,
+            "min_block_lines": self.min_block_lines,
+            "lines": sorted(self._boilerplate)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BoilerplateStripper":
+        """Restore a settled stripper from ``to_dict`` output."""
+        stripper = cls(min_pages=data["min_pages"], min_block_lines=data["min_block_lines"])
+        stripper.pages_observed = data["pages_observed"]
+        stripper._boilerplate = set(data["lines"])
+        stripper.settle()
+        return stripper
+
+# One stripper per API, kept for the lifetime of the process
+_strippers: Dict[str, BoilerplateStripper] = {}
+
+def _stripper_path(api_name: str, directory: str) -> str:
+    return os.path.join(directory, f"{api_name}.json")
+
+def get_boilerplate_stripper(api_name: str, directory: str = DEFAULT_BOILERPLATE_DIR) -> BoilerplateStripper:
+    """Get the boilerplate stripper for an API, loading its saved set or creating a new one."""
+    if api_name not in _strippers:
+        path = _stripper_path(api_name, directory)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                _strippers[api_name] = BoilerplateStripper.from_dict(json.load(f))
+        else:
+            _strippers[api_name] = BoilerplateStripper()
+    return _strippers[api_name]
+
+def settle_boilerplate_stripper(api_name: str, directory: str = DEFAULT_BOILERPLATE_DIR) -> BoilerplateStripper:
+    """
+    Freeze an API's stripper and save its set when it learned enough to strip.
+
+    An untrained stripper is frozen for this run only, so a later run with more
+    pages (e.g. from the archive) can still learn the API's boilerplate.
+    """
+    stripper = get_boilerplate_stripper(api_name, directory)
+    stripper.settle()
+    if stripper.is_trained:
+        os.makedirs(directory, exist_ok=True)
+        temp_path = _stripper_path(api_name, directory) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(stripper.to_dict(), f)
+        os.replace(temp_path, _stripper_path(api_name, directory))
+    return stripper
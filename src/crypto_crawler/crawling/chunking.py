@@ -0,0 +1,181 @@
+"""
+Content-defined chunking for markdown documents.
+
+Fixed-size chunking places boundaries at character offsets, so inserting a
+paragraph near the top of a page moves every later boundary and changes
+every later chunk. Content-defined chunking places boundaries where a rolling
+hash of the preceding text matches a bit pattern. Boundaries then depend
+only on nearby content, and an edit changes the chunks around it while
+boundaries further away resynchronize.
+
+A Gear rolling hash (as in FastCDC) is computed over the text. When it
+triggers, the cut is snapped to the nearest structural break (blank line or
+heading) within a small window, never inside a fenced code block, so chunks
+still end at paragraph boundaries.
+
+``iter_content_defined_chunks`` produces the same chunks from a stream of text
+segments while holding only about one segment and one maximum-size chunk.
+"""
+
+import re
+import math
+import random
+from typing import Iterable, Iterator, List, Tuple
+
+_MASK64 = (1 << 64) - 1
+
+# Deterministic random table; changing the seed changes every boundary
+_GEAR = [random.Random(0x6765617221 + i).getrandbits(64) for i in range(256)]
+
+_FENCE = re.compile(r"^ {0,3}(```|~~~)", re.MULTILINE)
+_BREAK = re.compile(r"\n\s*\n|\n(?=#{1,6} )")
+
+# Text past the maximum chunk size that can still affect a cut (a blank-line or
+# heading match straddling it); streamed text is only cut with this much ahead
+_LOOKAHEAD = 1024
+
+def find_code_fences(text: str) -> List[Tuple[int, int]]:
+    """Return (start, end) ranges of fenced code blocks; an unclosed fence runs to the end."""
+    ranges = []
+    opening = None
+    for match in _FENCE.finditer(text):
+        if opening is None:
+            opening = match.start()
+        else:
+            ranges.append((opening, match.end()))
+            opening = None
+    if opening is not None:
+        ranges.append((opening, len(text)))
+    return ranges
+
+def _inside(position: int, ranges: List[Tuple[int, int]]) -> bool:
+    return any(start < position < end for start, end in ranges)
+
+def _structural_breaks(text: str, fences: List[Tuple[int, int]]) -> List[int]:
+    """Positions just after blank lines and before headings, outside code blocks."""
+    return [match.end() for match in _BREAK.finditer(text) if not _inside(match.end(), fences)]
+
+def _fallback_cut(text: str, start: int, end: int, fences: List[Tuple[int, int]]) -> int:
+    """Best cut at or before end when no hash boundary occurred: line, then sentence, then hard cut."""
+    for separator, offset in (("\n", 1), (". ", 1)):
+        position = text.rfind(separator, start, end)
+        while position != -1 and _inside(position + offset, fences):
+            position = text.rfind(separator, start, position)
+        if position != -1 and position + offset > start:
+            return position + offset
+    return end
+
+def _chunk_spans(text: str, target_size: int, min_ratio: float, max_ratio: float,
+                 snap_ratio: float, final: bool = True) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (start, end) offsets of content-defined chunks.
+
+    With final set to False the text is a prefix of a longer stream, and
+    spans stop before the point where a cut could depend on text not yet seen.
+    """
+    min_size = max(1, int(target_size * min_ratio))
+    max_size = max(min_size + 1, int(target_size * max_ratio))
+    snap = max(1, int(target_size * snap_ratio))
+
+    # A boundary fires with probability 2^-bits per character, for an average
+    # of about target_size - min_size characters past the minimum size
+    bits = max(1, round(math.log2(max(2, target_size - min_size))))
+    mask = ((1 << bits) - 1) << (64 - bits)
+
+    fences = find_code_fences(text)
+    breaks = _structural_breaks(text, fences)
+    start = 0
+    length = len(text)
+    break_index = 0
+
+    while start < length:
+        if not final and length - start <= max_size + _LOOKAHEAD:
+            return
+
+        if length - start <= target_size:
+            yield start, length
+            return
+
+        # Skip the minimum size; the hash window is 64 characters, so warm up just before it
+        h = 0
+        position = start + max(0, min_size - 64)
+        limit = min(length, start + max_size)
+        cut = None
+        while position < limit:
+            h = ((h << 1) + _GEAR[ord(text[position]) & 0xFF]) & _MASK64
+            position += 1
+            if position - start >= min_size and not (h & mask):
+                cut = position
+                break
+
+        if cut is None and limit == length:
+            yield start, length
+            return
+
+        # Snap to the nearest structural break around the hash boundary (or before the maximum)
+        anchor = cut if cut is not None else limit
+        while break_index < len(breaks) and breaks[break_index] <= start + min_size:
+            break_index += 1
+        best = None
+        for candidate in breaks[break_index:]:
+            if candidate > min(anchor + snap, start + max_size):
+                break
+            if candidate >= anchor - snap and (best is None or abs(candidate - anchor) < abs(best - anchor)):
+                best = candidate
+        if best is None:
+            best = anchor if cut is not None and not _inside(anchor, fences) else _fallback_cut(text, start + min_size, anchor, fences)
+
+        yield start, best
+        start = best
+
+def content_defined_chunks(text: str, target_size: int = 5000, min_ratio: float = 0.25,
+                           max_ratio: float = 2.0, snap_ratio: float = 0.2) -> List[str]:
+    """
+    Split text into chunks whose boundaries depend on content rather than offsets.
+
+    Args:
+        text: Markdown text to split
+        target_size: Average chunk size in characters
+        min_ratio: Minimum chunk size as a fraction of target_size
+        max_ratio: Maximum chunk size as a multiple of target_size
+        snap_ratio: How far (as a fraction of target_size) a hash boundary may
+            move to reach a structural break
+
+    Returns:
+        List of stripped, non-empty chunks
+    """
+    spans = _chunk_spans(text, target_size, min_ratio, max_ratio, snap_ratio)
+    chunks = (text[start:end].strip() for start, end in spans)
+    return [chunk for chunk in chunks if chunk]
+
+def iter_content_defined_chunks(segments: Iterable[str], target_size: int = 5000, min_ratio: float = 0.25,
+                                max_ratio: float = 2.0, snap_ratio: float = 0.2) -> Iterator[str]:
+    """
+    Streaming form of content_defined_chunks over consecutive text segments.
+
+    Yields the same chunks as chunking the joined text, provided no cut falls
+    inside a fenced code block (a fence cannot be tracked across the carried-over
+    boundary; cuts only land in one when a block exceeds the maximum chunk size).
+
+    Args:
+        segments: Consecutive pieces of the text
+        target_size, min_ratio, max_ratio, snap_ratio: As for content_defined_chunks
+
+    Yields:
+        Stripped, non-empty chunks
+    """
+    buffer = ""
+    for segment in segments:
+        buffer += segment
+        consumed = 0
+        for start, end in _chunk_spans(buffer, target_size, min_ratio, max_ratio, snap_ratio, final=False):
+            chunk = buffer[start:end].strip()
+            if chunk:
+                yield chunk
+            consumed = end
+        buffer = buffer[consumed:]
+
+    for start, end in _chunk_spans(buffer, target_size, min_ratio, max_ratio, snap_ratio):
+        chunk = buffer[start:end].strip()
+        if chunk:
+            yield chunk
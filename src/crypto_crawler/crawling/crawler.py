@@ -9,23 +9,66 @@ import sys
 import glob
 import shutil
 import gc
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+import hashlib
+from array import array
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Awaitable
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl4ai.content_filter_strategy import PruningContentFilter
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
 from openai import AsyncOpenAI
 from supabase import create_client, Client
 
 # Import from our package
 from crypto_crawler.api.config import CryptoApiConfig, load_crypto_api_configs, save_crypto_api_configs
 from crypto_crawler.crawling.url_extractor import get_crypto_api_urls
+from crypto_crawler.crawling.dedup import get_dedup_index, CanonicalChunk
+from crypto_crawler.crawling.boilerplate import BoilerplateStripper, get_boilerplate_stripper, settle_boilerplate_stripper
+from crypto_crawler.crawling.archive import RawPageArchive, content_hash
+from crypto_crawler.crawling.chunking import content_defined_chunks, iter_content_defined_chunks
+from crypto_crawler.crawling.records import ProcessedChunk
+from crypto_crawler.utils.db import execute, run_blocking
+from crypto_crawler.utils.embeddings import embedding_version, get_embedder
+from crypto_crawler.utils.pg_loader import get_pg_loader
 from crypto_crawler.utils.error_logger import logger
 
 load_dotenv()
 
+# Near-duplicate handling: "link" stores duplicate chunks without enrichment and
+# points them at the canonical chunk, "skip" drops them, "off" disables it. The
+# canonical index only covers pages processed in this run (pages skipped as
+# unchanged are not in it), so "skip" can drop content whose copy is elsewhere
+DEDUP_MODE = os.getenv("DEDUP_MODE", "link").lower()
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))  # Max differing SimHash bits
+
+# Strip navigation/header/footer blocks learned across the pages of each API
+STRIP_BOILERPLATE = os.getenv("STRIP_BOILERPLATE", "true").lower() == "true"
+# Prefer crawl4ai's pruned "fit" markdown over the raw markdown when available
+USE_FIT_MARKDOWN = os.getenv("USE_FIT_MARKDOWN", "false").lower() == "true"
+# Keep a compressed local copy of every fetched page for offline re-processing
+ARCHIVE_RAW_PAGES = os.getenv("ARCHIVE_RAW_PAGES", "true").lower() == "true"
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "5000"))  # Target characters per chunk
+# "fixed" splits at size limits; "cdc" places content-defined boundaries that survive edits elsewhere on the page
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "fixed").lower()
+# Reuse the stored title, summary and embedding of chunks whose content is unchanged
+REUSE_UNCHANGED_CHUNKS = os.getenv("REUSE_UNCHANGED_CHUNKS", "true").lower() == "true"
+# Skip pages whose markdown and pipeline version match the page catalog, only marking them as seen
+SKIP_UNCHANGED_PAGES = os.getenv("SKIP_UNCHANGED_PAGES", "true").lower() == "true"
+
+# Pages larger than this are sanitized, chunked and stored as a stream (see stream_and_store_document)
+STREAM_PAGE_THRESHOLD = int(os.getenv("STREAM_PAGE_THRESHOLD", "1000000"))  # Characters
+STREAM_WINDOW_SIZE = int(os.getenv("STREAM_WINDOW_SIZE", "200000"))  # Characters sanitized and chunked at a time
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "16"))  # Chunks waiting for enrichment
+STREAM_WORKERS = int(os.getenv("STREAM_WORKERS", "4"))  # Chunks enriched and stored concurrently
+
+# How chunks are written: "postgrest" (per-chunk upserts) or "copy" (direct Postgres COPY, see utils/pg_loader.py)
+INGEST_WRITERS = ("postgrest", "copy")
+INGEST_WRITER = os.getenv("INGEST_WRITER", "postgrest").lower()
+
 # Initialize OpenAI and Supabase clients
 openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 supabase: Client = create_client(
@@ -33,50 +76,110 @@ supabase: Client = create_client(
     os.getenv("SUPABASE_SERVICE_KEY")
 )
 
-@dataclass
-class ProcessedChunk:
-    url: str
-    chunk_number: int
-    title: str
-    summary: str
-    content: str
-    metadata: Dict[str, Any]
-    embedding: List[float]
-
-def chunk_text(text: str, chunk_size: int = 5000) -> List[str]:
+def set_ingest_writer(writer: str):
+    """Select how chunks are written: "postgrest" or "copy"."""
+    global INGEST_WRITER
+    if writer not in INGEST_WRITERS:
+        raise ValueError(f"Unknown ingest writer: {writer} (expected one of {', '.join(INGEST_WRITERS)})")
+    INGEST_WRITER = writer
+
+def get_summary_version() -> str:
+    """
+    Fingerprint the model that produces a chunk's title and summary.
+    
+    A stored chunk with the same content and summary version keeps its title
+    and summary without calling the model again.
+    """
+    settings = {"llm_model": os.getenv("LLM_MODEL", "gpt-4o-mini")}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def get_embedding_version() -> str:
+    """
+    Fingerprint the embedding model and size.
+    
+    Versioned apart from the summary so that a new embedding size (see
+    scripts/migrate_embedding_dimensions.py) only re-embeds chunks instead of
+    also re-summarizing them.
+    """
+    embedder = get_embedder(openai_client)
+    return embedding_version(embedder.model_name, embedder.dimensions)
+
+def get_pipeline_version(api_name: Optional[str] = None) -> str:
+    """
+    Fingerprint the settings that shape stored chunks.
+    
+    The fingerprint is stored with every chunk; when it changes, previously
+    processed pages are out of date and get re-processed. With an API name it
+    includes the boilerplate that API's stripper removes, so pages stored
+    before the stripper learned the API's boilerplate are re-processed.
+    """
+    settings = {
+        "chunk_size": CHUNK_SIZE,
+        "chunking_mode": CHUNKING_MODE,
+        "summary_version": get_summary_version(),
+        "embedding_version": get_embedding_version(),
+        "strip_boilerplate": STRIP_BOILERPLATE,
+        "dedup_mode": DEDUP_MODE,
+        "dedup_max_distance": DEDUP_MAX_DISTANCE
+    }
+    if STRIP_BOILERPLATE and api_name:
+        settings["boilerplate"] = get_boilerplate_stripper(api_name).fingerprint()
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def train_boilerplate_stripper(api_name: str, pages: Iterable[Tuple[str, str]]) -> BoilerplateStripper:
+    """
+    Observe (url, markdown) pages of an API until its boilerplate stripper has a full sample.
+    
+    Pages above STREAM_PAGE_THRESHOLD are skipped; they are too large to sample.
+    Stops reading pages as soon as the sample is full.
+    """
+    stripper = get_boilerplate_stripper(api_name)
+    for url, markdown in pages:
+        if stripper.is_settled:
+            break
+        if len(markdown) <= STREAM_PAGE_THRESHOLD:
+            stripper.observe(sanitize_text(markdown), key=url)
+    return stripper
+
+def _chunk_end(text: str, start: int, chunk_size: int) -> int:
+    """Find where a chunk starting at start ends, for text longer than start + chunk_size."""
+    end = start + chunk_size
+
+    # Try to find a code block boundary first (```)
+    chunk = text[start:end]
+    code_block = chunk.rfind('```')
+    if code_block != -1 and code_block > chunk_size * 0.3:
+        end = start + code_block
+
+    # If no code block, try to break at a paragraph
+    elif '\n\n' in chunk:
+        # Find the last paragraph break
+        last_break = chunk.rfind('\n\n')
+        if last_break > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
+            end = start + last_break
+
+    # If no paragraph break, try to break at a sentence
+    elif '. ' in chunk:
+        # Find the last sentence break
+        last_period = chunk.rfind('. ')
+        if last_period > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
+            end = start + last_period + 1
+
+    return end
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
     """Split text into chunks, respecting code blocks and paragraphs."""
     chunks = []
     start = 0
     text_length = len(text)
 
     while start < text_length:
-        # Calculate end position
-        end = start + chunk_size
-
         # If we're at the end of the text, just take what's left
-        if end >= text_length:
+        if start + chunk_size >= text_length:
             chunks.append(text[start:].strip())
             break
 
-        # Try to find a code block boundary first (```)
-        chunk = text[start:end]
-        code_block = chunk.rfind('```')
-        if code_block != -1 and code_block > chunk_size * 0.3:
-            end = start + code_block
-
-        # If no code block, try to break at a paragraph
-        elif '\n\n' in chunk:
-            # Find the last paragraph break
-            last_break = chunk.rfind('\n\n')
-            if last_break > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
-                end = start + last_break
-
-        # If no paragraph break, try to break at a sentence
-        elif '. ' in chunk:
-            # Find the last sentence break
-            last_period = chunk.rfind('. ')
-            if last_period > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
-                end = start + last_period + 1
+        end = _chunk_end(text, start, chunk_size)
 
         # Extract chunk and clean it up
         chunk = text[start:end].strip()
@@ -88,55 +191,118 @@ def chunk_text(text: str, chunk_size: int = 5000) -> List[str]:
 
     return chunks
 
-async def get_title_and_summary(chunk: str, url: str) -> Dict[str, str]:
-    """Extract title and summary using GPT-4."""
+def iter_chunk_text(segments: Iterable[str], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Streaming form of chunk_text over consecutive text segments.
+    
+    A chunk only depends on the chunk_size characters after its start, so this
+    yields exactly the chunks of the joined text while holding one segment plus
+    one chunk of carried-over text.
+    """
+    buffer = ""
+    for segment in segments:
+        buffer += segment
+        start = 0
+        while len(buffer) - start > chunk_size:
+            end = _chunk_end(buffer, start, chunk_size)
+            chunk = buffer[start:end].strip()
+            if chunk:
+                yield chunk
+            start = max(start + 1, end)
+        buffer = buffer[start:]
+    yield from chunk_text(buffer, chunk_size)
+
+def split_markdown(text: str) -> List[str]:
+    """Split a page into chunks with the configured chunking mode."""
+    if CHUNKING_MODE == "cdc":
+        return content_defined_chunks(text, CHUNK_SIZE)
+    return chunk_text(text)
+
+def iter_split_markdown(segments: Iterable[str]) -> Iterator[str]:
+    """Split a page given as consecutive segments, yielding the chunks split_markdown would return."""
+    if CHUNKING_MODE == "cdc":
+        return iter_content_defined_chunks(segments, CHUNK_SIZE)
+    return iter_chunk_text(segments)
+
+# Stored while a failed title/summary request waits in the retry queue
+PLACEHOLDER_TITLE = "Error processing title"
+PLACEHOLDER_SUMMARY = "Error processing summary"
+
+async def request_title_and_summary(chunk: str, url: str) -> Dict[str, str]:
+    """Extract title and summary using GPT-4, raising on failure."""
     system_prompt = """You are an AI that extracts titles and summaries from documentation chunks.
     Return a JSON object with 'title' and 'summary' keys.
     For the title: If this seems like the start of a document, extract its title. If it's a middle chunk, derive a descriptive title.
     For the summary: Create a concise summary of the main points in this chunk.
     Keep both title and summary concise but informative."""
     
+    response = await openai_client.chat.completions.create(
+        model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk[:1000]}..."}  # Send first 1000 chars for context
+        ],
+        response_format={ "type": "json_object" }
+    )
+    extracted = json.loads(response.choices[0].message.content)
+    if not extracted.get("title") or not extracted.get("summary"):
+        raise ValueError("Response is missing a title or summary")
+    return extracted
+
+async def get_title_and_summary(chunk: str, url: str) -> Tuple[Dict[str, str], Optional[str]]:
+    """
+    Extract title and summary, falling back to placeholders on failure.
+    
+    Returns:
+        The title and summary, and the error message if the request failed
+    """
     try:
-        response = await openai_client.chat.completions.create(
-            model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk[:1000]}..."}  # Send first 1000 chars for context
-            ],
-            response_format={ "type": "json_object" }
-        )
-        return json.loads(response.choices[0].message.content)
+        return await request_title_and_summary(chunk, url), None
     except Exception as e:
         print(f"Error getting title and summary: {e}")
-        return {"title": "Error processing title", "summary": "Error processing summary"}
+        return {"title": PLACEHOLDER_TITLE, "summary": PLACEHOLDER_SUMMARY}, str(e)
 
-async def get_embedding(text: str) -> List[float]:
-    """Get embedding vector from OpenAI."""
+async def get_embedding(text: str) -> Tuple[Optional[List[float]], Optional[str]]:
+    """
+    Get embedding vector from the configured embedding backend.
+    
+    Returns:
+        The embedding (None on failure, never a zero vector), and the error
+        message if the request failed
+    """
+    embedder = get_embedder(openai_client)
     try:
-        response = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
+        return await embedder.embed(text), None
     except Exception as e:
         print(f"Error getting embedding: {e}")
-        return [0] * 1536  # Return zero vector on error
+        return None, str(e)
 
-async def process_chunk(chunk: str, chunk_number: int, url: str, api_name: str) -> ProcessedChunk:
-    """Process a single chunk of text."""
-    # Get title and summary
-    extracted = await get_title_and_summary(chunk, url)
-    
-    # Get embedding
-    embedding = await get_embedding(chunk)
-    
-    # Create metadata with dynamic source based on API name
+def build_chunk_metadata(chunk: str, url: str, api_name: str, page_metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Create chunk metadata with dynamic source based on API name."""
     metadata = {
         "source": api_name,
         "chunk_size": len(chunk),
         "crawled_at": datetime.now(timezone.utc).isoformat(),
-        "url_path": urlparse(url).path
+        "url_path": urlparse(url).path,
+        "chunk_hash": content_hash(chunk)
     }
+    if page_metadata:
+        metadata.update(page_metadata)
+    return metadata
+
+async def process_chunk(chunk: str, chunk_number: int, url: str, api_name: str, page_metadata: Optional[Dict[str, Any]] = None) -> ProcessedChunk:
+    """Process a single chunk of text, queueing any enrichment request that fails for a retry."""
+    # Get title and summary
+    extracted, summary_error = await get_title_and_summary(chunk, url)
+    
+    # Get embedding
+    embedding, embedding_error = await get_embedding(chunk)
+    
+    metadata = build_chunk_metadata(chunk, url, api_name, page_metadata)
+    
+    failed_tasks = {task: error for task, error in (("summary", summary_error), ("embedding", embedding_error)) if error}
+    if failed_tasks:
+        await enqueue_enrichment_retries(url, chunk_number, api_name, failed_tasks)
     
     return ProcessedChunk(
         url=url,
@@ -145,13 +311,171 @@ async def process_chunk(chunk: str, chunk_number: int, url: str, api_name: str)
         summary=extracted['summary'],
         content=chunk,  # Store the original chunk content
         metadata=metadata,
-        embedding=embedding
+        embedding=embedding,
+        enrichment_status="pending" if failed_tasks else "complete"
+    )
+
+async def enqueue_enrichment_retries(url: str, chunk_number: int, api_name: str, failed_tasks: Dict[str, str]):
+    """
+    Queue failed enrichment tasks of a chunk for `main.py backfill`.
+    
+    Args:
+        url: URL of the chunk's page
+        chunk_number: Position of the chunk in the page
+        api_name: Name of the API the page belongs to
+        failed_tasks: Error message per failed task ("summary" or "embedding")
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [
+        {
+            "url": url,
+            "chunk_number": chunk_number,
+            "source": api_name,
+            "task": task,
+            "status": "pending",
+            "attempts": 0,
+            "last_error": sanitize_text(error)[:1000],
+            "next_attempt_at": now,
+            "updated_at": now
+        }
+        for task, error in failed_tasks.items()
+    ]
+    try:
+        await execute(supabase.table("crypto_api_enrichment_queue").upsert(rows, on_conflict="url,chunk_number,task"))
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, url, f"Error queueing enrichment retry: {sanitized_error}")
+
+async def load_reusable_chunks(url: str, api_name: str, include_embeddings: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Load a page's stored enrichments, keyed by chunk content hash.
+    
+    Chunks whose title and summary or embedding were made with the current
+    models are returned, flagged with reuse_summary and reuse_embedding, so
+    those parts can be reused for identical content at any position. Without
+    include_embeddings, embeddings are left out and fetched by id when a chunk
+    is reused, which keeps very large pages from loading them all at once.
+    """
+    columns = ("id, title, summary, chunk_hash:metadata->>chunk_hash, "
+               "summary_version:metadata->>summary_version, embedding_version:metadata->>embedding_version")
+    if include_embeddings:
+        columns += ", embedding"
+    try:
+        result = await execute(
+            supabase.table("crypto_api_site_pages")
+            .select(columns)
+            .eq("url", url)
+            .eq("enrichment_status", "complete")
+            .not_.is_("embedding", "null")
+        )
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, url, f"Error loading stored chunks: {sanitized_error}")
+        return {}
+    
+    current_summary_version = get_summary_version()
+    current_embedding_version = get_embedding_version()
+    reusable = {}
+    for row in result.data:
+        row["reuse_summary"] = row.get("summary_version") == current_summary_version
+        row["reuse_embedding"] = row.get("embedding_version") == current_embedding_version
+        if row.get("chunk_hash") and (row["reuse_summary"] or row["reuse_embedding"]):
+            # PostgREST returns pgvector values as "[x,y,...]" strings
+            if isinstance(row.get("embedding"), str):
+                row["embedding"] = array("f", json.loads(row["embedding"]))
+            reusable[row["chunk_hash"]] = row
+    return reusable
+
+async def load_stored_embedding(chunk_id: int) -> Optional[List[float]]:
+    """Fetch the embedding of one stored chunk."""
+    result = await execute(
+        supabase.table("crypto_api_site_pages").select("embedding").eq("id", chunk_id).limit(1)
+    )
+    if not result.data:
+        return None
+    embedding = result.data[0]["embedding"]
+    return json.loads(embedding) if isinstance(embedding, str) else embedding
+
+async def reuse_chunk(
+    chunk: str,
+    chunk_number: int,
+    url: str,
+    api_name: str,
+    stored: Dict[str, Any],
+    page_metadata: Optional[Dict[str, Any]] = None
+) -> ProcessedChunk:
+    """
+    Build a chunk from the stored enrichment of identical content.
+    
+    Only the parts made with other models than the current ones (see
+    load_reusable_chunks) are requested again.
+    """
+    failed_tasks = {}
+    if stored["reuse_embedding"]:
+        embedding = stored["embedding"] if "embedding" in stored else await load_stored_embedding(stored["id"])
+        if embedding is None:
+            # The stored chunk disappeared since it was listed; enrich this one from scratch
+            return await process_chunk(chunk, chunk_number, url, api_name, page_metadata)
+    else:
+        embedding, embedding_error = await get_embedding(chunk)
+        if embedding_error:
+            failed_tasks["embedding"] = embedding_error
+    
+    if stored["reuse_summary"]:
+        extracted = {"title": stored["title"], "summary": stored["summary"]}
+    else:
+        extracted, summary_error = await get_title_and_summary(chunk, url)
+        if summary_error:
+            failed_tasks["summary"] = summary_error
+    
+    if failed_tasks:
+        await enqueue_enrichment_retries(url, chunk_number, api_name, failed_tasks)
+    
+    return ProcessedChunk(
+        url=url,
+        chunk_number=chunk_number,
+        title=extracted["title"],
+        summary=extracted["summary"],
+        content=chunk,
+        metadata=build_chunk_metadata(chunk, url, api_name, page_metadata),
+        embedding=embedding,
+        enrichment_status="pending" if failed_tasks else "complete"
+    )
+
+async def link_duplicate_chunk(
+    chunk: str,
+    chunk_number: int,
+    url: str,
+    api_name: str,
+    canonical: CanonicalChunk,
+    page_metadata: Optional[Dict[str, Any]] = None
+) -> ProcessedChunk:
+    """Build a near-duplicate chunk that points at its canonical chunk instead of being enriched."""
+    metadata = build_chunk_metadata(chunk, url, api_name, page_metadata)
+    # The canonical's hash lets invalidate_duplicate_links tell when the link has gone stale
+    metadata["duplicate_of"] = {
+        "url": canonical.url,
+        "chunk_number": canonical.chunk_number,
+        "chunk_hash": canonical.chunk_hash
+    }
+    
+    return ProcessedChunk(
+        url=url,
+        chunk_number=chunk_number,
+        title=f"Duplicate of {canonical.url} (chunk {canonical.chunk_number})",
+        summary="Near-duplicate of another documentation chunk; see duplicate_of in metadata.",
+        content=chunk,
+        metadata=metadata,
+        embedding=None,  # Not embedded, so it stays out of the vector index
+        enrichment_status="duplicate"  # Excluded from search like pending chunks
     )
 
 async def check_chunk_exists(url: str, chunk_number: int) -> bool:
     """Check if a chunk already exists in the database."""
     try:
-        result = supabase.table("crypto_api_site_pages").select("id").eq("url", url).eq("chunk_number", chunk_number).execute()
+        result = await execute(
+            supabase.table("crypto_api_site_pages").select("id").eq("url", url).eq("chunk_number", chunk_number)
+        )
         return len(result.data) > 0
     except Exception as e:
         # Extract API name from URL if possible
@@ -161,11 +485,19 @@ async def check_chunk_exists(url: str, chunk_number: int) -> bool:
         logger.log_general_error(api_name, url, f"Error checking chunk existence: {sanitized_error}")
         return False
 
-async def insert_chunk(chunk: ProcessedChunk):
-    """Insert a processed chunk into Supabase if it doesn't already exist."""
+async def insert_chunk(chunk: ProcessedChunk, overwrite: bool = False):
+    """
+    Insert a processed chunk into Supabase if it doesn't already exist (or replace it when overwrite is set).
+    
+    Returns:
+        The upsert response, or None if the chunk already existed and was skipped
+    
+    Raises:
+        Exception: The write failed; re-raised so a failed chunk is not taken for a skipped one
+    """
     try:
         # Check if chunk already exists
-        if await check_chunk_exists(chunk.url, chunk.chunk_number):
+        if not overwrite and await check_chunk_exists(chunk.url, chunk.chunk_number):
             print(f"Chunk {chunk.chunk_number} for {chunk.url} already exists - skipping")
             return None
             
@@ -176,14 +508,17 @@ async def insert_chunk(chunk: ProcessedChunk):
             "summary": chunk.summary,
             "content": chunk.content,
             "metadata": chunk.metadata,
-            "embedding": chunk.embedding
+            "source": chunk.metadata.get("source"),
+            "category": chunk.metadata.get("category"),
+            "embedding": chunk.embedding_literal(),
+            "enrichment_status": chunk.enrichment_status
         }
         
         # Use upsert to handle race conditions
-        result = supabase.table("crypto_api_site_pages").upsert(
+        result = await execute(supabase.table("crypto_api_site_pages").upsert(
             data,
             on_conflict="url,chunk_number"  # Assuming these columns have a unique constraint
-        ).execute()
+        ))
         
         print(f"Inserted chunk {chunk.chunk_number} for {chunk.url}")
         return result
@@ -194,8 +529,154 @@ async def insert_chunk(chunk: ProcessedChunk):
         if hasattr(e, 'response'):
             print(f"Response status: {e.response.status_code}")
             print(f"Response content: {e.response.content}")
+        raise
+
+async def process_and_insert(job: Awaitable[ProcessedChunk], overwrite: bool = False) -> Tuple[int, str, bool]:
+    """
+    Wait for a chunk to be processed and insert it right away.
+    
+    Only the chunk's number, title and whether it was written are returned,
+    so the chunk itself can be freed as soon as it is stored. Raises if the
+    chunk could not be stored.
+    """
+    chunk = await job
+    result = await insert_chunk(chunk, overwrite)
+    return chunk.chunk_number, chunk.title, result is not None
+
+async def bump_source_version(api_name: str):
+    """Advance the data version of a source after new chunks were written."""
+    try:
+        await execute(supabase.rpc("bump_source_version", {"api_source": api_name}))
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, "bump_source_version", f"Error bumping source version: {sanitized_error}")
+
+async def retire_stale_chunks(url: str, api_name: str, keep_chunk_numbers: List[int]) -> int:
+    """Delete a page's stored chunks that are not in its latest chunk set; returns rows deleted."""
+    try:
+        result = await execute(supabase.rpc(
+            "retire_stale_chunks",
+            {"page_url": url, "keep_chunk_numbers": keep_chunk_numbers}
+        ))
+        deleted = result.data or 0
+        if deleted:
+            print(f"Retired {deleted} stale chunks for {url}")
+        return deleted
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, url, f"Error retiring stale chunks: {sanitized_error}")
+        return 0
+
+async def invalidate_duplicate_links(url: str, api_name: str) -> int:
+    """
+    Mark pages whose near-duplicate links into a rewritten page went stale for re-processing.
+
+    Returns:
+        Number of pages invalidated
+    """
+    try:
+        result = await execute(supabase.rpc("invalidate_duplicate_links", {"page_url": url}))
+        invalidated = result.data or 0
+        if invalidated:
+            print(f"Invalidated {invalidated} pages linking to chunks of {url}")
+        return invalidated
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, url, f"Error invalidating duplicate links: {sanitized_error}")
+        return 0
+
+async def retire_unseen_pages(api_name: str, seen_urls: List[str], dry_run: bool = False) -> int:
+    """
+    Delete the chunks and catalog rows of an API's pages that are no longer discovered.
+
+    Pages with near-duplicate links into the retired pages lose their content
+    hash, so the next crawl re-processes them.
+
+    Args:
+        api_name: Name of the API
+        seen_urls: Every URL discovered for the API in the latest crawl
+        dry_run: Only count the pages that would be retired
+
+    Returns:
+        Number of pages retired (or that would be retired)
+    """
+    try:
+        result = await execute(supabase.rpc(
+            "retire_unseen_pages",
+            {"api_source": api_name, "seen_urls": seen_urls, "dry_run": dry_run}
+        ))
+        retired = result.data or 0
+        if retired and not dry_run:
+            await bump_source_version(api_name)
+        return retired
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, "retire_unseen_pages", f"Error retiring unseen pages: {sanitized_error}")
+        return 0
+
+async def get_page_fingerprint(url: str, api_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up the content hash and pipeline version a page was last stored with.
+    
+    Returns:
+        The page's catalog row, or None if the page is not in the catalog
+    """
+    try:
+        response = await execute(
+            supabase.table("crypto_api_pages")
+            .select("content_hash, pipeline_version")
+            .eq("url", url)
+            .limit(1)
+        )
+        return response.data[0] if response.data else None
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, url, f"Error reading page fingerprint: {sanitized_error}")
         return None
 
+async def touch_page_record(url: str, api_name: str):
+    """Mark an unchanged page as seen without rewriting its chunks."""
+    try:
+        await execute(
+            supabase.table("crypto_api_pages")
+            .update({"last_seen_at": datetime.now(timezone.utc).isoformat()})
+            .eq("url", url)
+        )
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, url, f"Error updating page catalog: {sanitized_error}")
+
+async def upsert_page_record(url: str, api_name: str, first_title: Optional[str], chunk_count: int, page_metadata: Dict[str, Any]):
+    """
+    Record a stored page in the crypto_api_pages catalog.
+    
+    Args:
+        url: URL of the page
+        api_name: Name of the API the page belongs to
+        first_title: Title of the page's first chunk, if any
+        chunk_count: Number of chunks stored for the page
+        page_metadata: Page hash, pipeline version and category
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    try:
+        await execute(supabase.table("crypto_api_pages").upsert(
+            {
+                "url": url,
+                "source": api_name,
+                "title": first_title.split(" - ")[0] if first_title else None,
+                "category": page_metadata.get("category"),
+                "chunk_count": chunk_count,
+                "content_hash": page_metadata["page_hash"],
+                "pipeline_version": page_metadata["pipeline_version"],
+                "last_crawled_at": now,
+                "last_seen_at": now
+            },
+            on_conflict="url"
+        ))
+    except Exception as e:
+        sanitized_error = sanitize_text(str(e))
+        logger.log_general_error(api_name, url, f"Error updating page catalog: {sanitized_error}")
+
 def sanitize_text(text: str) -> str:
     """
     Sanitize text to handle encoding issues.
@@ -232,33 +713,259 @@ def sanitize_text(text: str) -> str:
     
     return encoded_text
 
-async def process_and_store_document(url: str, markdown: str, api_name: str):
-    """Process a document and store its chunks in parallel."""
+def iter_sanitized(text: str, window_size: int = STREAM_WINDOW_SIZE) -> Iterator[str]:
+    """Sanitize text one window at a time, cutting windows after a line break where possible."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + window_size)
+        end = len(text) if end == -1 else end + 1
+        yield sanitize_text(text[start:end])
+        start = end
+
+async def stream_and_store_document(url: str, markdown: str, api_name: str, page_metadata: Dict[str, Any], overwrite: bool) -> bool:
+    """
+    Process a very large page as a stream of chunks.
+    
+    Sanitizing, boilerplate stripping and chunking run one window at a time,
+    and chunks go through a bounded queue to workers that enrich and store
+    each one and then drop it. Besides the fetched markdown itself, memory is
+    bounded by the window, the queue and the workers instead of the page size.
+    Large pages do not train the boilerplate stripper; their distinct lines
+    would swamp the per-page line counts.
+    
+    Args:
+        url: URL of the page
+        markdown: Page markdown as fetched
+        api_name: Name of the API the page belongs to
+        page_metadata: Page hash, pipeline version and category
+        overwrite: Replace chunks that are already stored
+    
+    Returns:
+        False if any chunk failed, True otherwise
+    """
+    print(f"Streaming large page ({len(markdown)} characters): {url}")
+    segments = iter_sanitized(markdown)
+    if STRIP_BOILERPLATE:
+        segments = get_boilerplate_stripper(api_name).strip_stream(segments)
+    chunks = iter_split_markdown(segments)
+    
+    # Embeddings of reusable chunks are fetched one at a time when needed
+    reusable = await load_reusable_chunks(url, api_name, include_embeddings=False) if REUSE_UNCHANGED_CHUNKS else {}
+    dedup_index = get_dedup_index(api_name, DEDUP_MAX_DISTANCE) if DEDUP_MODE != "off" else None
+    loader = await get_pg_loader() if INGEST_WRITER == "copy" else None
+    
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stored_chunk_numbers: List[int] = []
+    first_title: Optional[Tuple[int, str]] = None
+    written = False
+    failed = 0
+    
+    async def worker():
+        nonlocal written, first_title, failed
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            try:
+                if loader is not None:
+                    chunk = await job
+                    result = await loader.write_chunks([chunk], overwrite) > 0
+                    chunk_number, title = chunk.chunk_number, chunk.title
+                    del chunk  # Free it before waiting for the next job
+                else:
+                    chunk_number, title, result = await process_and_insert(job, overwrite)
+                written = written or result
+                stored_chunk_numbers.append(chunk_number)
+                if first_title is None or chunk_number < first_title[0]:
+                    first_title = (chunk_number, title)
+            except Exception as e:
+                failed += 1
+                sanitized_error = sanitize_text(str(e))
+                logger.log_general_error(api_name, url, f"Error processing streamed chunk: {sanitized_error}")
+    
+    if dedup_index:
+        # The page's previous chunks are being replaced; the ones still present register again
+        dedup_index.forget(url)
+    workers = [asyncio.create_task(worker()) for _ in range(STREAM_WORKERS)]
     try:
+        for i, chunk in enumerate(chunks):
+            chunk_hash = content_hash(chunk)
+            canonical = dedup_index.check(chunk, url, i, chunk_hash) if dedup_index else None
+            stored = reusable.get(chunk_hash)
+            if canonical is None and stored is not None:
+                job = reuse_chunk(chunk, i, url, api_name, stored, page_metadata)
+            elif canonical is None:
+                job = process_chunk(chunk, i, url, api_name, page_metadata)
+            elif DEDUP_MODE == "link":
+                job = link_duplicate_chunk(chunk, i, url, api_name, canonical, page_metadata)
+            else:
+                print(f"Skipping near-duplicate chunk {i} for {url} (duplicate of {canonical.url} chunk {canonical.chunk_number})")
+                continue
+            # Blocks while the queue is full, so chunking never runs far ahead of enrichment
+            await queue.put(job)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    
+    # Drop chunks left over from a longer previous version of the page, unless
+    # some chunks failed and the stored ones are still the best copy of them
+    # (without overwrite, existing chunks were kept rather than replaced)
+    retired = 0
+    if failed:
+        print(f"{failed} chunks of {url} failed; keeping previously stored chunks")
+        # Leave the content hash unset so the next crawl does not skip the page as unchanged
+        page_metadata = dict(page_metadata, page_hash=None)
+    elif overwrite:
+        retired = await retire_stale_chunks(url, api_name, stored_chunk_numbers)
+    if overwrite:
+        await invalidate_duplicate_links(url, api_name)
+    
+    title = first_title[1] if first_title else None
+    await upsert_page_record(url, api_name, title, len(stored_chunk_numbers), page_metadata)
+    
+    # Invalidate cached retrieval results for this source
+    if written or retired > 0:
+        await bump_source_version(api_name)
+    
+    return not failed
+
+async def process_and_store_document(
+    url: str,
+    markdown: str,
+    api_name: str,
+    overwrite: bool = False,
+    category: Optional[str] = None,
+    skip_unchanged: bool = SKIP_UNCHANGED_PAGES,
+    page_hash: Optional[str] = None
+) -> bool:
+    """
+    Process a document and store its chunks in parallel.
+    
+    Args:
+        url: URL of the page
+        markdown: Page markdown as fetched
+        api_name: Name of the API the page belongs to
+        overwrite: Replace chunks that are already stored
+        category: API category written into chunk metadata
+        skip_unchanged: Skip the page if the catalog has it with the same
+            content hash and pipeline version
+        page_hash: Content hash of the page as fetched, when markdown was
+            rebuilt from stored chunks (default: the hash of markdown)
+    
+    Returns:
+        True if the page was stored or skipped as unchanged, False if it or any of its chunks failed
+    """
+    try:
+        # Record which content and pipeline settings produced these chunks
+        page_metadata = {
+            "page_hash": page_hash or content_hash(markdown),
+            "pipeline_version": get_pipeline_version(api_name),
+            "summary_version": get_summary_version(),
+            "embedding_version": get_embedding_version()
+        }
+        if category:
+            page_metadata["category"] = category
+        
+        if skip_unchanged:
+            fingerprint = await get_page_fingerprint(url, api_name)
+            if fingerprint is not None:
+                if (fingerprint.get("content_hash") == page_metadata["page_hash"]
+                        and fingerprint.get("pipeline_version") == page_metadata["pipeline_version"]):
+                    await touch_page_record(url, api_name)
+                    print(f"Unchanged since last crawl: {url}")
+                    return True
+                # The stored chunks are out of date, so replace them instead of keeping them
+                overwrite = True
+        
+        if len(markdown) > STREAM_PAGE_THRESHOLD:
+            return await stream_and_store_document(url, markdown, api_name, page_metadata, overwrite)
+        
         # Sanitize markdown to handle encoding issues
         sanitized_markdown = sanitize_text(markdown)
         
+        # Remove navigation, header and footer blocks repeated across this API's pages
+        # (learned before any page is stored, see crawl_parallel)
+        if STRIP_BOILERPLATE:
+            sanitized_markdown = get_boilerplate_stripper(api_name).strip(sanitized_markdown)
+        
         # Split into chunks
-        chunks = chunk_text(sanitized_markdown)
+        chunks = split_markdown(sanitized_markdown)
         
-        # Process chunks in parallel
-        tasks = [
-            process_chunk(chunk, i, url, api_name) 
-            for i, chunk in enumerate(chunks)
-        ]
-        processed_chunks = await asyncio.gather(*tasks)
+        # Unchanged chunks keep their enrichment, so only edited content is re-embedded
+        reusable = await load_reusable_chunks(url, api_name) if REUSE_UNCHANGED_CHUNKS else {}
         
-        # Store chunks in parallel
-        insert_tasks = [
-            insert_chunk(chunk) 
-            for chunk in processed_chunks
-        ]
-        await asyncio.gather(*insert_tasks)
+        # Process chunks in parallel, skipping or linking near-duplicates
+        dedup_index = get_dedup_index(api_name, DEDUP_MAX_DISTANCE) if DEDUP_MODE != "off" else None
+        if dedup_index:
+            # The page's previous chunks are being replaced; the ones still present register again
+            dedup_index.forget(url)
+        tasks = []
+        for i, chunk in enumerate(chunks):
+            chunk_hash = content_hash(chunk)
+            canonical = dedup_index.check(chunk, url, i, chunk_hash) if dedup_index else None
+            stored = reusable.get(chunk_hash)
+            if canonical is None and stored is not None:
+                tasks.append(reuse_chunk(chunk, i, url, api_name, stored, page_metadata))
+            elif canonical is None:
+                tasks.append(process_chunk(chunk, i, url, api_name, page_metadata))
+            elif DEDUP_MODE == "link":
+                tasks.append(link_duplicate_chunk(chunk, i, url, api_name, canonical, page_metadata))
+            else:
+                print(f"Skipping near-duplicate chunk {i} for {url} (duplicate of {canonical.url} chunk {canonical.chunk_number})")
+        
+        failed = 0
+        if INGEST_WRITER == "copy":
+            # Store the page's chunks with one COPY and merge; when they replace the
+            # stored ones, leftovers are retired in the same transaction
+            processed_chunks = await asyncio.gather(*tasks)
+            loader = await get_pg_loader()
+            stored = await loader.write_chunks(processed_chunks, overwrite, page_url=url if overwrite else None) > 0
+            results = [(chunk.chunk_number, chunk.title, stored) for chunk in processed_chunks]
+            del processed_chunks
+        else:
+            # Insert each chunk as soon as it is processed so it can be freed
+            outcomes = await asyncio.gather(*(process_and_insert(task, overwrite) for task in tasks), return_exceptions=True)
+            results = []
+            for outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    logger.log_general_error(api_name, url, f"Error storing chunk: {sanitize_text(str(outcome))}")
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    results.append(outcome)
+            stored = any(written for _, _, written in results)
+            
+            # Drop chunks left over from a longer previous version of the page, unless some
+            # chunks failed or existing chunks were kept rather than replaced (no overwrite)
+            if failed:
+                print(f"{failed} chunks of {url} failed; keeping previously stored chunks")
+                # Leave the content hash unset so the next crawl does not skip the page as unchanged
+                page_metadata = dict(page_metadata, page_hash=None)
+            elif overwrite:
+                retired = await retire_stale_chunks(url, api_name, [chunk_number for chunk_number, _, _ in results])
+                stored = stored or retired > 0
+        
+        # Other pages' links into chunks this page no longer has re-resolve on their next crawl
+        if overwrite:
+            await invalidate_duplicate_links(url, api_name)
+        
+        # Keep the page catalog in step with the stored chunks
+        await upsert_page_record(url, api_name, results[0][1] if results else None, len(results), page_metadata)
+        
+        # Invalidate cached retrieval results for this source
+        if stored:
+            await bump_source_version(api_name)
+        return not failed
     except Exception as e:
         # Sanitize error message before logging and printing
         sanitized_error = sanitize_text(str(e))
         logger.log_general_error(api_name, url, f"Error processing document: {sanitized_error}")
         print(f"Error processing {url}: {sanitized_error}")
+        return False
 
 async def crawl_with_rate_limit(
     crawler: AsyncWebCrawler, 
@@ -510,9 +1217,45 @@ async def crawl_parallel(urls: List[str], api_config: CryptoApiConfig, max_concu
     crawl_config = CrawlerRunConfig(
         cache_mode=CacheMode.BYPASS,
         wait_until=wait_until,
-        page_timeout=page_timeout
+        page_timeout=page_timeout,
+        # Pruning produces fit_markdown with low-value blocks (menus, footers) removed
+        markdown_generator=DefaultMarkdownGenerator(content_filter=PruningContentFilter()) if USE_FIT_MARKDOWN else None
     )
 
+    archive = RawPageArchive(api_config.name) if ARCHIVE_RAW_PAGES else None
+
+    # Learn the API's boilerplate before storing any page: from its saved set,
+    # else from archived pages, else from the first pages of this crawl, which
+    # wait in deferred_pages until the sample is full
+    stripper = None
+    deferred_pages: List[Tuple[str, str]] = []
+    if STRIP_BOILERPLATE:
+        stripper = get_boilerplate_stripper(api_config.name)
+        if not stripper.is_settled and archive:
+            archived = ((page.url, page.markdown) for page in archive.iter_pages())
+            stripper = await run_blocking(train_boilerplate_stripper, api_config.name, archived)
+        if stripper.is_settled:
+            settle_boilerplate_stripper(api_config.name)
+
+    async def store_page(url: str, markdown: str):
+        await process_and_store_document(
+            url, 
+            markdown, 
+            api_config.name,
+            category=api_config.category
+        )
+        completed_urls.append(url)
+        await save_progress(api_config.name, completed_urls)
+
+    async def store_deferred_pages():
+        """Freeze the stripper and store the pages that waited for it."""
+        settle_boilerplate_stripper(api_config.name)
+        pages = deferred_pages[:]
+        deferred_pages.clear()
+        print(f"Learned {api_config.name} boilerplate; storing {len(pages)} deferred pages")
+        for url, markdown in pages:
+            await store_page(url, markdown)
+
     # Start with a reasonable batch size
     current_batch_size = get_dynamic_batch_size()
     
@@ -549,13 +1292,22 @@ async def crawl_parallel(urls: List[str], api_config: CryptoApiConfig, max_concu
                         
                         if result and result.success:
                             print(f"Successfully crawled: {url}")
-                            await process_and_store_document(
-                                url, 
-                                result.markdown_v2.raw_markdown, 
-                                api_config.name
-                            )
-                            completed_urls.append(url)
-                            await save_progress(api_config.name, completed_urls)
+                            markdown = result.markdown_v2.raw_markdown
+                            if USE_FIT_MARKDOWN and result.markdown_v2.fit_markdown:
+                                markdown = result.markdown_v2.fit_markdown
+                            if archive:
+                                try:
+                                    await run_blocking(archive.append, url, markdown, result.status_code, result.response_headers)
+                                except Exception as e:
+                                    sanitized_error = sanitize_text(str(e))
+                                    logger.log_general_error(api_config.name, url, f"Error archiving page: {sanitized_error}")
+                            if stripper is not None and not stripper.is_settled:
+                                train_boilerplate_stripper(api_config.name, [(url, markdown)])
+                                deferred_pages.append((url, markdown))
+                                if stripper.is_settled:
+                                    await store_deferred_pages()
+                            else:
+                                await store_page(url, markdown)
                         elif result:
                             # Sanitize error message before logging and printing
                             sanitized_error = sanitize_text(result.error_message)
@@ -617,6 +1369,10 @@ async def crawl_parallel(urls: List[str], api_config: CryptoApiConfig, max_concu
             gc.collect()
             await asyncio.sleep(5)  # Allow OS to reclaim memory
 
+    # Fewer pages than a full sample were fetched; strip them with what was learned
+    if deferred_pages:
+        await store_deferred_pages()
+
 async def process_api(api_config: CryptoApiConfig):
     """Process a single API's documentation."""
     print(f"\n{'='*50}")
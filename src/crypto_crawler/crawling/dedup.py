@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+Near-duplicate chunk detection for crawled documentation.
+
+Documentation portals repeat the same boilerplate (authentication sections,
+rate-limit notes, SDK install snippets) on many pages. This module fingerprints
+chunks with a 64-bit SimHash and indexes the fingerprints with LSH banding so
+that near-duplicates within an API can be found without comparing every pair.
+
+Among near-duplicates, the chunk with the lowest (url, chunk_number) is the
+canonical one, so the choice does not depend on the order pages are crawled in.
+"""
+
+import re
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3  # Number of consecutive words per shingle
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+@dataclass
+class CanonicalChunk:
+    """Reference to the chunk that stands for its near-duplicates."""
+    url: str
+    chunk_number: int
+    fingerprint: int
+    chunk_hash: Optional[str] = None  # Content hash, to tell when the stored chunk has changed
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (self.url, self.chunk_number)
+
+def _hash_token(token: str) -> int:
+    """Hash a token to a stable 64-bit integer."""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> int:
+    """
+    Compute a 64-bit SimHash fingerprint of a text.
+
+    Args:
+        text: The text to fingerprint
+        shingle_size: Number of consecutive words in each shingle
+
+    Returns:
+        The fingerprint as an integer
+    """
+    words = _TOKEN_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    # Count each shingle once per occurrence; identical shingles add weight
+    weights: Dict[int, int] = {}
+    for shingle in shingles:
+        token_hash = _hash_token(shingle)
+        weights[token_hash] = weights.get(token_hash, 0) + 1
+
+    vector = [0] * FINGERPRINT_BITS
+    for token_hash, weight in weights.items():
+        for bit in range(FINGERPRINT_BITS):
+            if token_hash >> bit & 1:
+                vector[bit] += weight
+            else:
+                vector[bit] -= weight
+
+    fingerprint = 0
+    for bit, value in enumerate(vector):
+        if value > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return (a ^ b).bit_count()
+
+class NearDuplicateIndex:
+    """
+    LSH-banded SimHash index of the chunks seen for a single API.
+
+    The 64-bit fingerprint is split into ``max_distance + 1`` bands. By the
+    pigeonhole principle, two fingerprints within ``max_distance`` bits of each
+    other agree exactly on at least one band, so band lookups find every
+    near-duplicate while only comparing against a handful of candidates.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        """
+        Initialize the index.
+
+        Args:
+            max_distance: Maximum Hamming distance for two chunks to count as near-duplicates
+        """
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_width = FINGERPRINT_BITS // self.num_bands
+        self._bands: List[Dict[int, List[CanonicalChunk]]] = [{} for _ in range(self.num_bands)]
+        self._by_url: Dict[str, Dict[int, CanonicalChunk]] = {}
+        self.duplicates_found = 0
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        """Split a fingerprint into (band index, band value) pairs."""
+        keys = []
+        for band in range(self.num_bands):
+            shift = band * self.band_width
+            # The last band absorbs any leftover bits
+            width = FINGERPRINT_BITS - shift if band == self.num_bands - 1 else self.band_width
+            keys.append((band, (fingerprint >> shift) & ((1 << width) - 1)))
+        return keys
+
+    def find(self, fingerprint: int) -> Optional[CanonicalChunk]:
+        """Return the canonical chunk closest to the fingerprint, if any is within range."""
+        best: Optional[CanonicalChunk] = None
+        best_rank = (self.max_distance + 1, "", 0)
+        for band, value in self._band_keys(fingerprint):
+            for candidate in self._bands[band].get(value, ()):
+                # Ties go to the lowest (url, chunk_number), whatever order they were added in
+                rank = (hamming_distance(fingerprint, candidate.fingerprint), *candidate.key)
+                if rank < best_rank:
+                    best, best_rank = candidate, rank
+        return best
+
+    def add(self, url: str, chunk_number: int, fingerprint: int, chunk_hash: Optional[str] = None) -> CanonicalChunk:
+        """Register a chunk as canonical for its fingerprint, replacing any earlier entry for it."""
+        self.remove(url, chunk_number)
+        canonical = CanonicalChunk(url=url, chunk_number=chunk_number, fingerprint=fingerprint, chunk_hash=chunk_hash)
+        for band, value in self._band_keys(fingerprint):
+            self._bands[band].setdefault(value, []).append(canonical)
+        self._by_url.setdefault(url, {})[chunk_number] = canonical
+        return canonical
+
+    def remove(self, url: str, chunk_number: int):
+        """Unregister a canonical chunk, if it is registered."""
+        canonical = self._by_url.get(url, {}).pop(chunk_number, None)
+        if canonical is None:
+            return
+        if not self._by_url[url]:
+            del self._by_url[url]
+        for band, value in self._band_keys(canonical.fingerprint):
+            bucket = self._bands[band][value]
+            bucket.remove(canonical)
+            if not bucket:
+                del self._bands[band][value]
+
+    def forget(self, url: str):
+        """Unregister every canonical chunk of a page, e.g. before its chunks are rewritten."""
+        for chunk_number in list(self._by_url.get(url, ())):
+            self.remove(url, chunk_number)
+
+    def check(self, text: str, url: str, chunk_number: int, chunk_hash: Optional[str] = None) -> Optional[CanonicalChunk]:
+        """
+        Check a chunk against the index and register it if it is new.
+
+        A chunk that sorts before the canonical chunk it matches takes its
+        place; the previous canonical chunk is still stored in full, so links
+        to it stay valid until its page is rewritten.
+
+        Args:
+            text: The chunk content
+            url: URL of the page the chunk belongs to
+            chunk_number: Position of the chunk within the page
+            chunk_hash: Content hash of the chunk, recorded for links to it
+
+        Returns:
+            The canonical chunk if this one is a near-duplicate, otherwise None
+        """
+        fingerprint = simhash(text)
+        canonical = self.find(fingerprint)
+        if canonical is None or canonical.key == (url, chunk_number):
+            self.add(url, chunk_number, fingerprint, chunk_hash)
+            return None
+        if (url, chunk_number) < canonical.key:
+            self.remove(canonical.url, canonical.chunk_number)
+            self.add(url, chunk_number, fingerprint, chunk_hash)
+            return None
+        self.duplicates_found += 1
+        return canonical
+
+# One index per API, kept for the lifetime of the process so that
+# duplicates are detected across crawl batches
+_indexes: Dict[str, NearDuplicateIndex] = {}
+
+def get_dedup_index(api_name: str, max_distance: int = 3) -> NearDuplicateIndex:
+    """Get (or create) the near-duplicate index for an API."""
+    index = _indexes.get(api_name)
+    if index is None or index.max_distance != max_distance:
+        index = NearDuplicateIndex(max_distance)
+        _indexes[api_name] = index
+    return index
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""
+Offline batch re-processing of crawled documentation.
+
+Re-chunks, re-summarizes, re-embeds and upserts pages from stored content
+instead of fetching them again. Pages come from the local raw-page archive,
+and pages missing from it (for example, crawled before archiving was enabled)
+are reassembled from the chunks already stored in ``crypto_api_site_pages``.
+"""
+
+import asyncio
+from itertools import islice
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from crypto_crawler.api.config import load_crypto_api_configs
+from crypto_crawler.crawling.archive import RawPageArchive, list_archived_apis
+from crypto_crawler.crawling.boilerplate import settle_boilerplate_stripper
+from crypto_crawler.crawling.crawler import (
+    STRIP_BOILERPLATE,
+    supabase,
+    get_pipeline_version,
+    train_boilerplate_stripper,
+    process_and_store_document
+)
+from crypto_crawler.utils.db import run_blocking
+
+PAGE_SIZE = 1000  # Rows per request; PostgREST caps unpaginated responses
+
+@dataclass
+class StoredPage:
+    """
+    A page to re-process.
+
+    content_hash is the hash of the page as fetched: the archived copy's hash,
+    or for pages reassembled from chunks, the page_hash the chunks were stored
+    with (the joined chunks hash differently from the fetched page).
+    """
+    url: str
+    markdown: str
+    content_hash: Optional[str] = None
+    from_archive: bool = False
+
+def fetch_all_rows(query_factory, page_size: int = PAGE_SIZE) -> List[Dict]:
+    """
+    Fetch every row of a query, paging past the PostgREST row cap.
+
+    Args:
+        query_factory: Callable returning a fresh, ordered query builder
+        page_size: Number of rows per request
+    """
+    rows = []
+    start = 0
+    while True:
+        result = query_factory().range(start, start + page_size - 1).execute()
+        rows.extend(result.data)
+        if len(result.data) < page_size:
+            return rows
+        start += page_size
+
+def get_stored_versions(api_name: str) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """
+    Map each cataloged URL of an API to the (content_hash, pipeline_version) it was processed with.
+
+    Read from the page catalog, which leaves the hash unset for pages with failed
+    chunks (chunk metadata may already carry the new hash for the chunks that were stored).
+    """
+    rows = fetch_all_rows(
+        lambda: supabase.table("crypto_api_pages")
+        .select("url, content_hash, pipeline_version")
+        .eq("source", api_name)
+        .order("url")
+    )
+    return {row["url"]: (row.get("content_hash"), row.get("pipeline_version")) for row in rows}
+
+def list_stored_urls(api_name: str) -> List[str]:
+    """List the URLs of an API that have stored chunks, without reading their content."""
+    rows = fetch_all_rows(
+        lambda: supabase.table("crypto_api_site_pages")
+        .select("url, chunk_number")
+        .eq("source", api_name)
+        .order("url")
+        .order("chunk_number")
+    )
+    return list(dict.fromkeys(row["url"] for row in rows))
+
+def load_page_from_database(url: str) -> Optional[StoredPage]:
+    """Reassemble one page from its stored chunks, ordered by chunk number."""
+    rows = fetch_all_rows(
+        lambda: supabase.table("crypto_api_site_pages")
+        .select("chunk_number, content, page_hash:metadata->>page_hash")
+        .eq("url", url)
+        .order("chunk_number")
+    )
+    if not rows:
+        return None
+    return StoredPage(url=url, markdown="\n\n".join(row["content"] for row in rows), content_hash=rows[0].get("page_hash"))
+
+def load_pages_from_database(urls: List[str]) -> List[StoredPage]:
+    """Reassemble several pages from their stored chunks, skipping any deleted meanwhile."""
+    return [page for page in map(load_page_from_database, urls) if page is not None]
+
+def read_pages(pages: Iterator[StoredPage], count: int) -> List[StoredPage]:
+    """Read up to count pages from an iterator."""
+    return list(islice(pages, count))
+
+def iter_pages_from_archive(api_name: str) -> Iterator[StoredPage]:
+    """Stream the latest archived copy of every page of an API."""
+    for page in RawPageArchive(api_name).iter_pages():
+        yield StoredPage(url=page.url, markdown=page.markdown, content_hash=page.content_hash, from_archive=True)
+
+def is_up_to_date(page: StoredPage, stored: Optional[Tuple[Optional[str], Optional[str]]], pipeline_version: str) -> bool:
+    """Check whether a page's stored chunks were produced from the same content and settings."""
+    if stored is None:
+        return False
+    page_hash, stored_pipeline_version = stored
+    # Without a hash, some of the page's chunks failed when it was last stored
+    if stored_pipeline_version != pipeline_version or page_hash is None:
+        return False
+    # Pages reassembled from the database are the stored content by definition
+    return not page.from_archive or page.content_hash == page_hash
+
+async def reprocess_api(api_name: str, batch_size: int = 10, force: bool = False, category: Optional[str] = None) -> Dict[str, int]:
+    """
+    Re-process every stored page of an API without fetching anything.
+
+    Args:
+        api_name: Name of the API to re-process
+        batch_size: Number of pages processed concurrently
+        force: Re-process pages even if they are already up to date
+        category: API category written into chunk metadata
+
+    Returns:
+        Counts of processed, skipped and failed pages
+    """
+    stats = {"processed": 0, "skipped": 0, "failed": 0}
+    has_archive = api_name in list_archived_apis()
+
+    # Learn the API's boilerplate before storing any page. Only archived pages
+    # are sampled; pages reassembled from chunks were stripped when stored.
+    if STRIP_BOILERPLATE:
+        if has_archive:
+            archived = ((page.url, page.markdown) for page in iter_pages_from_archive(api_name))
+            await run_blocking(train_boilerplate_stripper, api_name, archived)
+        settle_boilerplate_stripper(api_name)
+    pipeline_version = get_pipeline_version(api_name)
+
+    # Archived copies are preferred; stored chunks fill in the pages the archive lacks
+    archived_urls = set(await run_blocking(RawPageArchive(api_name).urls)) if has_archive else set()
+    stored_urls = await run_blocking(list_stored_urls, api_name)
+    database_urls = [url for url in stored_urls if url not in archived_urls]
+    print(f"Re-processing {api_name}: {len(archived_urls)} pages from the local page archive, "
+          f"{len(database_urls)} from stored chunks")
+
+    stored_versions = {} if force else await run_blocking(get_stored_versions, api_name)
+
+    async def process_page(page: StoredPage):
+        stored = await process_and_store_document(
+            page.url, page.markdown, api_name, overwrite=True, category=category,
+            skip_unchanged=False, page_hash=page.content_hash
+        )
+        stats["processed" if stored else "failed"] += 1
+
+    async def process_pages(pages: List[StoredPage]):
+        pending = []
+        for page in pages:
+            if not force and is_up_to_date(page, stored_versions.get(page.url), pipeline_version):
+                stats["skipped"] += 1
+            else:
+                pending.append(page)
+        await asyncio.gather(*[process_page(page) for page in pending])
+        print(f"{api_name}: {stats['processed']} pages processed, {stats['skipped']} up to date, {stats['failed']} failed")
+
+    # Pages are read a batch at a time on a worker thread: archive reads decompress
+    # on disk, and reassembling a page from chunks is one query per page
+    if has_archive:
+        archived_pages = iter_pages_from_archive(api_name)
+        while pages := await run_blocking(read_pages, archived_pages, batch_size):
+            await process_pages(pages)
+
+    # A page reassembled from the database is its stored content, so only its
+    # catalog row decides whether it is up to date; check before loading it
+    if not force:
+        up_to_date = {
+            url for url in database_urls
+            if is_up_to_date(StoredPage(url=url, markdown=""), stored_versions.get(url), pipeline_version)
+        }
+        stats["skipped"] += len(up_to_date)
+        database_urls = [url for url in database_urls if url not in up_to_date]
+    for start in range(0, len(database_urls), batch_size):
+        await process_pages(await run_blocking(load_pages_from_database, database_urls[start:start + batch_size]))
+
+    print(f"Finished re-processing {api_name}: {stats['processed']} pages processed, "
+          f"{stats['skipped']} up to date, {stats['failed']} failed")
+    return stats
+
+async def reprocess_documents(api_name: Optional[str] = None, batch_size: int = 10, force: bool = False):
+    """
+    Re-process stored documentation for one API or for every configured API.
+
+    Args:
+        api_name: Optional API name to re-process (default: all)
+        batch_size: Number of pages processed concurrently
+        force: Re-process pages even if they are already up to date
+    """
+    configs = load_crypto_api_configs()
+    if api_name:
+        configs = [config for config in configs if config.name.lower() == api_name.lower()]
+        if not configs:
+            print(f"Error: API '{api_name}' not found in configurations.")
+            return
+
+    for config in configs:
+        await reprocess_api(config.name, batch_size, force, config.category)
@@ -0,0 +1,41 @@
+"""
+Chunk records produced by the crawler and written by the ingest writers.
+"""
+
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+def format_vector(values: Iterable[float]) -> str:
+    """Format values as a pgvector literal; 9 significant digits round-trip float32 exactly."""
+    return "[" + ",".join(f"{value:.9g}" for value in values) + "]"
+
+@dataclass(slots=True)
+class ProcessedChunk:
+    """
+    A chunk ready to be stored.
+
+    The embedding is kept as a float32 array (about 6 KB for 1536 dimensions,
+    against about 50 KB as a list of Python floats) and converted to the wire
+    format only when written. enrichment_status is "pending" while a failed
+    title/summary or embedding request waits in the retry queue, and
+    "duplicate" for a linked near-duplicate that has no embedding of its own.
+    """
+    url: str
+    chunk_number: int
+    title: str
+    summary: str
+    content: str
+    metadata: Dict[str, Any]
+    embedding: Optional[array]
+    enrichment_status: str = "complete"
+
+    def __post_init__(self):
+        if self.embedding is not None and not isinstance(self.embedding, array):
+            self.embedding = array("f", self.embedding)
+
+    def embedding_literal(self) -> Optional[str]:
+        """Format the embedding as a pgvector literal."""
+        if self.embedding is None:
+            return None
+        return format_vector(self.embedding)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Measure the memory held by processed chunks during ingest.
+
+Simulates enriching and writing a batch of synthetic chunks three ways:
+
+- list: embeddings as lists of Python floats, every chunk held until all are written
+  (the previous ProcessedChunk representation)
+- array: ProcessedChunk with float32 embeddings, every chunk held until all are written
+  (the COPY writer, which writes a page's chunks together)
+- array-streamed: ProcessedChunk written as soon as it is built and then dropped
+  (the PostgREST writer)
+
+For each mode it reports peak traced memory, with and without chunk content
+(content is the same in every mode), and the time taken. No database or API
+access is needed.
+
+Usage:
+    python -m crypto_crawler.scripts.benchmark_chunk_memory --chunks 10000
+"""
+
+import gc
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from crypto_crawler.crawling.records import ProcessedChunk
+
+@dataclass
+class ListChunk:
+    """The previous chunk record: a regular dataclass with a list embedding."""
+    url: str
+    chunk_number: int
+    title: str
+    summary: str
+    content: str
+    metadata: Dict[str, Any]
+    embedding: Optional[List[float]]
+
+def unit_vector(dimensions: int) -> List[float]:
+    """A random unit-length vector."""
+    rng = random.Random(0)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector]
+
+def build_chunk(record_type, i: int, base: List[float], content_size: int):
+    """Build one enriched chunk of the given record type."""
+    return record_type(
+        url=f"https://docs.example.com/reference/page-{i // 20}",
+        chunk_number=i % 20,
+        title=f"Endpoint {i} - Example API",
+        summary="Describes the request parameters, response fields and error codes of an endpoint.",
+        content="x" * content_size,
+        metadata={"source": "example", "chunk_size": content_size, "url_path": f"/reference/page-{i // 20}"},
+        # Fresh float objects per chunk, as when decoding an embeddings API response
+        embedding=[value * (1.0 + i * 1e-9) for value in base]
+    )
+
+def write_payload(chunk) -> int:
+    """Serialize a chunk the way it is sent to PostgREST and return the payload size."""
+    embedding = chunk.embedding_literal() if isinstance(chunk, ProcessedChunk) else chunk.embedding
+    data = {
+        "url": chunk.url,
+        "chunk_number": chunk.chunk_number,
+        "title": chunk.title,
+        "summary": chunk.summary,
+        "content": chunk.content,
+        "metadata": chunk.metadata,
+        "embedding": embedding
+    }
+    return len(json.dumps(data))
+
+def run_mode(mode: str, num_chunks: int, dimensions: int, content_size: int) -> Dict[str, float]:
+    """Run one ingest simulation and return its peak memory (MB) and duration (s)."""
+    base = unit_vector(dimensions)
+    record_type = ListChunk if mode == "list" else ProcessedChunk
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    if mode == "array-streamed":
+        for i in range(num_chunks):
+            write_payload(build_chunk(record_type, i, base, content_size))
+    else:
+        chunks = [build_chunk(record_type, i, base, content_size) for i in range(num_chunks)]
+        for chunk in chunks:
+            write_payload(chunk)
+        del chunks
+
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peak_mb": peak / 1024 / 1024, "seconds": elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory held by processed chunks during ingest")
+    parser.add_argument("--chunks", type=int, default=10000, help="Number of chunks to ingest")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding dimensions")
+    parser.add_argument("--content-size", type=int, default=5000, help="Characters of content per chunk")
+    args = parser.parse_args()
+
+    print(f"Ingesting {args.chunks} chunks, {args.dimensions} dimensions, {args.content_size} characters each")
+    print(f"{'mode':<16}{'peak MB':>12}{'without content':>18}{'seconds':>10}")
+    content_mb = args.chunks * sys.getsizeof("x" * args.content_size) / 1024 / 1024
+    for mode in ("list", "array", "array-streamed"):
+        result = run_mode(mode, args.chunks, args.dimensions, args.content_size)
+        # Streaming holds one chunk's content at a time; the others hold every chunk's
+        held_content = content_mb if mode != "array-streamed" else 0.0
+        print(f"{mode:<16}{result['peak_mb']:>12.1f}{result['peak_mb'] - held_content:>18.1f}{result['seconds']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Compare retrieval recall and scan latency across embedding sizes.
+
+Loads a sample of stored full-size embeddings, shortens them to each candidate
+size (first N dimensions, re-normalized, as text-embedding-3 returns them),
+and measures for each size:
+
+- recall@k of exact search against the full-size ranking
+- brute-force scan latency per query
+- vector payload per row
+
+Usage:
+    python -m crypto_crawler.scripts.benchmark_embedding_dimensions --sample 5000 --queries 200
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+load_dotenv()
+
+def load_embeddings(supabase: Client, sample_size: int, page_size: int = 1000) -> np.ndarray:
+    """Fetch up to sample_size stored embeddings as a float32 matrix."""
+    vectors = []
+    start = 0
+    while len(vectors) < sample_size:
+        end = min(start + page_size, sample_size) - 1
+        result = supabase.table("crypto_api_site_pages") \
+            .select("embedding") \
+            .not_.is_("embedding", "null") \
+            .order("id") \
+            .range(start, end) \
+            .execute()
+        for row in result.data:
+            # PostgREST returns pgvector values as "[x,y,...]" strings
+            embedding = row["embedding"]
+            vectors.append(json.loads(embedding) if isinstance(embedding, str) else embedding)
+        if len(result.data) < end - start + 1:
+            break
+        start = end + 1
+    return np.asarray(vectors, dtype=np.float32)
+
+def shorten(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the first dimensions and re-normalize each row."""
+    shortened = vectors[:, :dimensions]
+    norms = np.linalg.norm(shortened, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return shortened / norms
+
+def top_k(corpus: np.ndarray, query: np.ndarray, k: int, exclude: int) -> np.ndarray:
+    """Exact inner-product top-k, excluding the query's own row."""
+    scores = corpus @ query
+    scores[exclude] = -np.inf
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+def run_benchmark(vectors: np.ndarray, dimension_options: List[int], num_queries: int, k: int):
+    """Print recall@k and latency for each embedding size."""
+    rng = np.random.default_rng(42)
+    query_rows = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+
+    full = shorten(vectors, vectors.shape[1])
+    truth = {row: set(top_k(full, full[row], k, row)) for row in query_rows}
+
+    print(f"Corpus: {len(vectors)} vectors, {len(query_rows)} queries, k={k}\n")
+    print(f"{'dims':>6} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'bytes/row':>10}")
+
+    for dimensions in dimension_options:
+        if dimensions > vectors.shape[1]:
+            continue
+        corpus = shorten(vectors, dimensions)
+        latencies = []
+        hits = 0
+        for row in query_rows:
+            started = time.perf_counter()
+            result = top_k(corpus, corpus[row], k, row)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(truth[row].intersection(result))
+
+        recall = hits / (len(query_rows) * k)
+        print(
+            f"{dimensions:>6} {recall:>9.3f} {np.percentile(latencies, 50):>8.2f} "
+            f"{np.percentile(latencies, 99):>8.2f} {dimensions * 4:>10}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall and latency across embedding sizes")
+    parser.add_argument("--sample", type=int, default=5000, help="Number of stored embeddings to load")
+    parser.add_argument("--queries", type=int, default=200, help="Number of stored chunks used as queries")
+    parser.add_argument("--k", type=int, default=5, help="Number of results per query")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, 768, 1024, 1536],
+                        help="Embedding sizes to compare")
+    args = parser.parse_args()
+
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+    vectors = load_embeddings(supabase, args.sample)
+    if len(vectors) <= args.k:
+        print("Not enough stored embeddings to benchmark.")
+        return
+
+    run_benchmark(vectors, args.dimensions, args.queries, args.k)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Benchmark vector search modes against exact search on the stored corpus.
+
+Runs a set of queries through each search mode of
+``match_crypto_api_site_pages_quantized`` and reports p50/p99 latency and
+recall@k, using the 'exact' mode (sequential scan) as ground truth. The
+default ``match_crypto_api_site_pages`` function is measured as well.
+
+Usage:
+    python -m crypto_crawler.scripts.benchmark_vector_search --k 5 --candidates 100
+"""
+
+import os
+import time
+import asyncio
+import argparse
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from supabase import create_client, Client
+
+from crypto_crawler.utils.embeddings import get_embedder
+
+load_dotenv()
+
+DEFAULT_QUERIES = [
+    "How to get historical price data for Bitcoin",
+    "What are the rate limits for the free plan",
+    "How to authenticate requests with an API key",
+    "List all supported exchanges",
+    "Get OHLCV candles for a trading pair",
+    "coins markets endpoint vs_currency parameter",
+    "Websocket subscription for real-time trades",
+    "Get token balance for a wallet address",
+    "NFT collection floor price",
+    "DEX swap quote for token pair",
+    "Pagination parameters for list endpoints",
+    "Error codes and their meaning",
+    "Get current gas price on Ethereum",
+    "Market cap ranking of cryptocurrencies",
+    "Order book depth for a symbol",
+    "Historical funding rates for perpetual futures",
+    "How to convert between fiat and crypto prices",
+    "Transaction history for an address",
+    "Get block by number",
+    "Global market statistics and dominance",
+]
+
+def run_search(supabase: Client, mode: str, query_embedding: List[float], k: int, candidates: int) -> List[int]:
+    """Run one search and return the ids of the results."""
+    if mode == "default":
+        result = supabase.rpc(
+            "match_crypto_api_site_pages",
+            {"query_embedding": query_embedding, "match_count": k, "filter": {}}
+        ).execute()
+    else:
+        result = supabase.rpc(
+            "match_crypto_api_site_pages_quantized",
+            {
+                "query_embedding": query_embedding,
+                "match_count": k,
+                "filter": {},
+                "quantization": mode,
+                "candidate_count": candidates
+            }
+        ).execute()
+    return [row["id"] for row in result.data]
+
+def benchmark(supabase: Client, embeddings: List[List[float]], modes: List[str], k: int, candidates: int, repeats: int):
+    """Print latency percentiles and recall@k per search mode."""
+    truth = [set(run_search(supabase, "exact", embedding, k, candidates)) for embedding in embeddings]
+
+    print(f"{len(embeddings)} queries x {repeats} repeats, k={k}, candidates={candidates}\n")
+    print(f"{'mode':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for mode in modes:
+        latencies = []
+        hits = 0
+        for embedding, expected in zip(embeddings, truth):
+            for _ in range(repeats):
+                started = time.perf_counter()
+                ids = run_search(supabase, mode, embedding, k, candidates)
+                latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected.intersection(ids))
+
+        recall = hits / max(1, sum(len(expected) for expected in truth))
+        print(f"{mode:>8} {recall:>9.3f} {np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 99):>8.1f}")
+
+async def embed_queries(queries: List[str]) -> List[List[float]]:
+    """Embed the benchmark queries with the configured backend."""
+    embedder = get_embedder(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+    return await embedder.embed_batch(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized vector search against exact search")
+    parser.add_argument("--k", type=int, default=5, help="Number of results per query")
+    parser.add_argument("--candidates", type=int, default=100, help="Candidates rescored on full vectors")
+    parser.add_argument("--repeats", type=int, default=3, help="Times each query is timed")
+    parser.add_argument("--modes", nargs="+", default=["default", "halfvec", "binary"], help="Search modes to compare")
+    parser.add_argument("--queries-file", help="File with one query per line (default: built-in queries)")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        with open(args.queries_file, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+    embeddings = asyncio.run(embed_queries(queries))
+    benchmark(supabase, embeddings, args.modes, args.k, args.candidates, args.repeats)
+
+if __name__ == "__main__":
+    main()
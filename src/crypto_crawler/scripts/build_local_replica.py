@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""
+Build or refresh the local vector replica used by the RAG agent.
+
+Requires config/replica_changes.sql, which records the chunk changes and
+deletions the replica applies on refresh.
+
+Usage:
+    LOCAL_REPLICA_DIR=replica python -m crypto_crawler.scripts.build_local_replica [--rebuild]
+"""
+
+import os
+import argparse
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from crypto_crawler.api.replica import load_replica_from_env
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or refresh the local vector replica")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the snapshot and load every chunk again")
+    args = parser.parse_args()
+
+    replica = load_replica_from_env()
+    if replica is None:
+        print("Set LOCAL_REPLICA_DIR to the directory that should hold the replica.")
+        return
+
+    supabase: Client = create_client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY")
+    )
+
+    if args.rebuild:
+        replica.rebuild(supabase)
+        print(f"Rebuilt replica with {replica.count} chunks")
+    else:
+        added = replica.refresh(supabase)
+        print(f"Added {added} chunks; replica now holds {replica.count} chunks")
+
+if __name__ == "__main__":
+    main()
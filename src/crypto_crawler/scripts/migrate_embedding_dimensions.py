@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Generate the SQL that migrates crypto_api_site_pages to a smaller embedding size.
+
+text-embedding-3 vectors are Matryoshka embeddings: the first N dimensions,
+re-normalized, are what the API returns when asked for ``dimensions=N``. The
+migration therefore shortens the stored vectors in place with pgvector's
+``subvector``/``l2_normalize`` (pgvector 0.7+) instead of re-embedding every
+chunk. Chunks whose embedding_version (see crawling/crawler.py) names the
+source size are relabelled with the target size, so the next crawl reuses
+their embeddings, titles and summaries instead of requesting them again.
+
+Every search function and expression index that names the vector size is
+recreated for the new size. They are rendered from their files in config/
+(DIMENSION_DEPENDENT_FILES), so the migration always matches those files.
+The quantized indexes are optional and are only recreated if they existed
+before the migration.
+
+Usage:
+    python -m crypto_crawler.scripts.migrate_embedding_dimensions --dimensions 768 > migrate.sql
+
+After running the SQL, set EMBEDDING_DIMENSIONS to the same value so ingest and
+query embeddings match the column.
+"""
+
+import os
+import re
+import argparse
+from typing import Dict, List
+
+from crypto_crawler.utils.embeddings import DEFAULT_DIMENSIONS, DEFAULT_OPENAI_MODEL, embedding_version
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))), "config")
+
+# Search functions, in the order they are set up; vector_index.sql replaces the
+# site_pages.sql version of match_crypto_api_site_pages
+DIMENSION_DEPENDENT_FILES = [
+    "vector_index.sql",
+    "hybrid_search.sql",
+    "per_source_search.sql",
+    "quantized_search.sql"
+]
+
+# Optional expression indexes, recreated only where they existed: index name -> file
+OPTIONAL_INDEX_FILES = {
+    "idx_crypto_api_site_pages_embedding_bit": "quantized_binary_index.sql",
+    "idx_crypto_api_site_pages_embedding_half": "quantized_halfvec_index.sql"
+}
+
+_SIZED_TYPE = re.compile(r"\b(vector|halfvec|bit)\(" + str(DEFAULT_DIMENSIONS) + r"\)")
+
+MIGRATION_TEMPLATE = """-- Migrate crypto_api_site_pages.embedding to vector({dimensions})
+begin;
+
+-- Dropping the column drops every index on it; note the optional ones to recreate
+create temporary table migrate_optional_indexes as
+select indexname
+from pg_indexes
+where tablename = 'crypto_api_site_pages'
+  and indexname in ({optional_index_names});
+
+alter table crypto_api_site_pages add column embedding_reduced vector({dimensions});
+
+-- Shorten existing vectors: first {dimensions} dimensions, re-normalized. They
+-- equal what the API returns at this size, so mark them reusable at it.
+update crypto_api_site_pages
+set embedding_reduced = l2_normalize(subvector(embedding, 1, {dimensions})),
+    metadata = case
+      when metadata->>'embedding_version' = '{source_version}'
+      then jsonb_set(metadata, '{{embedding_version}}', '"{target_version}"')
+      else metadata
+    end
+where embedding is not null;
+
+alter table crypto_api_site_pages drop column embedding;
+alter table crypto_api_site_pages rename column embedding_reduced to embedding;
+
+commit;
+
+-- Rebuild the vector index (and any per-source indexes) on the new column with
+-- `python main.py index build [--per-source]`
+
+{functions}
+{indexes}
+drop table migrate_optional_indexes;
+"""
+
+def render_for_dimensions(sql: str, dimensions: int) -> str:
+    """Replace the default vector size in SQL written for it."""
+    # Drop the files' "If EMBEDDING_DIMENSIONS is not 1536, replace ..." notes
+    lines = [line for line in sql.split("\n") if not line.startswith("-- If EMBEDDING_DIMENSIONS")]
+    return _SIZED_TYPE.sub(lambda m: f"{m.group(1)}({dimensions})", "\n".join(lines))
+
+def read_config_sql(name: str) -> str:
+    with open(os.path.join(CONFIG_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+def _sql_statements(sql: str) -> List[str]:
+    """Split a file of plain statements (no function bodies) on semicolons, dropping comments."""
+    body = "\n".join(line for line in sql.split("\n") if not line.lstrip().startswith("--"))
+    return [statement.strip() for statement in body.split(";") if statement.strip()]
+
+def generate_migration_sql(
+    dimensions: int,
+    model: str = DEFAULT_OPENAI_MODEL,
+    from_dimensions: int = DEFAULT_DIMENSIONS
+) -> str:
+    """
+    Render the migration SQL for a target embedding size.
+
+    Args:
+        dimensions: Target embedding size
+        model: Embedding model the stored vectors were made with
+        from_dimensions: Current embedding size of the stored vectors
+    """
+    if not 0 < dimensions <= DEFAULT_DIMENSIONS:
+        raise ValueError(f"Dimensions must be between 1 and {DEFAULT_DIMENSIONS}")
+
+    functions = []
+    for name in DIMENSION_DEPENDENT_FILES:
+        functions.append(f"-- config/{name} for vector({dimensions})\n")
+        functions.append(render_for_dimensions(read_config_sql(name), dimensions).rstrip() + "\n")
+
+    indexes = []
+    for index_name, name in OPTIONAL_INDEX_FILES.items():
+        statements = _sql_statements(render_for_dimensions(read_config_sql(name), dimensions))
+        executes = "\n".join(f"    execute $ddl${statement}$ddl$;" for statement in statements)
+        indexes.append(
+            f"-- config/{name} for vector({dimensions}), if the index existed\n"
+            f"do $$\nbegin\n"
+            f"  if exists (select 1 from migrate_optional_indexes where indexname = '{index_name}') then\n"
+            f"{executes}\n"
+            f"  end if;\nend;\n$$;\n"
+        )
+
+    return MIGRATION_TEMPLATE.format(
+        dimensions=dimensions,
+        source_version=embedding_version(model, from_dimensions),
+        target_version=embedding_version(model, dimensions),
+        optional_index_names=", ".join(f"'{index_name}'" for index_name in OPTIONAL_INDEX_FILES),
+        functions="\n".join(functions),
+        indexes="\n".join(indexes)
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate SQL to shorten stored embeddings")
+    parser.add_argument("--dimensions", type=int, required=True, help="Target embedding size (e.g. 512 or 768)")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", DEFAULT_OPENAI_MODEL),
+                        help="Embedding model of the stored vectors")
+    parser.add_argument("--from-dimensions", type=int, default=DEFAULT_DIMENSIONS,
+                        help="Current embedding size of the stored vectors")
+    args = parser.parse_args()
+    print(generate_migration_sql(args.dimensions, args.model, args.from_dimensions))
+
+if __name__ == "__main__":
+    main()
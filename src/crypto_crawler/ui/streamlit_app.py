@@ -22,17 +22,32 @@ from pydantic_ai.messages import (
     RetryPromptPart,
     ModelMessagesTypeAdapter
 )
-from crypto_crawler.api.expert import crypto_api_expert, PydanticAIDeps
+from crypto_crawler.api.expert import crypto_api_expert, PydanticAIDeps, query_embedding_cache
+from crypto_crawler.api.replica import load_replica_from_env
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-supabase: Client = Client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
+# Streamlit re-runs this script on every interaction; cached resources are
+# created once per server process instead of leaking a client per rerun
+@st.cache_resource
+def get_openai_client() -> AsyncOpenAI:
+    """Create the OpenAI client once per server process."""
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+@st.cache_resource
+def get_supabase_client() -> Client:
+    """Create the Supabase client once per server process."""
+    return Client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY")
+    )
+
+@st.cache_resource
+def get_replica():
+    """Open the local vector replica once per server process (None if not configured)."""
+    return load_replica_from_env()
 
 # Configure logfire to suppress warnings (optional)
 logfire.configure(send_to_logfire='never')
@@ -72,8 +87,9 @@ async def run_agent_with_streaming(user_input: str):
     """
     # Prepare dependencies
     deps = PydanticAIDeps(
-        supabase=supabase,
-        openai_client=openai_client
+        supabase=get_supabase_client(),
+        openai_client=get_openai_client(),
+        replica=get_replica()
     )
 
     # Run the agent in a stream
@@ -120,6 +136,13 @@ async def main():
             for part in msg.parts:
                 display_message_part(part)
 
+    # Show how often query embeddings are served from cache
+    cache_stats = query_embedding_cache.stats()
+    st.sidebar.caption(
+        f"Query embedding cache: {cache_stats['hit_rate']:.0%} hit rate "
+        f"({cache_stats['hits']} hits, {cache_stats['coalesced']} coalesced, {cache_stats['misses']} misses)"
+    )
+
     # Chat input for the user
     user_input = st.chat_input("What would you like to know about cryptocurrency APIs?")
 
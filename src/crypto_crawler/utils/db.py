@@ -0,0 +1,55 @@
+"""
+Non-blocking access to Supabase from async code.
+
+The Supabase client is synchronous: calling ``.execute()`` inside a coroutine
+stalls the event loop for the whole HTTP round trip, which serializes browser
+work, concurrent chunk inserts and chat sessions behind each request. The
+helpers here run those calls on a bounded thread pool instead. The client's
+underlying ``httpx.Client`` is thread-safe and keeps connections alive, so
+requests from the pool threads reuse pooled connections.
+"""
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Upper bound on Supabase requests in flight at once
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared thread pool used for database calls."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="supabase")
+    return _executor
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking function on the database thread pool.
+
+    Args:
+        func: Function to call
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The function's return value
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+async def execute(query) -> Any:
+    """
+    Execute a Supabase query or RPC builder without blocking the event loop.
+
+    Args:
+        query: Any builder with an ``execute()`` method, e.g. ``supabase.table(...).select(...)``
+
+    Returns:
+        The API response from ``execute()``
+    """
+    return await run_blocking(query.execute)
@@ -6,6 +6,7 @@ import os
 from typing import Optional, List, Dict, Any
 from supabase import create_client, Client
 
+from crypto_crawler.utils.db import execute
 from crypto_crawler.utils.error_logger import logger
 
 # Initialize Supabase client
@@ -32,12 +33,12 @@ async def get_duplicates(api_name: Optional[str] = None) -> List[Dict[str, Any]]
         
         if api_name:
             # Add API filter if specified
-            result = supabase.rpc(
+            result = await execute(supabase.rpc(
                 'find_duplicates_by_api',
                 {'api_source': api_name}
-            ).execute()
+            ))
         else:
-            result = supabase.rpc('find_duplicates').execute()
+            result = await execute(supabase.rpc('find_duplicates'))
             
         return result.data
         
@@ -62,7 +63,7 @@ async def delete_duplicates(duplicates: List[Dict[str, Any]], dry_run: bool = Fa
             # Delete older duplicates in batches of 100
             for i in range(0, len(ids_to_delete), 100):
                 batch = ids_to_delete[i:i + 100]
-                result = supabase.table("crypto_api_site_pages").delete().in_("id", batch).execute()
+                result = await execute(supabase.table("crypto_api_site_pages").delete().in_("id", batch))
                 
                 if result.data:
                     deleted_count += len(result.data)
@@ -73,23 +74,38 @@ async def delete_duplicates(duplicates: List[Dict[str, Any]], dry_run: bool = Fa
         
     return deleted_count
 
+async def delete_duplicates_in_database(api_name: Optional[str] = None, dry_run: bool = False) -> int:
+    """
+    Delete older duplicates with the set-based delete_duplicate_chunks function.
+
+    Args:
+        api_name: Optional API name to restrict the cleanup to
+        dry_run: Only count the rows that would be deleted
+
+    Returns:
+        Number of rows deleted (or that would be deleted)
+    """
+    result = await execute(supabase.rpc(
+        'delete_duplicate_chunks',
+        {'api_source': api_name, 'dry_run': dry_run}
+    ))
+    return result.data or 0
+
 async def cleanup_duplicates(api_name: Optional[str] = None, dry_run: bool = False):
     """Main cleanup function."""
     print(f"\nSearching for duplicates{f' for {api_name}' if api_name else ''}...")
     
-    duplicates = await get_duplicates(api_name)
-    
-    if not duplicates:
-        print("No duplicates found!")
-        return
-        
-    total_duplicates = sum(dup['count'] - 1 for dup in duplicates)
-    print(f"\nFound {len(duplicates)} URLs with duplicates ({total_duplicates} total duplicate entries)")
-    
     if dry_run:
         print("\nDRY RUN - No changes will be made")
-        
-    deleted = await delete_duplicates(duplicates, dry_run)
+    
+    try:
+        # One window-function statement on the server (see config/db_functions.sql)
+        deleted = await delete_duplicates_in_database(api_name, dry_run)
+    except Exception as e:
+        logger.log_general_error("db_cleanup", "delete_duplicate_chunks", f"Set-based cleanup unavailable, deleting per group: {e}")
+        deleted = await cleanup_duplicate_groups(api_name, dry_run)
+        if deleted is None:
+            return
     
     if dry_run:
         print(f"\nWould delete {deleted} duplicate entries")
@@ -97,3 +113,16 @@ async def cleanup_duplicates(api_name: Optional[str] = None, dry_run: bool = Fal
         print(f"\nDeleted {deleted} duplicate entries")
         
     print("\nCleanup complete!")
+
+async def cleanup_duplicate_groups(api_name: Optional[str] = None, dry_run: bool = False) -> Optional[int]:
+    """Fallback cleanup that deletes duplicates group by group; returns None when there are none."""
+    duplicates = await get_duplicates(api_name)
+    
+    if not duplicates:
+        print("No duplicates found!")
+        return None
+        
+    total_duplicates = sum(dup['count'] - 1 for dup in duplicates)
+    print(f"\nFound {len(duplicates)} URLs with duplicates ({total_duplicates} total duplicate entries)")
+    
+    return await delete_duplicates(duplicates, dry_run)
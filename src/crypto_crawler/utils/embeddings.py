@@ -0,0 +1,286 @@
+"""
+Embedding backends shared by the ingest pipeline and the RAG agent.
+
+The backend is selected with the EMBEDDING_BACKEND environment variable:
+
+- ``openai``: one OpenAI embeddings request per text (default)
+- ``openai-batched``: concurrent requests are coalesced into batched OpenAI calls
+- ``hashing``: deterministic feature-hashing embedder with no network access,
+  for offline tests and benchmarks
+- ``sentence-transformers``: a local sentence-transformers model
+
+EMBEDDING_DIMENSIONS sets the vector size. text-embedding-3 models return
+shortened (Matryoshka) vectors when asked for fewer dimensions; the value
+must match the ``vector(n)`` column of ``crypto_api_site_pages``.
+"""
+
+import os
+import re
+import json
+import math
+import asyncio
+import hashlib
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from openai import AsyncOpenAI
+
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+DEFAULT_DIMENSIONS = 1536  # Native size of text-embedding-3-small
+
+def get_embedding_dimensions() -> int:
+    """Vector size configured with EMBEDDING_DIMENSIONS."""
+    return int(os.getenv("EMBEDDING_DIMENSIONS", str(DEFAULT_DIMENSIONS)))
+
+def embedding_version(model_name: str, dimensions: int) -> str:
+    """
+    Fingerprint of the model and size that produced a stored embedding.
+
+    Recorded in chunk metadata so a stored embedding is only reused when it
+    matches the configured embedder.
+    """
+    settings = {"embedding_model": model_name, "embedding_dimensions": dimensions}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+class Embedder:
+    """Base class for embedding backends."""
+
+    model_name: str = "unknown"
+    dimensions: int = DEFAULT_DIMENSIONS
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed a single text."""
+        return (await self.embed_batch([text]))[0]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts, preserving their order."""
+        return list(await asyncio.gather(*[self.embed(text) for text in texts]))
+
+class OpenAIEmbedder(Embedder):
+    """OpenAI embeddings API, one request per call."""
+
+    def __init__(
+        self,
+        openai_client: AsyncOpenAI,
+        model: str = DEFAULT_OPENAI_MODEL,
+        dimensions: int = DEFAULT_DIMENSIONS
+    ):
+        self.openai_client = openai_client
+        self.model_name = model
+        self.dimensions = dimensions
+
+    def _request_options(self) -> Dict[str, int]:
+        """Only ask for shortened vectors when they differ from the native size."""
+        if self.dimensions == DEFAULT_DIMENSIONS:
+            return {}
+        return {"dimensions": self.dimensions}
+
+    async def embed(self, text: str) -> List[float]:
+        response = await self.openai_client.embeddings.create(
+            model=self.model_name,
+            input=text,
+            **self._request_options()
+        )
+        return response.data[0].embedding
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        response = await self.openai_client.embeddings.create(
+            model=self.model_name,
+            input=texts,
+            **self._request_options()
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+class BatchedOpenAIEmbedder(OpenAIEmbedder):
+    """
+    OpenAI embeddings with request coalescing.
+
+    Single ``embed`` calls made concurrently (for example by the chunks of a
+    page being processed in parallel) are queued for up to ``max_wait``
+    seconds and sent as one batched request of at most ``max_batch_size`` inputs.
+    """
+
+    def __init__(
+        self,
+        openai_client: AsyncOpenAI,
+        model: str = DEFAULT_OPENAI_MODEL,
+        dimensions: int = DEFAULT_DIMENSIONS,
+        max_batch_size: int = 64,
+        max_wait: float = 0.05
+    ):
+        super().__init__(openai_client, model, dimensions)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # The event loop only keeps weak references to tasks, so in-flight batches are held here
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Queued work from a previous event loop (e.g. a finished asyncio.run) can never complete
+            self._pending = []
+            self._flush_handle = None
+            self._tasks = set()
+            self._loop = loop
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send queued texts as batched requests."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Embed a batch and resolve the futures waiting on it."""
+        try:
+            vectors = await OpenAIEmbedder.embed_batch(self, [text for text, _ in batch])
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic feature-hashing embedder.
+
+    Word unigrams and bigrams are hashed into a fixed number of signed
+    buckets with sublinear term-frequency weights and the result is
+    L2-normalized. Identical text always yields an identical vector and
+    overlapping vocabulary yields similar vectors, which is enough to
+    exercise ingest and retrieval without any network access.
+    """
+
+    _TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model_name = f"hashing-{dimensions}"
+
+    def _vectorize(self, text: str) -> List[float]:
+        words = self._TOKEN_PATTERN.findall(text.lower())
+        features = Counter(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+        vector = [0.0] * self.dimensions
+        for feature, count in features.items():
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            sign = 1.0 if digest >> 63 else -1.0
+            vector[digest % self.dimensions] += sign * (1.0 + math.log(count))
+
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm == 0:
+            return vector
+        return [value / norm for value in vector]
+
+    async def embed(self, text: str) -> List[float]:
+        return self._vectorize(text)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self._vectorize(text) for text in texts]
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local sentence-transformers model, run in a worker thread."""
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The sentence-transformers backend requires `pip install sentence-transformers`"
+            ) from e
+
+        self._model = SentenceTransformer(model)
+        self.model_name = model
+        self.dimensions = self._model.get_sentence_embedding_dimension()
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        vectors = await asyncio.to_thread(self._model.encode, texts, normalize_embeddings=True)
+        return [vector.tolist() for vector in vectors]
+
+    async def embed(self, text: str) -> List[float]:
+        return (await self.embed_batch([text]))[0]
+
+def create_embedder(backend: str, openai_client: Optional[AsyncOpenAI] = None) -> Embedder:
+    """
+    Create an embedder for a backend name.
+
+    Args:
+        backend: One of "openai", "openai-batched", "hashing" or "sentence-transformers"
+        openai_client: Client used by the OpenAI backends
+
+    Returns:
+        The embedder instance
+    """
+    backend = backend.lower()
+    model = os.getenv("EMBEDDING_MODEL")
+    dimensions = get_embedding_dimensions()
+
+    if backend in ("openai", "openai-batched"):
+        if openai_client is None:
+            openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        if backend == "openai-batched":
+            return BatchedOpenAIEmbedder(openai_client, model or DEFAULT_OPENAI_MODEL, dimensions)
+        return OpenAIEmbedder(openai_client, model or DEFAULT_OPENAI_MODEL, dimensions)
+    if backend == "hashing":
+        return HashingEmbedder(dimensions)
+    if backend == "sentence-transformers":
+        embedder = SentenceTransformerEmbedder(model or "all-MiniLM-L6-v2")
+        if embedder.dimensions != dimensions:
+            raise ValueError(
+                f"Model {embedder.model_name} produces {embedder.dimensions}-dimensional vectors "
+                f"but EMBEDDING_DIMENSIONS is {dimensions}"
+            )
+        return embedder
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+# Embedders are shared per configuration so batching spans callers. Keying by
+# settings rather than by client keeps the cache bounded when callers create
+# clients repeatedly; clients with the same key and endpoint are interchangeable.
+_embedders: Dict[Hashable, Embedder] = {}
+
+def _embedder_key(backend: str, openai_client: Optional[AsyncOpenAI]) -> Hashable:
+    """Settings that determine the embedder a backend builds."""
+    key = (backend, os.getenv("EMBEDDING_MODEL"), get_embedding_dimensions())
+    if backend in ("openai", "openai-batched") and openai_client is not None:
+        key += (openai_client.api_key, str(openai_client.base_url))
+    return key
+
+def get_embedder(openai_client: Optional[AsyncOpenAI] = None) -> Embedder:
+    """
+    Get the embedder configured by EMBEDDING_BACKEND.
+
+    Args:
+        openai_client: Client used by the OpenAI backends when a new embedder
+            is created; a cached embedder keeps the client it was created with
+
+    Returns:
+        The shared embedder instance
+    """
+    backend = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+    key = _embedder_key(backend, openai_client)
+    if key not in _embedders:
+        _embedders[key] = create_embedder(backend, openai_client)
+    return _embedders[key]
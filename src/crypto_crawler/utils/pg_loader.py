@@ -0,0 +1,178 @@
+"""
+Direct Postgres bulk loader for processed chunks.
+
+The default write path upserts each chunk through PostgREST, sending the
+embedding as a JSON array of 1536 decimal numbers (tens of KB of text per
+row). This loader connects straight to Postgres with an asyncpg connection
+pool and streams a page's rows with binary ``COPY`` into a temporary staging
+table, where embeddings travel as binary ``real[]``: 8 bytes per dimension
+(a 4-byte length prefix and a 4-byte float per element) plus a 20-byte array
+header, about 12 KB for 1536 dimensions. One
+``INSERT ... SELECT ... ON CONFLICT`` then merges the staged rows into
+``crypto_api_site_pages`` in the same transaction.
+
+Requires ``pip install asyncpg`` and DATABASE_URL set to the database's
+direct or session-mode Postgres connection string (Supabase: Settings ->
+Database). The staging table lives for the session, so the transaction-mode
+pooler on port 6543 cannot be used.
+"""
+
+import os
+import json
+import asyncio
+from typing import Any, Iterable, Optional
+
+STAGING_TABLE = "crypto_api_site_pages_staging"
+COLUMNS = ("url", "chunk_number", "title", "summary", "content", "metadata", "source", "category", "embedding", "enrichment_status")
+
+# Session-local staging table; emptied when each load transaction commits
+CREATE_STAGING_SQL = f"""
+create temporary table if not exists {STAGING_TABLE} (
+    url varchar not null,
+    chunk_number integer not null,
+    title varchar not null,
+    summary varchar not null,
+    content text not null,
+    metadata text not null,
+    source text,
+    category text,
+    embedding real[],
+    enrichment_status text not null
+) on commit delete rows
+"""
+
+MERGE_SQL = f"""
+insert into crypto_api_site_pages (url, chunk_number, title, summary, content, metadata, source, category, embedding, enrichment_status)
+select url, chunk_number, title, summary, content, metadata::jsonb, source, category, embedding::vector, enrichment_status
+from {STAGING_TABLE}
+on conflict (url, chunk_number) do {{action}}
+"""
+
+# Drops a page's chunks that the latest processing run did not produce
+RETIRE_SQL = """
+delete from crypto_api_site_pages
+where url = $1 and chunk_number <> all($2::integer[])
+"""
+
+UPDATE_ACTION = """update set
+    title = excluded.title,
+    summary = excluded.summary,
+    content = excluded.content,
+    metadata = excluded.metadata,
+    source = excluded.source,
+    category = excluded.category,
+    embedding = excluded.embedding,
+    enrichment_status = excluded.enrichment_status"""
+
+class PostgresChunkLoader:
+    """Bulk-loads processed chunks over a pooled direct Postgres connection."""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 8):
+        """
+        Initialize the loader; call ``connect`` before writing.
+
+        Args:
+            dsn: Postgres connection string
+            min_size: Connections kept open in the pool
+            max_size: Maximum concurrent connections
+        """
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+
+    async def connect(self):
+        """Open the connection pool."""
+        try:
+            import asyncpg
+        except ImportError as e:
+            raise ImportError("The COPY ingest writer requires `pip install asyncpg`") from e
+
+        async def init_connection(connection):
+            await connection.execute(CREATE_STAGING_SQL)
+
+        self._pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            init=init_connection
+        )
+
+    async def close(self):
+        """Close the connection pool."""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def write_chunks(self, chunks: Iterable[Any], overwrite: bool = True, page_url: Optional[str] = None) -> int:
+        """
+        Copy chunks into the staging table and merge them into crypto_api_site_pages.
+
+        Args:
+            chunks: ProcessedChunk-like objects
+            overwrite: Replace existing (url, chunk_number) rows instead of keeping them
+            page_url: When the chunks are a page's complete chunk set, the page URL;
+                its other chunks are deleted in the same transaction
+
+        Returns:
+            Number of rows inserted, updated or retired
+        """
+        records = [
+            (
+                chunk.url,
+                chunk.chunk_number,
+                chunk.title,
+                chunk.summary,
+                chunk.content,
+                json.dumps(chunk.metadata),
+                chunk.metadata.get("source"),
+                chunk.metadata.get("category"),
+                list(chunk.embedding) if chunk.embedding is not None else None,
+                chunk.enrichment_status
+            )
+            for chunk in chunks
+        ]
+        if not records and page_url is None:
+            return 0
+
+        action = UPDATE_ACTION if overwrite else "nothing"
+        written = 0
+        async with self._pool.acquire() as connection:
+            async with connection.transaction():
+                if records:
+                    await connection.copy_records_to_table(STAGING_TABLE, records=records, columns=COLUMNS)
+                    # Status is "INSERT 0 <rows>"
+                    written += int((await connection.execute(MERGE_SQL.format(action=action))).split()[-1])
+                if page_url is not None:
+                    # Status is "DELETE <rows>"
+                    keep = [record[1] for record in records]
+                    written += int((await connection.execute(RETIRE_SQL, page_url, keep)).split()[-1])
+        return written
+
+_loader: Optional[PostgresChunkLoader] = None
+_loader_lock = asyncio.Lock()
+
+async def get_pg_loader() -> PostgresChunkLoader:
+    """Return the shared loader, connecting it on first use."""
+    global _loader
+    async with _loader_lock:
+        if _loader is not None:
+            return _loader
+        dsn = os.getenv("DATABASE_URL")
+        if not dsn:
+            raise ValueError("DATABASE_URL must be set to use the COPY ingest writer")
+        loader = PostgresChunkLoader(
+            dsn,
+            min_size=int(os.getenv("PG_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("PG_POOL_MAX_SIZE", "8"))
+        )
+        await loader.connect()
+        _loader = loader
+        return _loader
+
+async def close_pg_loader():
+    """Close the shared loader's pool, if it was opened."""
+    global _loader
+    if _loader is not None:
+        await _loader.close()
+        _loader = None
@@ -0,0 +1,429 @@
+"""
+Vector index lifecycle management for crypto_api_site_pages.
+
+Chooses an ANN index for the current row count, builds it concurrently (so
+ingest and search continue during the build), swaps it in for the previous
+index, and records the query-time settings that ``match_crypto_api_site_pages``
+applies to every search (see config/vector_index.sql).
+
+- HNSW (m=16, ef_construction=64) up to HNSW_MAX_ROWS rows: best recall and
+  latency, with no training step, so it stays accurate as rows are added.
+- IVFFlat above that, where HNSW build time and memory grow too large. Lists
+  are sized to the row count (rows / 1000, or sqrt(rows) past a million rows)
+  and probes to sqrt(lists).
+
+With ``per_source``, each source with at least PARTIAL_INDEX_MIN_ROWS rows
+also gets a partial index (``where source = '...'``). Searches filtered to
+that source then walk an index holding only its rows and return complete
+results, instead of post-filtering the global index. Each partial index is
+planned for its own row count, and its settings are recorded per source and
+tuned separately by the benchmark. Smaller sources are ranked exactly
+through the btree index on ``source``.
+
+Indexes use ``vector_ip_ops``: every embedding backend stores unit-length
+vectors, so inner product ranks exactly like cosine distance and is cheaper.
+
+Index DDL cannot go through PostgREST, so this module connects directly with
+asyncpg using DATABASE_URL (as the COPY ingest writer does).
+"""
+
+import os
+import re
+import math
+import time
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+TABLE = "crypto_api_site_pages"
+INDEX_NAME = "idx_crypto_api_site_pages_embedding"
+BUILD_INDEX_NAME = f"{INDEX_NAME}_build"
+
+HNSW_MAX_ROWS = int(os.getenv("HNSW_MAX_ROWS", "1000000"))
+MAINTENANCE_WORK_MEM = os.getenv("INDEX_MAINTENANCE_WORK_MEM", "1GB")
+PARTIAL_INDEX_MIN_ROWS = int(os.getenv("PARTIAL_INDEX_MIN_ROWS", "10000"))
+
+# Indexes on the plain embedding column (not the quantized expression indexes)
+_VECTOR_INDEX_PATTERN = re.compile(r"USING (hnsw|ivfflat) \(embedding ")
+
+@dataclass
+class IndexPlan:
+    """An ANN index configuration and its query-time settings."""
+    method: str
+    row_count: int
+    lists: Optional[int] = None
+    probes: int = 1
+    m: int = 16
+    ef_construction: int = 64
+    ef_search: int = 40
+    source: Optional[str] = None  # Partial index over one source's rows
+
+    def create_sql(self, name: str) -> str:
+        """CREATE INDEX CONCURRENTLY statement for this plan."""
+        if self.method == "hnsw":
+            options = f"m = {self.m}, ef_construction = {self.ef_construction}"
+        else:
+            options = f"lists = {self.lists}"
+        sql = (
+            f"create index concurrently {name} on {TABLE} "
+            f"using {self.method} (embedding vector_ip_ops) with ({options})"
+        )
+        if self.source is not None:
+            sql += " where source = '" + self.source.replace("'", "''") + "'"
+        return sql
+
+def source_index_name(source: str) -> str:
+    """Stable index name for a source's partial index, within Postgres' 63-character limit."""
+    slug = re.sub(r"[^a-z0-9]+", "_", source.lower()).strip("_")[:24]
+    digest = hashlib.md5(source.encode("utf-8")).hexdigest()[:8]
+    return f"idx_site_pages_emb_{slug}_{digest}"
+
+def plan_index(row_count: int, method: str = "auto") -> IndexPlan:
+    """
+    Choose an index type and parameters for a row count.
+
+    Args:
+        row_count: Number of rows with an embedding
+        method: "auto", "hnsw" or "ivfflat"
+
+    Returns:
+        The index plan
+    """
+    if method == "auto":
+        method = "hnsw" if row_count <= HNSW_MAX_ROWS else "ivfflat"
+    if method == "hnsw":
+        return IndexPlan(method="hnsw", row_count=row_count)
+    if method != "ivfflat":
+        raise ValueError(f"Unknown index method: {method}")
+
+    # pgvector's guidance: rows / 1000 lists up to 1M rows, sqrt(rows) beyond
+    if row_count <= 1_000_000:
+        lists = max(1, row_count // 1000)
+    else:
+        lists = int(math.sqrt(row_count))
+    return IndexPlan(method="ivfflat", row_count=row_count, lists=lists, probes=max(1, round(math.sqrt(lists))))
+
+async def connect():
+    """Open a direct Postgres connection from DATABASE_URL."""
+    try:
+        import asyncpg
+    except ImportError as e:
+        raise ImportError("Vector index management requires `pip install asyncpg`") from e
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        raise ValueError("DATABASE_URL must be set to manage the vector index")
+    return await asyncpg.connect(dsn)
+
+async def count_embedded_rows(connection) -> int:
+    """Number of rows with an embedding."""
+    return await connection.fetchval(f"select count(*) from {TABLE} where embedding is not null")
+
+async def list_vector_indexes(connection) -> List[Dict[str, Any]]:
+    """ANN indexes on the embedding column, with their definitions and sizes."""
+    rows = await connection.fetch(
+        """
+        select i.indexname, i.indexdef, pg_relation_size(c.oid) as size_bytes, x.indisvalid as valid
+        from pg_indexes i
+        join pg_class c on c.relname = i.indexname
+        join pg_index x on x.indexrelid = c.oid
+        where i.tablename = $1
+        """,
+        TABLE
+    )
+    return [dict(row) for row in rows if _VECTOR_INDEX_PATTERN.search(row["indexdef"])]
+
+async def get_settings(connection) -> Optional[Dict[str, Any]]:
+    """The recorded query-time settings, if an index was built by this module."""
+    row = await connection.fetchrow("select * from crypto_api_vector_index_settings where id = 1")
+    return dict(row) if row else None
+
+async def save_settings(connection, plan: IndexPlan):
+    """Record the query-time settings applied by match_crypto_api_site_pages."""
+    await connection.execute(
+        """
+        insert into crypto_api_vector_index_settings (id, method, lists, probes, ef_search, row_count, built_at)
+        values (1, $1, $2, $3, $4, $5, now())
+        on conflict (id) do update
+            set method = excluded.method,
+                lists = excluded.lists,
+                probes = excluded.probes,
+                ef_search = excluded.ef_search,
+                row_count = excluded.row_count,
+                built_at = excluded.built_at
+        """,
+        plan.method, plan.lists, plan.probes, plan.ef_search, plan.row_count
+    )
+
+async def get_source_settings(connection) -> List[Dict[str, Any]]:
+    """The recorded settings of every partial per-source index."""
+    rows = await connection.fetch("select * from crypto_api_vector_source_index_settings order by source")
+    return [dict(row) for row in rows]
+
+async def save_source_settings(connection, plan: IndexPlan, index_name: str):
+    """Record the query-time settings applied to searches filtered to a partial index's source."""
+    await connection.execute(
+        """
+        insert into crypto_api_vector_source_index_settings
+            (source, index_name, method, lists, probes, ef_search, row_count, built_at)
+        values ($1, $2, $3, $4, $5, $6, $7, now())
+        on conflict (source) do update
+            set index_name = excluded.index_name,
+                method = excluded.method,
+                lists = excluded.lists,
+                probes = excluded.probes,
+                ef_search = excluded.ef_search,
+                row_count = excluded.row_count,
+                built_at = excluded.built_at
+        """,
+        plan.source, index_name, plan.method, plan.lists, plan.probes, plan.ef_search, plan.row_count
+    )
+
+async def build_index(connection, plan: IndexPlan):
+    """
+    Build the planned index concurrently and swap it in for the existing ones.
+
+    The new index is built under a temporary name, so searches keep using the
+    old index until it is dropped.
+    """
+    # A failed concurrent build leaves an invalid index behind
+    await connection.execute(f"drop index concurrently if exists {BUILD_INDEX_NAME}")
+    await connection.execute("set statement_timeout = 0")
+    await connection.execute(f"set maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'")
+
+    print(f"Building {plan.method} index: {plan.create_sql(BUILD_INDEX_NAME)}")
+    started = time.perf_counter()
+    await connection.execute(plan.create_sql(BUILD_INDEX_NAME))
+    print(f"Built in {time.perf_counter() - started:.1f}s")
+
+    for index in await list_vector_indexes(connection):
+        # Partial per-source indexes are managed by build_source_indexes
+        if index["indexname"] != BUILD_INDEX_NAME and " WHERE " not in index["indexdef"]:
+            print(f"Dropping {index['indexname']}")
+            await connection.execute(f"drop index concurrently if exists {index['indexname']}")
+    await connection.execute(f"alter index {BUILD_INDEX_NAME} rename to {INDEX_NAME}")
+    await save_settings(connection, plan)
+
+async def build_source_indexes(connection, method: str = "auto"):
+    """
+    Build or rebuild a partial vector index for every source with at least PARTIAL_INDEX_MIN_ROWS rows.
+
+    Each index is planned for its source's row count (IVFFlat lists and probes
+    follow the source, not the whole table) and its settings are recorded for
+    match_crypto_api_site_pages.
+    """
+    counts = await connection.fetch(
+        f"""
+        select source, count(*) as row_count from {TABLE}
+        where embedding is not null and source is not null
+        group by source
+        order by source
+        """
+    )
+    for row in counts:
+        if row["row_count"] < PARTIAL_INDEX_MIN_ROWS:
+            print(f"{row['source']}: {row['row_count']} rows, searched exactly via the source btree index")
+            continue
+
+        plan = plan_index(row["row_count"], method)
+        plan.source = row["source"]
+        name = source_index_name(row["source"])
+        build_name = f"{name}_build"
+
+        await connection.execute(f"drop index concurrently if exists {build_name}")
+        print(f"{row['source']}: {row['row_count']} rows, building {plan.method} partial index {name}")
+        started = time.perf_counter()
+        await connection.execute(plan.create_sql(build_name))
+        await connection.execute(f"drop index concurrently if exists {name}")
+        await connection.execute(f"alter index {build_name} rename to {name}")
+        await save_source_settings(connection, plan, name)
+        print(f"Built in {time.perf_counter() - started:.1f}s")
+
+async def _search(connection, query: List[float], exclude_id: int, k: int, settings: Dict[str, str],
+                  source: Optional[str] = None) -> List[int]:
+    """Run one top-k inner-product search with session settings applied locally, optionally within a source."""
+    # The source is a literal, as in match_crypto_api_site_pages, so the planner can pick its partial index
+    source_filter = "" if source is None else " and source = '" + source.replace("'", "''") + "'"
+    async with connection.transaction():
+        for name, value in settings.items():
+            await connection.execute(f"select set_config('{name}', '{value}', true)")
+        rows = await connection.fetch(
+            f"""
+            select id from {TABLE}
+            where embedding is not null and id <> $2{source_filter}
+            order by embedding <#> $1::real[]::vector
+            limit $3
+            """,
+            query, exclude_id, k
+        )
+    return [row["id"] for row in rows]
+
+async def _sweep(connection, settings: Dict[str, Any], k: int, num_queries: int, target_recall: float,
+                 source: Optional[str] = None) -> Optional[int]:
+    """
+    Sweep ef_search (HNSW) or probes (IVFFlat) for one index and print recall and latency.
+
+    Queries are stored embeddings (of the source, for a partial index), and
+    recall is measured against an exact search over the same rows.
+
+    Returns:
+        The smallest value reaching target_recall, or None
+    """
+    source_filter = "" if source is None else "and source = $2"
+    samples = await connection.fetch(
+        f"select id, embedding::real[] as embedding from {TABLE} "
+        f"where embedding is not null {source_filter} order by random() limit $1",
+        num_queries, *([] if source is None else [source])
+    )
+    if not samples:
+        print("No embedded rows to benchmark.")
+        return None
+
+    exact_settings = {"enable_indexscan": "off"}
+    truth = []
+    exact_latencies = []
+    for sample in samples:
+        started = time.perf_counter()
+        truth.append(set(await _search(connection, sample["embedding"], sample["id"], k, exact_settings, source)))
+        exact_latencies.append((time.perf_counter() - started) * 1000)
+
+    if settings["method"] == "hnsw":
+        parameter, values = "hnsw.ef_search", [k, 20, 40, 80, 160, 320]
+    else:
+        lists = settings["lists"] or 1
+        parameter = "ivfflat.probes"
+        values = sorted({max(1, v) for v in (1, lists // 64, lists // 32, lists // 16, lists // 8, settings["probes"]) if v <= lists})
+
+    label = "global" if source is None else f"{source} partial"
+    print(f"{label} {settings['method']} index, {settings['row_count']} rows at build, {len(samples)} queries, k={k}\n")
+    print(f"{'setting':>22} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'exact':>22} {1.0:>9.3f} {percentile(exact_latencies, 50):>8.1f} {percentile(exact_latencies, 99):>8.1f}")
+
+    chosen = None
+    for value in values:
+        latencies = []
+        hits = 0
+        for sample, expected in zip(samples, truth):
+            started = time.perf_counter()
+            ids = await _search(connection, sample["embedding"], sample["id"], k, {parameter: str(value)}, source)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected.intersection(ids))
+        recall = hits / max(1, sum(len(expected) for expected in truth))
+        print(f"{parameter + '=' + str(value):>22} {recall:>9.3f} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f}")
+        if chosen is None and recall >= target_recall:
+            chosen = value
+
+    if chosen is None:
+        print(f"\nNo setting reached recall {target_recall}\n")
+    else:
+        print(f"\nSmallest setting with recall >= {target_recall}: {parameter}={chosen}\n")
+    return chosen
+
+async def benchmark_index(
+    connection,
+    k: int = 10,
+    num_queries: int = 50,
+    target_recall: float = 0.95,
+    apply: bool = False
+) -> Optional[int]:
+    """
+    Measure recall@k and latency of the global and per-source indexes against exact search.
+
+    Stored embeddings are used as queries. For HNSW, ef_search is swept; for
+    IVFFlat, probes. The smallest value reaching target_recall is reported
+    for each index and, when apply is set, recorded for
+    match_crypto_api_site_pages. Partial indexes are benchmarked with
+    queries from their own source, ranked within that source.
+
+    Returns:
+        The chosen ef_search/probes value of the global index, or None when no value reached the target
+    """
+    settings = await get_settings(connection)
+    if settings is None:
+        print("No index settings recorded; run `index build` first.")
+        return None
+
+    chosen = await _sweep(connection, settings, k, num_queries, target_recall)
+    if chosen is not None and apply:
+        column = "ef_search" if settings["method"] == "hnsw" else "probes"
+        await connection.execute(f"update crypto_api_vector_index_settings set {column} = $1 where id = 1", chosen)
+        print(f"Recorded {column}={chosen} for match_crypto_api_site_pages\n")
+
+    for source_settings in await get_source_settings(connection):
+        source_chosen = await _sweep(connection, source_settings, k, num_queries, target_recall, source_settings["source"])
+        if source_chosen is not None and apply:
+            column = "ef_search" if source_settings["method"] == "hnsw" else "probes"
+            await connection.execute(
+                f"update crypto_api_vector_source_index_settings set {column} = $1 where source = $2",
+                source_chosen, source_settings["source"]
+            )
+            print(f"Recorded {column}={source_chosen} for searches filtered to {source_settings['source']}\n")
+
+    return chosen
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+async def print_status(connection):
+    """Print row count, current vector indexes, recorded settings and the recommended plan."""
+    row_count = await count_embedded_rows(connection)
+    print(f"Rows with embeddings: {row_count}")
+
+    indexes = await list_vector_indexes(connection)
+    if not indexes:
+        print("No vector index on the embedding column")
+    for index in indexes:
+        state = "" if index["valid"] else " (INVALID)"
+        print(f"- {index['indexname']}{state}: {index['size_bytes'] / 1024 ** 2:.1f} MB")
+        print(f"  {index['indexdef']}")
+
+    settings = await get_settings(connection)
+    if settings:
+        print(
+            f"Recorded settings: {settings['method']}, lists={settings['lists']}, probes={settings['probes']}, "
+            f"ef_search={settings['ef_search']}, built for {settings['row_count']} rows at {settings['built_at']}"
+        )
+        # IVFFlat lists are fixed at build time; rebuild once the table has grown a lot
+        if settings["method"] == "ivfflat" and row_count > 2 * settings["row_count"]:
+            print("The table has more than doubled since the index was built; consider `index build`.")
+
+    for source_settings in await get_source_settings(connection):
+        print(
+            f"- {source_settings['source']} ({source_settings['index_name']}): {source_settings['method']}, "
+            f"lists={source_settings['lists']}, probes={source_settings['probes']}, "
+            f"ef_search={source_settings['ef_search']}, built for {source_settings['row_count']} rows"
+        )
+
+    plan = plan_index(row_count)
+    print(f"Recommended: {plan.create_sql(INDEX_NAME)}")
+
+async def manage_index(action: str, method: str = "auto", k: int = 10, num_queries: int = 50,
+                       target_recall: float = 0.95, apply: bool = False, per_source: bool = False):
+    """
+    Run an index management action.
+
+    Args:
+        action: "status", "build" or "benchmark"
+        method: Index method for build: "auto", "hnsw" or "ivfflat"
+        k: Results per query for benchmark
+        num_queries: Number of benchmark queries
+        target_recall: Recall the benchmark tunes for
+        apply: Record the tuned setting after benchmarking
+        per_source: Also build partial indexes for large sources
+    """
+    connection = await connect()
+    try:
+        if action == "status":
+            await print_status(connection)
+        elif action == "build":
+            plan = plan_index(await count_embedded_rows(connection), method)
+            await build_index(connection, plan)
+            if per_source:
+                await build_source_indexes(connection, method)
+        elif action == "benchmark":
+            await benchmark_index(connection, k, num_queries, target_recall, apply)
+        else:
+            raise ValueError(f"Unknown index action: {action}")
+    finally:
+        await connection.close()
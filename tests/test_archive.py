@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from crypto_crawler.crawling.archive import RawPageArchive, content_hash, list_archived_apis
+
+def test_append_and_read_back(tmp_path):
+    archive = RawPageArchive("Example", archive_dir=str(tmp_path))
+    entry = archive.append("https://docs.example.com/a", "# A", status_code=200)
+    assert entry is not None and entry.content_hash == content_hash("# A")
+
+    page = RawPageArchive("Example", archive_dir=str(tmp_path)).get("https://docs.example.com/a")
+    assert (page.markdown, page.status_code) == ("# A", 200)
+    assert list_archived_apis(str(tmp_path)) == ["Example"]
+
+def test_unchanged_pages_are_not_written_again(tmp_path):
+    archive = RawPageArchive("Example", archive_dir=str(tmp_path))
+    archive.append("https://docs.example.com/a", "# A")
+    assert archive.append("https://docs.example.com/a", "# A") is None
+    archive.append("https://docs.example.com/a", "# A, edited")
+
+    pages = list(RawPageArchive("Example", archive_dir=str(tmp_path)).iter_pages())
+    assert [page.markdown for page in pages] == ["# A, edited"]
+    assert len(list(archive.iter_index())) == 2
+
+def test_concurrent_writers_keep_the_index_consistent(tmp_path):
+    writers = [RawPageArchive("Example", archive_dir=str(tmp_path)) for _ in range(3)]
+
+    def append(i):
+        writers[i % 3].append(f"https://docs.example.com/{i}", f"# Page {i}\n" * 50)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(append, range(150)))
+
+    pages = {page.url: page.markdown for page in RawPageArchive("Example", archive_dir=str(tmp_path)).iter_pages()}
+    assert pages == {f"https://docs.example.com/{i}": f"# Page {i}\n" * 50 for i in range(150)}
+
+def test_torn_index_line_does_not_swallow_the_next_entry(tmp_path):
+    archive = RawPageArchive("Example", archive_dir=str(tmp_path))
+    archive.append("https://docs.example.com/a", "# A")
+    with open(archive.index_path, "ab") as f:
+        f.write(b'{"url": "https://docs.exa')
+
+    RawPageArchive("Example", archive_dir=str(tmp_path)).append("https://docs.example.com/b", "# B")
+    urls = RawPageArchive("Example", archive_dir=str(tmp_path)).urls()
+    assert sorted(urls) == ["https://docs.example.com/a", "https://docs.example.com/b"]
@@ -0,0 +1,13 @@
+from crypto_crawler.crawling.backoff import retry_delay
+
+def test_delay_doubles_per_attempt_with_jitter():
+    for attempts, full_delay in ((1, 60), (2, 120), (3, 240), (5, 960)):
+        for _ in range(20):
+            assert full_delay * 0.5 <= retry_delay(attempts, base_delay=60, max_delay=21600) <= full_delay
+
+def test_delay_is_capped():
+    for _ in range(20):
+        assert retry_delay(40, base_delay=60, max_delay=3600) <= 3600
+
+def test_first_attempt_uses_the_base_delay():
+    assert 5 <= retry_delay(0, base_delay=10, max_delay=100) <= 10
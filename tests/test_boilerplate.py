@@ -0,0 +1,79 @@
+import os
+
+from crypto_crawler.crawling import boilerplate
+from crypto_crawler.crawling.boilerplate import BoilerplateStripper, get_boilerplate_stripper, settle_boilerplate_stripper
+
+NAVIGATION = "Home\nGuides\nAPI Reference\nChangelog"
+FOOTER = "Copyright Example Inc.\nTerms of Service\nPrivacy Policy"
+
+def make_page(i: int) -> str:
+    return f"{NAVIGATION}\n\n# Endpoint {i}\n\nReturns the price of asset {i}.\n\n{FOOTER}"
+
+def trained_stripper(pages: int = 6) -> BoilerplateStripper:
+    stripper = BoilerplateStripper(sample_size=50, min_pages=5)
+    for i in range(pages):
+        stripper.observe(make_page(i), key=f"https://docs.example.com/{i}")
+    return stripper
+
+def test_untrained_stripper_leaves_pages_alone():
+    stripper = trained_stripper(pages=3)
+    assert not stripper.is_trained
+    assert stripper.strip(make_page(0)) == make_page(0)
+
+def test_strips_repeated_blocks_and_keeps_page_content():
+    stripped = trained_stripper().strip(make_page(9))
+    assert "Endpoint 9" in stripped
+    assert "asset 9" in stripped
+    assert "Changelog" not in stripped
+    assert "Privacy Policy" not in stripped
+
+def test_short_repeated_runs_are_kept():
+    stripper = BoilerplateStripper(min_pages=5)
+    for i in range(6):
+        stripper.observe(f"## Parameters\n\nEndpoint {i} takes an id.", key=str(i))
+    assert "## Parameters" in stripper.strip("## Parameters\n\nEndpoint 9 takes an id.")
+
+def test_code_blocks_are_never_stripped():
+    stripper = trained_stripper()
+    page = f"# Example\n\n```\n{NAVIGATION}\n```\n"
+    assert NAVIGATION in stripper.strip(page)
+
+def test_pages_are_counted_once_per_key():
+    stripper = BoilerplateStripper(min_pages=5)
+    for _ in range(10):
+        stripper.observe(make_page(0), key="https://docs.example.com/0")
+    assert stripper.pages_observed == 1
+
+def test_settled_set_and_fingerprint_stop_changing():
+    stripper = trained_stripper()
+    stripper.settle()
+    fingerprint = stripper.fingerprint()
+    stripper.observe("Entirely\nnew\nlines\nhere", key="https://docs.example.com/new")
+    assert stripper.fingerprint() == fingerprint != "none"
+
+def test_strip_stream_matches_strip_for_blocks_within_segments():
+    stripper = trained_stripper()
+    segments = [make_page(i) + "\n" for i in range(3)]
+    streamed = "".join(stripper.strip_stream(segments))
+    assert streamed.split() == stripper.strip("".join(segments)).split()
+    assert "Changelog" not in streamed
+
+def test_saved_set_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setattr(boilerplate, "_strippers", {})
+    stripper = get_boilerplate_stripper("Example", str(tmp_path))
+    for i in range(6):
+        stripper.observe(make_page(i), key=str(i))
+    settle_boilerplate_stripper("Example", str(tmp_path))
+    assert os.path.exists(tmp_path / "Example.json")
+
+    monkeypatch.setattr(boilerplate, "_strippers", {})
+    loaded = get_boilerplate_stripper("Example", str(tmp_path))
+    assert loaded.is_settled
+    assert loaded.fingerprint() == stripper.fingerprint()
+    assert loaded.strip(make_page(9)) == stripper.strip(make_page(9))
+
+def test_untrained_set_is_not_saved(tmp_path, monkeypatch):
+    monkeypatch.setattr(boilerplate, "_strippers", {})
+    get_boilerplate_stripper("Example", str(tmp_path)).observe(make_page(0))
+    settle_boilerplate_stripper("Example", str(tmp_path))
+    assert not os.path.exists(tmp_path / "Example.json")
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from crypto_crawler.api import cache
+from crypto_crawler.api.cache import AsyncLRUCache, normalize_query
+
+def test_normalize_query():
+    assert normalize_query("  How do I get\tBTC  price?\n") == "how do i get btc price?"
+
+def test_evicts_least_recently_used():
+    lru = AsyncLRUCache(max_size=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1  # "b" is now the least recently used
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = AsyncLRUCache(ttl=10)
+    lru.put("a", 1)
+    now[0] += 9
+    assert lru.get("a") == 1
+    now[0] += 2
+    assert lru.get("a") is None
+
+def test_invalidate():
+    lru = AsyncLRUCache()
+    lru.put("a", 1)
+    lru.put("b", 2)
+    lru.invalidate("a")
+    assert lru.get("a") is None and lru.get("b") == 2
+    lru.invalidate()
+    assert lru.get("b") is None
+
+def test_concurrent_misses_share_one_computation():
+    lru = AsyncLRUCache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*[lru.get_or_compute("key", compute) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert calls == 1
+    assert lru.stats()["coalesced"] == 4
+    assert asyncio.run(lru.get_or_compute("key", compute)) == "value"
+    assert calls == 1
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    lru = AsyncLRUCache()
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("rate limited")
+
+    async def main():
+        return await asyncio.gather(*[lru.get_or_compute("key", failing) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def succeeding():
+        return "value"
+
+    assert asyncio.run(lru.get_or_compute("key", succeeding)) == "value"
+
+def test_cancelled_computation_is_not_cached():
+    lru = AsyncLRUCache()
+
+    async def slow():
+        await asyncio.sleep(10)
+        return "value"
+
+    async def main():
+        task = asyncio.create_task(lru.get_or_compute("key", slow))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert lru.get("key") is None
+
+def test_waiters_take_over_when_the_computing_caller_is_cancelled():
+    lru = AsyncLRUCache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(lru.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(lru.get_or_compute("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == ["value"] * 3
+    assert calls == 2  # The cancelled computation and one restarted by a waiter
+
+def test_cancelled_waiter_does_not_cancel_the_computation():
+    lru = AsyncLRUCache()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def main():
+        leader = asyncio.create_task(lru.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(lru.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(main()) == "value"
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from crypto_crawler.crawling.chunking import content_defined_chunks, iter_content_defined_chunks
+
+WORDS = ["price", "market", "volume", "endpoint", "returns", "asset", "exchange", "ticker",
+         "parameter", "request", "limit", "symbol", "history", "candle", "order", "book"]
+
+def make_document(paragraphs: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for i in range(paragraphs):
+        if i % 7 == 0:
+            parts.append(f"## Section {i}")
+        if i % 11 == 0:
+            parts.append("```json\n{\"symbol\": \"BTC\", \"price\": 1}\n```")
+        parts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))) + ".")
+    return "\n\n".join(parts)
+
+def segment(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize("segment_size", [1000, 4096, 9000, 50000])
+def test_streaming_matches_whole_text(segment_size):
+    text = make_document(400)
+    expected = content_defined_chunks(text, target_size=2000)
+    assert list(iter_content_defined_chunks(segment(text, segment_size), target_size=2000)) == expected
+
+def test_chunks_cover_the_text_within_size_limits():
+    text = make_document(300)
+    chunks = content_defined_chunks(text, target_size=2000)
+    assert len(chunks) > 10
+    assert all(len(chunk) <= 4000 for chunk in chunks)
+    # Only whitespace at the cuts is dropped
+    assert "".join("".join(chunk.split()) for chunk in chunks) == "".join(text.split())
+
+def test_chunks_do_not_split_code_blocks():
+    for chunk in content_defined_chunks(make_document(300), target_size=2000):
+        assert chunk.count("```") % 2 == 0
+
+def test_edit_near_the_top_keeps_later_chunks():
+    text = make_document(300)
+    edited = text.replace("## Section 7", "## Section 7\n\nA newly inserted paragraph about rate limits.", 1)
+    before = content_defined_chunks(text, target_size=2000)
+    after = content_defined_chunks(edited, target_size=2000)
+    assert before[-10:] == after[-10:]
+
+def test_short_text_is_one_chunk():
+    assert content_defined_chunks("  Only a little text.  ", target_size=2000) == ["Only a little text."]
@@ -0,0 +1,72 @@
+from crypto_crawler.crawling.dedup import NearDuplicateIndex, hamming_distance, simhash
+
+AUTH_SECTION = (
+    "All requests must include your API key in the x-api-key header. Keys are created "
+    "in the dashboard and can be rotated at any time. Requests without a valid key "
+    "return 401 Unauthorized, and requests over the rate limit return 429 Too Many Requests."
+)
+
+def test_simhash_is_deterministic():
+    assert simhash(AUTH_SECTION) == simhash(AUTH_SECTION)
+
+def test_simhash_ignores_case_and_punctuation():
+    assert simhash(AUTH_SECTION) == simhash(AUTH_SECTION.upper().replace(",", ""))
+
+def test_small_edit_stays_close_and_unrelated_text_does_not():
+    edited = AUTH_SECTION.replace("any time", "any moment")
+    unrelated = "Returns the OHLC candles of a trading pair for the requested interval and time range."
+    assert hamming_distance(simhash(AUTH_SECTION), simhash(edited)) <= 12
+    assert hamming_distance(simhash(AUTH_SECTION), simhash(unrelated)) > 12
+
+def test_index_links_duplicates_to_the_first_copy():
+    index = NearDuplicateIndex(max_distance=3)
+    assert index.check(AUTH_SECTION, "https://docs.example.com/a", 0) is None
+
+    canonical = index.check(AUTH_SECTION, "https://docs.example.com/b", 2)
+    assert canonical is not None
+    assert (canonical.url, canonical.chunk_number) == ("https://docs.example.com/a", 0)
+    assert index.duplicates_found == 1
+
+def test_rechecking_the_canonical_chunk_is_not_a_duplicate():
+    index = NearDuplicateIndex(max_distance=3)
+    index.check(AUTH_SECTION, "https://docs.example.com/a", 0)
+    assert index.check(AUTH_SECTION, "https://docs.example.com/a", 0) is None
+    assert index.duplicates_found == 0
+
+def test_the_lowest_url_and_chunk_number_becomes_canonical():
+    index = NearDuplicateIndex(max_distance=3)
+    assert index.check(AUTH_SECTION, "https://docs.example.com/b", 2) is None
+    # Sorts first, so it takes over instead of linking to the copy seen earlier
+    assert index.check(AUTH_SECTION, "https://docs.example.com/a", 5) is None
+
+    canonical = index.check(AUTH_SECTION, "https://docs.example.com/c", 0)
+    assert (canonical.url, canonical.chunk_number) == ("https://docs.example.com/a", 5)
+
+def test_forgotten_pages_no_longer_serve_as_canonical():
+    index = NearDuplicateIndex(max_distance=3)
+    index.check(AUTH_SECTION, "https://docs.example.com/a", 0, chunk_hash="abc")
+    index.forget("https://docs.example.com/a")
+
+    assert index.check(AUTH_SECTION, "https://docs.example.com/b", 1) is None
+    canonical = index.check(AUTH_SECTION, "https://docs.example.com/c", 0)
+    assert (canonical.url, canonical.chunk_number) == ("https://docs.example.com/b", 1)
+
+def test_links_carry_the_canonical_chunk_hash():
+    index = NearDuplicateIndex(max_distance=3)
+    index.check(AUTH_SECTION, "https://docs.example.com/a", 0, chunk_hash="abc")
+    assert index.check(AUTH_SECTION, "https://docs.example.com/b", 0).chunk_hash == "abc"
+
+def test_band_lookup_finds_every_fingerprint_within_range():
+    index = NearDuplicateIndex(max_distance=3)
+    fingerprint = simhash(AUTH_SECTION)
+    index.add("https://docs.example.com/a", 0, fingerprint)
+
+    # Flip up to max_distance bits spread across different bands
+    for bits in ([0], [5, 40], [1, 20, 63]):
+        flipped = fingerprint
+        for bit in bits:
+            flipped ^= 1 << bit
+        assert index.find(flipped) is not None
+
+    far = fingerprint ^ 0b1111
+    assert index.find(far) is None
@@ -0,0 +1,17 @@
+from crypto_crawler.scripts.migrate_embedding_dimensions import generate_migration_sql
+from crypto_crawler.utils.embeddings import embedding_version
+
+def test_relabels_embeddings_of_the_source_size():
+    sql = generate_migration_sql(768, model="text-embedding-3-small", from_dimensions=1536)
+    assert f"metadata->>'embedding_version' = '{embedding_version('text-embedding-3-small', 1536)}'" in sql
+    assert f"'\"{embedding_version('text-embedding-3-small', 768)}\"'" in sql
+
+def test_renders_every_sized_type_for_the_target_size():
+    sql = generate_migration_sql(512)
+    assert "vector(512)" in sql
+    assert "(1536)" not in sql
+
+def test_embedding_version_depends_on_model_and_size():
+    assert embedding_version("text-embedding-3-small", 768) == embedding_version("text-embedding-3-small", 768)
+    assert embedding_version("text-embedding-3-small", 768) != embedding_version("text-embedding-3-small", 1536)
+    assert embedding_version("text-embedding-3-small", 768) != embedding_version("text-embedding-3-large", 768)
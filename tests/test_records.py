@@ -0,0 +1,18 @@
+from array import array
+
+from crypto_crawler.crawling.records import ProcessedChunk, format_vector
+
+def test_format_vector_round_trips_float32():
+    values = array("f", [0.1, -0.333333343, 1e-8, 0.0])
+    parsed = [float(value) for value in format_vector(values).strip("[]").split(",")]
+    assert array("f", parsed) == values
+
+def test_processed_chunk_stores_embedding_as_float32():
+    chunk = ProcessedChunk("https://docs.example.com", 0, "t", "s", "c", {}, [0.5, 0.25])
+    assert isinstance(chunk.embedding, array) and chunk.embedding.typecode == "f"
+    assert chunk.embedding_literal() == "[0.5,0.25]"
+
+def test_processed_chunk_without_embedding():
+    chunk = ProcessedChunk("https://docs.example.com", 0, "t", "s", "c", {}, None)
+    assert chunk.embedding_literal() is None
+    assert chunk.enrichment_status == "complete"